@@ -0,0 +1,277 @@
+# encoding: utf-8
+#
+# Copyright (C) 2012 Chris Jerdonek. All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# * Redistributions of source code must retain the above copyright notice,
+#   this list of conditions and the following disclaimer.
+# * Redistributions in binary form must reproduce the above copyright notice,
+#   this list of conditions and the following disclaimer in the documentation
+#   and/or other materials provided with the distribution.
+# * The names of the copyright holders may not be used to endorse or promote
+#   products derived from this software without specific prior written
+#   permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+# CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+# SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+#
+
+"""
+Exposes benchmarks of the diff engine in molt.diff.
+
+The tree benchmarks compare generated pairs of actual and expected
+directories with Comparer.compare_dirs().  The other benchmarks time
+match_fuzzy() and _LineComparer.compare_seqs() on lines in memory.
+
+"""
+
+from __future__ import absolute_import
+
+import os
+import random
+from StringIO import StringIO
+import sys
+
+from molt.benchmark.harness import megabytes, time_call
+from molt import defaults
+import molt.diff as diff
+
+
+# The parameters of make_tree_pair() that each tree benchmark varies from.
+DEFAULT_TREE_PARAMS = {
+    'files': 200,
+    'file_size': 16 * 1024,
+    'line_length': 60,
+    'fuzz_density': 0.01,
+    'diff_fraction': 0.1,
+    'binary_fraction': 0.1,
+}
+
+# The parameters of the line benchmarks.
+DEFAULT_LINE_PARAMS = {
+    'lines': 100000,
+    'line_length': 60,
+    'fuzz_density': 0.0,
+}
+
+# The random lines that generated files are made from.
+_LINE_POOL_SIZE = 1000
+_LINE_CHARS = "abcdefghijklmnopqrstuvwxyz ABCDEFGHIJKLMNOPQRSTUVWXYZ 0123456789"
+
+_BINARY_BLOCK_SIZE = 4096
+
+_SEED = 0
+
+
+def make_benchmarks():
+    return [
+        TreeBenchmark('tree'),
+        TreeBenchmark('tree_files', files=2000, file_size=1024),
+        TreeBenchmark('tree_file_size', files=4, file_size=2 * 1024 * 1024),
+        TreeBenchmark('tree_line_length', line_length=2000),
+        TreeBenchmark('tree_fuzz', fuzz_density=0.5),
+        TreeBenchmark('tree_diffs', diff_fraction=1.0),
+        TreeBenchmark('tree_binary', binary_fraction=0.5),
+        MatchFuzzyBenchmark('match_fuzzy', lines=20000, fuzz_density=0.1),
+        CompareSeqsBenchmark('compare_seqs'),
+        CompareSeqsBenchmark('compare_seqs_fuzz', fuzz_density=0.1),
+    ]
+
+
+class _LineMaker(object):
+
+    """
+    Makes pairs of actual and expected lines with a given fuzz density.
+
+    """
+
+    def __init__(self, rng, line_length, fuzz_density):
+        self.fuzz_density = fuzz_density
+        self.pool = ["".join(rng.choice(_LINE_CHARS) for i in range(line_length)) + "\n" for
+                     n in range(_LINE_POOL_SIZE)]
+        self.rng = rng
+
+    def make_pair(self):
+        actual = self.pool[self.rng.randrange(_LINE_POOL_SIZE)]
+        if self.rng.random() >= self.fuzz_density:
+            return actual, actual
+        return actual, actual[:len(actual) // 2] + defaults.DIFF_FUZZ + "\n"
+
+    def make_lines(self, count):
+        """
+        Return a pair of lists of actual and expected lines.
+
+        """
+        pairs = [self.make_pair() for i in range(count)]
+        return [pair[0] for pair in pairs], [pair[1] for pair in pairs]
+
+
+def _write(b, path):
+    with open(path, 'wb') as f:
+        f.write(b)
+
+
+def make_tree_pair(actual_dir, expected_dir, files=10, file_size=1024, line_length=60,
+                   fuzz_density=0.0, diff_fraction=0.0, binary_fraction=0.0,
+                   seed=_SEED):
+    """
+    Write a pair of new actual and expected directories, and return the
+    total number of bytes written.
+
+    The files are spread over subdirectories of at most 100 files.
+
+    Arguments:
+
+      fuzz_density: the fraction of expected text lines containing fuzz.
+
+      diff_fraction: the fraction of files whose actual contents differ
+        from the expected contents by one line (or byte).
+
+      binary_fraction: the fraction of files that are binary.
+
+    """
+    rng = random.Random(seed)
+    maker = _LineMaker(rng, line_length, fuzz_density)
+    block = "".join(chr(rng.randrange(256)) for i in range(_BINARY_BLOCK_SIZE))
+    total = 0
+    for index in range(files):
+        sub_dir = "dir_%d" % (index // 100)
+        if index % 100 == 0:
+            os.makedirs(os.path.join(actual_dir, sub_dir))
+            os.makedirs(os.path.join(expected_dir, sub_dir))
+        if rng.random() < binary_fraction:
+            name = "file_%d.bin" % index
+            expected = actual = (block * (file_size // len(block) + 1))[:file_size]
+            if rng.random() < diff_fraction:
+                actual = actual[:-1] + chr((ord(actual[-1]) + 1) % 256)
+        else:
+            name = "file_%d.txt" % index
+            actual, expected = maker.make_lines(max(1, file_size // (line_length + 1)))
+            if rng.random() < diff_fraction:
+                actual[rng.randrange(len(actual))] = "changed line\n"
+            actual, expected = "".join(actual), "".join(expected)
+        _write(actual, os.path.join(actual_dir, sub_dir, name))
+        _write(expected, os.path.join(expected_dir, sub_dir, name))
+        total += len(actual) + len(expected)
+    return total
+
+
+def _describe_rate(result, baseline, key, label):
+    text = "%.1f %s" % (result[key], label)
+    if baseline is not None:
+        text += " (baseline %.1f)" % baseline[key]
+    return text
+
+
+class _Benchmark(object):
+
+    # What the benchmark counts, for example "files" or "lines".
+    unit = None
+
+    def __init__(self, name, default_params, **params):
+        self.name = name
+        self.params = dict(default_params, **params)
+
+    def _make_result(self, seconds, bytes, count):
+        unit = self.unit
+        return {
+            'seconds': seconds,
+            'bytes': bytes,
+            unit: count,
+            'mb_per_second': megabytes(bytes) / seconds,
+            '%s_per_second' % unit: count / seconds,
+        }
+
+    def describe(self, result, baseline):
+        unit = self.unit
+        return "%d %s, %d bytes; %s, %s" % (
+            result[unit], unit, result['bytes'],
+            _describe_rate(result, baseline, 'mb_per_second', "MB/s"),
+            _describe_rate(result, baseline, '%s_per_second' % unit, "%s/s" % unit))
+
+
+class TreeBenchmark(_Benchmark):
+
+    """
+    Times comparing a pair of generated directories.
+
+    """
+
+    unit = 'files'
+
+    def __init__(self, name, **params):
+        super(TreeBenchmark, self).__init__(name, DEFAULT_TREE_PARAMS, **params)
+
+    def run(self, work_dir, repeat):
+        dirs = tuple(os.path.join(work_dir, name) for name in ('actual', 'expected'))
+        bytes = make_tree_pair(*dirs, **self.params)
+        comparer = diff.Comparer(max_hunks=defaults.DIFF_MAX_HUNKS)
+
+        def compare():
+            # Discard the differences printed to stdout.
+            stdout = sys.stdout
+            sys.stdout = StringIO()
+            try:
+                return comparer.compare_dirs(dirs)
+            finally:
+                sys.stdout = stdout
+
+        seconds, does_match = time_call(compare, repeat)
+        return self._make_result(seconds, bytes, self.params['files'])
+
+
+class MatchFuzzyBenchmark(_Benchmark):
+
+    """
+    Times match_fuzzy() on a pair of matching strings.
+
+    """
+
+    unit = 'lines'
+
+    def __init__(self, name, **params):
+        super(MatchFuzzyBenchmark, self).__init__(name, DEFAULT_LINE_PARAMS, **params)
+
+    def run(self, work_dir, repeat):
+        params = self.params
+        maker = _LineMaker(random.Random(_SEED), params['line_length'], params['fuzz_density'])
+        actual, expected = (unicode("".join(lines)) for
+                            lines in maker.make_lines(params['lines']))
+        seconds, does_match = time_call(lambda: diff.match_fuzzy(actual, expected), repeat)
+        assert does_match
+        return self._make_result(seconds, len(actual) + len(expected), params['lines'])
+
+
+class CompareSeqsBenchmark(_Benchmark):
+
+    """
+    Times _LineComparer.compare_seqs() on sequences differing in the last line.
+
+    """
+
+    unit = 'lines'
+
+    def __init__(self, name, **params):
+        super(CompareSeqsBenchmark, self).__init__(name, DEFAULT_LINE_PARAMS, **params)
+
+    def run(self, work_dir, repeat):
+        params = self.params
+        maker = _LineMaker(random.Random(_SEED), params['line_length'], params['fuzz_density'])
+        seqs = [[unicode(line) for line in lines] for lines in maker.make_lines(params['lines'])]
+        seqs[0][-1] = u"changed line\n"
+        comparer = diff._LineComparer(fuzz=defaults.DIFF_FUZZ)
+        seconds, info = time_call(lambda: comparer.compare_seqs(seqs), repeat)
+        assert info.line_index == params['lines'] - 1
+        bytes = sum(len(line) for seq in seqs for line in seq)
+        return self._make_result(seconds, bytes, params['lines'])
@@ -0,0 +1,263 @@
+# encoding: utf-8
+#
+# Copyright (C) 2012 Chris Jerdonek. All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# * Redistributions of source code must retain the above copyright notice,
+#   this list of conditions and the following disclaimer.
+# * Redistributions in binary form must reproduce the above copyright notice,
+#   this list of conditions and the following disclaimer in the documentation
+#   and/or other materials provided with the distribution.
+# * The names of the copyright holders may not be used to endorse or promote
+#   products derived from this software without specific prior written
+#   permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+# CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+# SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+#
+
+"""
+Exposes a run_benchmarks() function to run the benchmark suites.
+
+Each suite is a module in this package with a make_benchmarks()
+function returning a list of benchmark objects.  A benchmark object has
+a name attribute, a params attribute (a dict of the parameters that
+determine the workload), a run(work_dir, repeat) method that returns a
+JSON-serializable result dict with at least a "seconds" key, and a
+describe(result, baseline) method that returns a string of details to
+report, where baseline is the baseline result dict or None.
+
+"""
+
+from __future__ import absolute_import
+
+import json
+import logging
+import os
+import shutil
+import sys
+from tempfile import mkdtemp
+import time
+
+from molt.projectmap import Locator
+
+
+_log = logging.getLogger(__name__)
+
+# The version of the baseline JSON format.
+FORMAT_VERSION = 1
+
+# The suites in the order to run them, as (name, module name) pairs.
+SUITES = [
+    ('render', 'molt.benchmark.render'),
+    ('diff', 'molt.benchmark.diff'),
+    ('lambda', 'molt.benchmark.lambdas'),
+]
+
+# A result is reported as slower (or faster) than its baseline if its
+# time is more than this factor larger (or smaller).
+TOLERANCE = 1.25
+
+
+def megabytes(n):
+    return n / float(1024 * 1024)
+
+
+def percentile(values, p):
+    """
+    Return the p-th percentile of a list of numbers, by the nearest rank.
+
+    >>> percentile([3, 1, 2, 4], 50)
+    2
+    >>> percentile([3, 1, 2, 4], 99)
+    4
+
+    """
+    values = sorted(values)
+    rank = -(-p * len(values) // 100)  # The ceiling of p * len / 100.
+    return values[max(rank, 1) - 1]
+
+
+def time_call(func, repeat):
+    """
+    Call a function repeat times, and return the fastest (seconds, result) pair.
+
+    """
+    best = None
+    for i in range(repeat):
+        start_time = time.time()
+        result = func()
+        seconds = time.time() - start_time
+        if best is None or seconds < best[0]:
+            best = seconds, result
+    return best
+
+
+def _import_suite(module_name):
+    __import__(module_name)
+    return sys.modules[module_name]
+
+
+def _matches(name, prefixes):
+    """
+    Return whether a benchmark name matches a list of name prefixes.
+
+    >>> _matches('render.files', None)
+    True
+    >>> _matches('render.files', ['render'])
+    True
+    >>> _matches('render.files', ['diff', 'render.depth'])
+    False
+
+    """
+    if not prefixes:
+        return True
+    return any(name.startswith(prefix) for prefix in prefixes)
+
+
+def get_baseline_path(suite_name, baseline_dir=None):
+    if baseline_dir is None:
+        baseline_dir = Locator().benchmark_baselines_dir
+    return os.path.join(baseline_dir, "%s.json" % suite_name)
+
+
+def load_baseline(path):
+    """
+    Return the dict of baseline results by benchmark name, or {} if none.
+
+    """
+    if not os.path.exists(path):
+        _log.info("no benchmark baseline at: %s" % path)
+        return {}
+    with open(path, 'rb') as f:
+        data = json.load(f)
+    return data['results']
+
+
+def save_baseline(results, path):
+    data = {'version': FORMAT_VERSION, 'results': results}
+    with open(path, 'wb') as f:
+        json.dump(data, f, indent=2, separators=(',', ': '), sort_keys=True)
+        f.write('\n')
+    _log.info("wrote benchmark baseline: %s" % path)
+
+
+def compare(result, baseline):
+    """
+    Return "slower", "faster", "same", or None if there is no baseline.
+
+    A baseline recorded with different parameters is not compared.
+
+    >>> compare({'params': {}, 'seconds': 2.0}, {'params': {}, 'seconds': 1.0})
+    'slower'
+    >>> compare({'params': {}, 'seconds': 1.0}, {'params': {'n': 1}, 'seconds': 1.0})
+
+    """
+    if baseline is None or baseline['params'] != result['params']:
+        return None
+    ratio = result['seconds'] / baseline['seconds']
+    if ratio > TOLERANCE:
+        return "slower"
+    if ratio < 1 / TOLERANCE:
+        return "faster"
+    return "same"
+
+
+def format_result(name, result, baseline, details):
+    """
+    Arguments:
+
+      baseline: the baseline result dict, or None if there is none to
+        compare with.
+
+    """
+    status = compare(result, baseline)
+    line = "  %-24s %9.4fs" % (name, result['seconds'])
+    if status is None:
+        line += "  (no baseline)"
+    else:
+        line += "  baseline %9.4fs  %5.2fx  %s" % (
+            baseline['seconds'], result['seconds'] / baseline['seconds'], status)
+    if details:
+        line += "\n    %s" % details
+    return line
+
+
+def _run_benchmark(benchmark, repeat):
+    work_dir = mkdtemp(prefix='molt-benchmark-')
+    # Disable logging so that log messages do not affect timings.
+    logging.disable(logging.INFO)
+    try:
+        result = benchmark.run(work_dir, repeat)
+    finally:
+        logging.disable(logging.NOTSET)
+        shutil.rmtree(work_dir)
+    result['params'] = benchmark.params
+    return result
+
+
+def run_benchmarks(names=None, repeat=5, update_baseline=False,
+                   baseline_dir=None, stream=None):
+    """
+    Run the benchmarks, writing each result to a stream as it completes.
+
+    Returns a one-line summary string.
+
+    Arguments:
+
+      names: a list of prefixes of benchmark names (of the form
+        "suite.name") to filter by, or None to run all benchmarks.
+
+      repeat: the number of times to run each benchmark.  Each benchmark
+        reports its fastest run.
+
+      update_baseline: whether to add the results to the stored baselines.
+
+      baseline_dir: the directory of the baseline JSON files.  Defaults
+        to the baselines directory of this package.
+
+      stream: the stream to write results to.  Defaults to sys.stdout.
+
+    """
+    if stream is None:
+        stream = sys.stdout
+    statuses = []
+    for suite_name, module_name in SUITES:
+        suite = _import_suite(module_name)
+        benchmarks = [benchmark for benchmark in suite.make_benchmarks() if
+                      _matches("%s.%s" % (suite_name, benchmark.name), names)]
+        if not benchmarks:
+            continue
+        baseline_path = get_baseline_path(suite_name, baseline_dir)
+        baseline = load_baseline(baseline_path)
+        stream.write("%s (baseline: %s)\n" % (suite_name, baseline_path))
+        results = {}
+        for benchmark in benchmarks:
+            result = _run_benchmark(benchmark, repeat)
+            results[benchmark.name] = result
+            base = baseline.get(benchmark.name)
+            status = compare(result, base)
+            statuses.append(status)
+            if status is None:
+                base = None
+            stream.write(format_result(benchmark.name, result, base,
+                                       benchmark.describe(result, base)) + "\n")
+            stream.flush()
+        if update_baseline:
+            baseline.update(results)
+            save_baseline(baseline, baseline_path)
+
+    counts = [statuses.count(status) for status in ("slower", "faster", None)]
+    return ("ran %d benchmarks: %d slower and %d faster than baseline, %d without baseline" %
+            tuple([len(statuses)] + counts))
@@ -0,0 +1,191 @@
+# encoding: utf-8
+#
+# Copyright (C) 2012 Chris Jerdonek. All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# * Redistributions of source code must retain the above copyright notice,
+#   this list of conditions and the following disclaimer.
+# * Redistributions in binary form must reproduce the above copyright notice,
+#   this list of conditions and the following disclaimer in the documentation
+#   and/or other materials provided with the distribution.
+# * The names of the copyright holders may not be used to endorse or promote
+#   products derived from this software without specific prior written
+#   permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+# CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+# SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+#
+
+"""
+Exposes benchmarks of the overhead of calling lambda scripts.
+
+Each benchmark calls a script that echoes its input, written for a given
+interpreter, with a given payload size, and reports percentiles of the
+latency of a call to the function returned by _lambda_from_script().
+The latency is broken down by repeating the steps of the call by hand:
+
+  spawn: creating the process (fork and exec), i.e. the Popen() call.
+
+  startup: starting the interpreter, measured as the time to
+    communicate with an empty script of the same interpreter.
+
+  pipe I/O: the rest of the time to communicate with the script, i.e.
+    writing the payload to stdin and reading it back from stdout.
+
+  encode/decode: encoding the payload and decoding the output.
+
+"""
+
+from __future__ import absolute_import
+
+import os
+from subprocess import Popen, PIPE
+import sys
+import time
+
+from molt.benchmark.harness import percentile
+from molt import defaults
+from molt.molter import _lambda_from_script
+
+
+# The interpreter of each kind of script.
+INTERPRETERS = {
+    'bash': '/bin/bash',
+    'python': sys.executable,
+}
+
+_ECHO_SCRIPTS = {
+    'bash': "cat\n",
+    'python': "import sys\nsys.stdout.write(sys.stdin.read())\n",
+}
+
+_PAYLOAD_LINE = u"lambda payload é\n"
+
+# The payload sizes in bytes, by benchmark name suffix.
+PAYLOAD_SIZES = [
+    ('0b', 0),
+    ('1kb', 1024),
+    ('64kb', 64 * 1024),
+    ('1mb', 1024 * 1024),
+]
+
+# The number of calls of each benchmark.
+CALLS = 20
+
+_PERCENTILES = (50, 90, 99)
+
+
+def make_benchmarks():
+    return [LambdaBenchmark("%s_%s" % (interpreter, suffix), interpreter=interpreter,
+                            payload_size=size) for
+            interpreter in sorted(INTERPRETERS) for suffix, size in PAYLOAD_SIZES]
+
+
+def make_payload(size):
+    """
+    Return a unicode string whose encoding has approximately size bytes.
+
+    """
+    line_size = len(_PAYLOAD_LINE.encode(defaults.LAMBDA_ENCODING))
+    return _PAYLOAD_LINE * (size // line_size) + u"x" * (size % line_size)
+
+
+def _write_script(path, interpreter, body):
+    with open(path, 'wb') as f:
+        f.write("#!%s\n%s" % (interpreter, body))
+    os.chmod(path, 0755)
+
+
+def _time_steps(path, u):
+    """
+    Repeat the steps of calling a lambda, and return a dict of their times.
+
+    """
+    encoding, errors = defaults.LAMBDA_ENCODING, defaults.ENCODING_ERRORS
+    start_time = time.time()
+    bytes_in = u.encode(encoding, errors)
+    encode_time = time.time()
+    proc = Popen(path, stdout=PIPE, stdin=PIPE, stderr=PIPE)
+    spawn_time = time.time()
+    stdout, stderr = proc.communicate(input=bytes_in)
+    communicate_time = time.time()
+    stdout.decode(encoding, errors)
+    end_time = time.time()
+    return {
+        'spawn': spawn_time - encode_time,
+        'communicate': communicate_time - spawn_time,
+        'encode_decode': (encode_time - start_time) + (end_time - communicate_time),
+    }
+
+
+def _median_steps(path, u, calls):
+    steps = [_time_steps(path, u) for i in range(calls)]
+    return dict((key, percentile([step[key] for step in steps], 50)) for key in steps[0])
+
+
+class LambdaBenchmark(object):
+
+    """
+    Times calling a lambda script that echoes its input.
+
+    The repeat argument of run() is not used.  Instead, the number of
+    calls is a parameter so that the percentiles are comparable with
+    the baseline.
+
+    """
+
+    def __init__(self, name, interpreter, payload_size, calls=CALLS):
+        self.name = name
+        self.params = {'interpreter': interpreter, 'payload_size': payload_size,
+                       'calls': calls}
+
+    def run(self, work_dir, repeat):
+        params = self.params
+        interpreter = INTERPRETERS[params['interpreter']]
+        calls = params['calls']
+        echo_path = os.path.join(work_dir, 'echo')
+        empty_path = os.path.join(work_dir, 'empty')
+        _write_script(echo_path, interpreter, _ECHO_SCRIPTS[params['interpreter']])
+        _write_script(empty_path, interpreter, "")
+        u = make_payload(params['payload_size'])
+
+        func = _lambda_from_script(echo_path)
+        latencies = []
+        for i in range(calls):
+            start_time = time.time()
+            func(u)
+            latencies.append(time.time() - start_time)
+
+        steps = _median_steps(echo_path, u, calls)
+        startup = _median_steps(empty_path, u"", calls)['communicate']
+        breakdown = {
+            'spawn': steps['spawn'],
+            'startup': startup,
+            'pipe_io': max(0.0, steps['communicate'] - startup),
+            'encode_decode': steps['encode_decode'],
+        }
+        result = dict(("p%d" % p, percentile(latencies, p)) for p in _PERCENTILES)
+        result['seconds'] = result['p50']
+        result['breakdown'] = breakdown
+        return result
+
+    def describe(self, result, baseline):
+        milliseconds = lambda key, values: "%s %.2fms" % (key, 1000 * values[key])
+        details = ", ".join(milliseconds("p%d" % p, result) for p in _PERCENTILES)
+        if baseline is not None:
+            details += " (baseline p99 %.2fms)" % (1000 * baseline['p99'])
+        breakdown = result['breakdown']
+        details += "; median %s" % ", ".join(
+            milliseconds(key, breakdown) for key in ('spawn', 'startup', 'pipe_io', 'encode_decode'))
+        return details
@@ -0,0 +1,131 @@
+# encoding: utf-8
+#
+# Copyright (C) 2012 Chris Jerdonek. All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# * Redistributions of source code must retain the above copyright notice,
+#   this list of conditions and the following disclaimer.
+# * Redistributions in binary form must reproduce the above copyright notice,
+#   this list of conditions and the following disclaimer in the documentation
+#   and/or other materials provided with the distribution.
+# * The names of the copyright holders may not be used to endorse or promote
+#   products derived from this software without specific prior written
+#   permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+# CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+# SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+#
+
+"""
+Exposes benchmarks of rendering synthetic templates with Molter.molt().
+
+"""
+
+from __future__ import absolute_import
+
+import os
+
+from molt.benchmark.harness import time_call
+from molt.benchmark.templates import make_template
+from molt.molter import Molter
+from molt.profiler import RenderProfile
+
+
+# The parameters of make_template() that each benchmark varies from.
+DEFAULT_PARAMS = {
+    'files': 50,
+    'depth': 2,
+    'partials': 2,
+    'lambdas': 0,
+    'file_size': 4096,
+    'context_size': 20,
+}
+
+# The phases reported, as (phase, RenderProfile file key) pairs.
+_PHASE_KEYS = [
+    ('names', 'name_seconds'),
+    ('render', 'render_seconds'),
+    ('lambdas', 'lambda_seconds'),
+    ('write', 'write_seconds'),
+    ('copy', 'copy_seconds'),
+]
+
+
+def make_benchmarks():
+    return [
+        RenderBenchmark('default'),
+        RenderBenchmark('files', files=500),
+        RenderBenchmark('depth', depth=20),
+        RenderBenchmark('partials', partials=20),
+        RenderBenchmark('lambdas', files=10, lambdas=4),
+        RenderBenchmark('file_size', files=10, file_size=256 * 1024),
+        RenderBenchmark('context_size', context_size=2000),
+    ]
+
+
+def _get_phases(profile):
+    """
+    Return a dict of the seconds spent in each phase of a profiled render.
+
+    The "setup" phase is the time not spent on any file, for example
+    reading the configuration file.  The "render" phase excludes the
+    time spent in lambdas.
+
+    """
+    phases = dict((phase, sum(entry[key] for entry in profile.files)) for
+                  phase, key in _PHASE_KEYS)
+    phases['render'] -= phases['lambdas']
+    render, = profile.renders
+    phases['setup'] = render['seconds'] - sum(entry['seconds'] for entry in profile.files)
+    return phases
+
+
+class RenderBenchmark(object):
+
+    """
+    Times rendering a synthetic template to a new output directory.
+
+    """
+
+    def __init__(self, name, **params):
+        self.name = name
+        self.params = dict(DEFAULT_PARAMS, **params)
+
+    def run(self, work_dir, repeat):
+        template_dir = os.path.join(work_dir, 'template')
+        make_template(template_dir, **self.params)
+        output_dirs = (os.path.join(work_dir, "output_%d" % n) for n in range(repeat + 1))
+
+        def render(profile=None):
+            output_dir = next(output_dirs)
+            os.mkdir(output_dir)
+            Molter(profile=profile).molt(template_dir, output_dir)
+
+        seconds, result = time_call(render, repeat)
+        # Profile a separate render so that profiling does not affect
+        # the end-to-end time.
+        profile = RenderProfile()
+        render(profile)
+        return {
+            'seconds': seconds,
+            'phases': _get_phases(profile),
+            'files': len(profile.files),
+            'bytes': sum(entry['bytes_out'] for entry in profile.files),
+        }
+
+    def describe(self, result, baseline):
+        phases = result['phases']
+        details = ", ".join("%s %.4fs" % (phase, phases[phase]) for
+                            phase in ['setup'] + [phase for phase, key in _PHASE_KEYS])
+        return "%d files, %d bytes; %s" % (result['files'], result['bytes'], details)
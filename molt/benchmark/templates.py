@@ -0,0 +1,137 @@
+# encoding: utf-8
+#
+# Copyright (C) 2012 Chris Jerdonek. All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# * Redistributions of source code must retain the above copyright notice,
+#   this list of conditions and the following disclaimer.
+# * Redistributions in binary form must reproduce the above copyright notice,
+#   this list of conditions and the following disclaimer in the documentation
+#   and/or other materials provided with the distribution.
+# * The names of the copyright holders may not be used to endorse or promote
+#   products derived from this software without specific prior written
+#   permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+# CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+# SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+#
+
+"""
+Exposes a function to generate synthetic Groome templates for benchmarks.
+
+"""
+
+from __future__ import absolute_import
+
+import json
+import os
+
+from molt import defaults
+
+
+# The name of the context value used in directory and file names.
+_NAME_KEY = 'name'
+
+# Every COPY_INTERVAL-th file is copied as-is rather than rendered.
+COPY_INTERVAL = 5
+
+_LAMBDA_SCRIPT = """\
+#!/bin/sh
+cat
+"""
+
+_PADDING_LINE = "line %d: {{value_%d}} lorem ipsum dolor sit amet, consectetur\n"
+
+
+def _write(text, path):
+    with open(path, 'wb') as f:
+        f.write(text)
+
+
+def _make_body(index, partials, lambdas, file_size, context_size):
+    parts = ["{{%s}}: file %d\n" % (_NAME_KEY, index)]
+    parts.extend("{{> partial_%d}}" % n for n in range(partials))
+    parts.extend("{{#lambda_%d}}lambda text %d{{/lambda_%d}}\n" % (n, n, n) for
+                 n in range(lambdas))
+    size = sum(len(part) for part in parts)
+    line_number = 0
+    while size < file_size:
+        line = _PADDING_LINE % (line_number, line_number % context_size)
+        parts.append(line)
+        size += len(line)
+        line_number += 1
+    return "".join(parts)
+
+
+def make_template(template_dir, files=10, depth=1, partials=0, lambdas=0,
+                  file_size=1024, context_size=10):
+    """
+    Write a synthetic Groome template to a new directory.
+
+    Directory and file names are rendered from the context, and every
+    template file includes every partial and calls every lambda once.
+
+    Arguments:
+
+      files: the number of files in the structure directory, spread
+        evenly over the nesting levels.  Every COPY_INTERVAL-th file
+        is copied as-is rather than rendered.
+
+      depth: the number of nested directory levels containing files,
+        where 1 means a flat structure directory.
+
+      partials: the number of partials.
+
+      lambdas: the number of lambdas.  The lambdas are shell scripts
+        that echo their input.
+
+      file_size: the approximate size of each file in bytes.
+
+      context_size: the number of values in the context, at least 1.
+
+    """
+    structure_dir = os.path.join(template_dir, defaults.TEMPLATE_PROJECT_DIR_NAME)
+    partials_dir = os.path.join(template_dir, defaults.TEMPLATE_PARTIALS_DIR_NAME)
+    lambdas_dir = os.path.join(template_dir, defaults.TEMPLATE_LAMBDAS_DIR_NAME)
+    os.makedirs(structure_dir)
+    os.mkdir(partials_dir)
+    os.mkdir(lambdas_dir)
+
+    context = dict(("value_%d" % n, "value %d" % n) for n in range(context_size))
+    context[_NAME_KEY] = "bench"
+    config_path = os.path.join(template_dir, defaults.CONFIG_FILE_NAME + '.json')
+    _write(json.dumps({defaults.CONFIG_CONTEXT_KEY: context}, indent=2, sort_keys=True),
+           config_path)
+
+    for n in range(partials):
+        _write("partial %d of {{%s}}\n" % (n, _NAME_KEY),
+               os.path.join(partials_dir, "partial_%d.mustache" % n))
+    for n in range(lambdas):
+        path = os.path.join(lambdas_dir, "lambda_%d.sh" % n)
+        _write(_LAMBDA_SCRIPT, path)
+        os.chmod(path, 0755)
+
+    dir_paths = [structure_dir]
+    for level in range(1, depth):
+        dir_paths.append(os.path.join(dir_paths[-1], "{{%s}}_%d" % (_NAME_KEY, level)))
+        os.mkdir(dir_paths[-1])
+
+    for index in range(files):
+        dir_path = dir_paths[index * depth // files]
+        body = _make_body(index, partials, lambdas, file_size, context_size)
+        if (index + 1) % COPY_INTERVAL == 0:
+            file_name = "copied_%d.txt" % index
+        else:
+            file_name = "file_%d_{{%s}}.txt.mustache" % (index, _NAME_KEY)
+        _write(body, os.path.join(dir_path, file_name))
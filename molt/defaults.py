@@ -57,14 +57,40 @@ CONFIG_FILE_NAME = 'sample'  # without extension
 CONFIG_FILE_EXTENSIONS = ['.json', '.yaml', '.yml']
 CONFIG_CONTEXT_KEY = 'context'
 
-# Names to pass to Python's filecmp.dircmp() for the `ignore` argument.
+# Gitignore-style patterns always ignored when comparing directories.
 DIRCMP_IGNORE = ['.DS_Store', '__pycache__']
+# The file in a template directory containing additional patterns to
+# ignore when comparing the rendered output with the expected directory.
+TEMPLATE_IGNORE_FILE_NAME = '.moltignore'
+# The file in a template directory containing the index of the expected
+# directory written by --index-expected.
+TEMPLATE_MANIFEST_FILE_NAME = '.expected-manifest.json'
 
 # For fuzzy equality testing in molt.diff.
 # TODO: remove FUZZY_MARKER.
 FUZZY_MARKER = "..."
 DIFF_CONTEXT = 3
 DIFF_FUZZ = "..."
+# Limits on reporting every differing hunk of a file.  If a file has more
+# than DIFF_MAX_LINES lines after its first difference, or more than
+# DIFF_MAX_EDITS line insertions and deletions, only the first difference
+# is reported.
+DIFF_MAX_HUNKS = 20
+DIFF_MAX_EDITS = 1000
+DIFF_MAX_LINES = 100000
+
+# The number of slowest files and lambdas to report with --profile.
+PROFILE_REPORT_COUNT = 10
+
+# The number of slowest tests to report with --slowest-tests.
+SLOWEST_TESTS_COUNT = 10
+
+# The in-memory file system directory to use with --test-tmpfs.
+TEST_TMPFS_DIR = '/dev/shm'
+
+# The default name of the results file written by --shard, formatted
+# with the shard number and the shard count.
+TEST_RESULTS_FILE_NAME = 'test-results-%s-of-%s.json'
 
 FORMAT_NEW_DIR = lambda dir_path, index: "%s_%s" % (dir_path, index)
 
@@ -38,6 +38,8 @@ does not support fuzzy matching in the way that Molt requires.
 
 from __future__ import absolute_import
 
+from collections import deque
+import io
 import itertools
 import logging
 import os
@@ -48,13 +50,44 @@ import molt.defaults as defaults
 import molt.general.dirdiff as dirdiff
 # TODO: remove these from ... imports.
 from molt.general.dirdiff import compare_files, DirComparer
+from molt.general.ignore import IgnoreMatcher
 import molt.general.io as molt_io
+from molt.general.myers import get_opcodes, group_opcodes
 
 
 _ENCODING = defaults.FILE_ENCODING
+_ERRORS = defaults.ENCODING_ERRORS
 
 _log = logging.getLogger(__name__)
 
+# The number of lines read from each file at a time when streaming.
+_BLOCK_LINES = 16 * 1024
+# The minimum number of lines for which hashing lines with NumPy
+# pays off over comparing lines one at a time.
+_VECTORIZE_MIN_LINES = 1000
+
+# NumPy is optional.  It only speeds up comparing long files, so it is
+# imported the first time it is needed (see _import_numpy()) rather than
+# slowing down importing this module.
+_NOT_IMPORTED = object()
+numpy = _NOT_IMPORTED
+
+
+def _import_numpy():
+    """
+    Return the numpy module, or None if NumPy is not available.
+
+    """
+    global numpy
+    if numpy is _NOT_IMPORTED:
+        try:
+            import numpy as module
+        except ImportError, err:
+            module = None
+            _log.debug("numpy not found: %s" % repr(err))
+        numpy = module
+    return numpy
+
 
 class _DiffInfo(object):
 
@@ -65,6 +98,58 @@ class _DiffInfo(object):
         self.char_indices = char_indices
 
 
+class _LineWindow(object):
+
+    """
+    A sequence-like view of the most recent lines read from a stream.
+
+    Instances are indexed by absolute line index, like the list of all
+    lines read so far, but only the last maxlen lines are retained.
+    This is enough for _DiffDescriber, which only looks at the lines
+    leading up to a difference.
+
+    For example--
+
+    >>> window = _LineWindow(2)
+    >>> for line in ['a', 'b', 'c']:
+    ...     window.append(line)
+    >>> window[1:3], window[2]
+    (['b', 'c'], 'c')
+    >>> window[3]
+    Traceback (most recent call last):
+    IndexError: 3
+
+    """
+
+    def __init__(self, maxlen):
+        self.count = 0
+        self.lines = deque(maxlen=maxlen)
+
+    @property
+    def start(self):
+        """Return the absolute index of the first line retained."""
+        return self.count - len(self.lines)
+
+    def append(self, line):
+        self.lines.append(line)
+        self.count += 1
+
+    def extend(self, lines):
+        self.lines.extend(lines)
+        self.count += len(lines)
+
+    def __getitem__(self, key):
+        lines = list(self.lines)
+        if isinstance(key, slice):
+            start = 0 if key.start is None else max(0, key.start - self.start)
+            stop = None if key.stop is None else max(0, key.stop - self.start)
+            return lines[start:stop]
+        index = key - self.start
+        if index < 0 or index >= len(lines):
+            raise IndexError(key)
+        return lines[index]
+
+
 # The implementation of this class depends only on _DiffInfo's interface.
 class _DiffDescriber(object):
 
@@ -151,6 +236,92 @@ class _DiffDescriber(object):
         return report
 
 
+class _HunkDescriber(object):
+
+    """
+    Describes every difference between two sequences of lines as hunks.
+
+    The format is similar to a unified diff from the expected lines to
+    the actual lines.
+
+    """
+
+    def __init__(self, context=3, max_hunks=None):
+        """
+
+        context: the number of lines of context to include.
+
+        max_hunks: the maximum number of hunks to include, or None
+          for no limit.
+
+        """
+        self.context = context
+        self.max_hunks = max_hunks
+
+    def _format_range(self, start, stop):
+        """
+        Example:
+
+        >>> d = _HunkDescriber()
+        >>> d._format_range(3, 4), d._format_range(3, 7), d._format_range(3, 3)
+        ('4', '4,4', '3,0')
+
+        """
+        beginning = start + 1
+        length = stop - start
+        if length == 1:
+            return "%d" % beginning
+        if not length:
+            beginning -= 1
+        return "%d,%d" % (beginning, length)
+
+    def _format_line(self, prefix, line):
+        if not line.endswith("\n"):
+            line += "\n\\ No newline at end of file\n"
+        return prefix + line
+
+    def describe(self, opcodes, seqs, offset=0):
+        """
+        Describe the differences between the two sequences of lines.
+
+        Returns a sequence of strings.
+
+        Arguments:
+
+          opcodes: a list of opcodes transforming the expected lines
+            into the actual lines.
+
+          seqs: a pair (actual, expected) of sequences of lines.
+
+          offset: the line index in the original files of the first line
+            in each sequence.  Used only to number the lines.
+
+        """
+        actual, expected = seqs
+        groups = group_opcodes(opcodes, self.context)
+        shown = groups if self.max_hunks is None else groups[:self.max_hunks]
+
+        report = ["differences found in %d hunk%s.\n" %
+                  (len(groups), "" if len(groups) == 1 else "s"),
+                  "--- expected\n", "+++ actual\n"]
+        for group in shown:
+            first, last = group[0], group[-1]
+            ranges = (self._format_range(first[1] + offset, last[2] + offset),
+                      self._format_range(first[3] + offset, last[4] + offset))
+            report.append("@@ -%s +%s @@\n" % ranges)
+            for tag, i1, i2, j1, j2 in group:
+                if tag == 'equal':
+                    # Show the actual lines since the expected lines may
+                    # contain fuzz.
+                    report.extend(self._format_line(" ", line) for line in actual[j1:j2])
+                    continue
+                report.extend(self._format_line("-", line) for line in expected[i1:i2])
+                report.extend(self._format_line("+", line) for line in actual[j1:j2])
+        if len(shown) < len(groups):
+            report.append("(%d more hunks not shown)\n" % (len(groups) - len(shown)))
+        return report
+
+
 # TODO: switch from using this to the _LineDiffer class below.
 def match_fuzzy(u1, u2, marker=None):
     if marker is None:
@@ -174,6 +345,31 @@ def match_fuzzy(u1, u2, marker=None):
     return True
 
 
+def merge_fuzz(u1, u2, fuzz=None):
+    """
+    Return the first string, keeping the lines of the second that have fuzz.
+
+    Lines of the second (i.e. expected) string that contain fuzz are kept
+    in place of the lines of the first string that they fuzzily match.
+    This lets one update an expected string without losing its fuzz.
+    For example--
+
+    >>> merge_fuzz(u"a\\nb 1\\nc 2\\nd\\n", u"b ...\\nc ...\\nx\\n")
+    u'a\\nb ...\\nc ...\\nd\\n'
+
+    """
+    if fuzz is None:
+        fuzz = defaults.DIFF_FUZZ
+    actual, expected = (u.splitlines(True) for u in (u1, u2))
+    comparer = _LineComparer(fuzz=fuzz)
+    equal = lambda expected_line, actual_line: comparer._lines_equal((actual_line, expected_line))
+    opcodes = get_opcodes(expected, actual, equal=equal)
+    lines = []
+    for tag, i1, i2, j1, j2 in opcodes:
+        lines.extend(expected[i1:i2] if tag == 'equal' else actual[j1:j2])
+    return "".join(lines)
+
+
 # TODO: remove this class.
 class DirComparer(object):
 
@@ -194,14 +390,38 @@ class _LineComparer(object):
 
     """
 
-    def __init__(self, fuzz=None):
+    def __init__(self, fuzz=None, segments=None):
+        """
+        Arguments:
+
+          segments: an optional dict mapping expected lines containing
+            fuzz to their precomputed list of parts (e.g. from a manifest).
+
+        """
+        if segments is None:
+            segments = {}
         self.fuzz = fuzz
+        self.segments = segments
+        self._regexes = {}
 
     def has_fuzz(self, expected):
         return self.fuzz is not None and self.fuzz in expected
 
     def _expected_parts(self, expected):
-        return expected.split(self.fuzz)
+        try:
+            # Return a copy since callers may modify the list.
+            return list(self.segments[expected])
+        except KeyError:
+            return expected.split(self.fuzz)
+
+    def _fuzzy_regex(self, expected):
+        """Return the compiled regular expression for an expected line."""
+        try:
+            return self._regexes[expected]
+        except KeyError:
+            regex = re.compile(self.re_pattern(expected))
+            self._regexes[expected] = regex
+            return regex
 
     def _re_pattern(self, parts):
         return "^%s" % ".*".join([re.escape(part) for part in parts])
@@ -227,7 +447,7 @@ class _LineComparer(object):
         if not self.has_fuzz(line2):
             return line1 == line2
         # Otherwise, use fuzzy matching.
-        return re.match(self.re_pattern(line2), line1) is not None
+        return self._fuzzy_regex(line2).match(line1) is not None
 
     def _compare_lines_exact(self, lines):
         """
@@ -305,6 +525,41 @@ class _LineComparer(object):
             return self._compare_lines_fuzzy(lines)
         return self._compare_lines_exact(lines)
 
+    def _skip_equal_lines(self, seqs):
+        """
+        Return the index of the first pair of lines that may differ.
+
+        If NumPy is available and the sequences are long enough, the
+        lines are put in object arrays so that equal lines can be skipped
+        with a vectorized comparison.  The comparison compares the lines
+        themselves, so unlike comparing hashes it cannot mistake
+        different lines for equal.  Equal lines are also equal for
+        expected lines with fuzz since fuzz matches itself.  Only the
+        pairs that differ (e.g. expected lines with fuzz) are checked
+        individually.  Otherwise, returns 0.
+
+        Parameters:
+
+          seqs: a pair of lists of unicode lines.
+
+        """
+        count = min(len(seq) for seq in seqs)
+        if count < _VECTORIZE_MIN_LINES or _import_numpy() is None:
+            return 0
+        actual, expected = seqs
+        arrays = []
+        for seq in seqs:
+            # Assigning into an empty array keeps NumPy from treating
+            # the strings as sequences.
+            array = numpy.empty(count, dtype=object)
+            array[:] = seq[:count]
+            arrays.append(array)
+        for index in numpy.flatnonzero(arrays[0] != arrays[1]):
+            index = int(index)
+            if not self._lines_equal((actual[index], expected[index])):
+                return index
+        return count
+
     def compare_seqs(self, seqs):
         """
         Compare two sequences of unicode lines.
@@ -313,7 +568,9 @@ class _LineComparer(object):
         returns None.
 
         """
-        for line_index, lines in enumerate(zip(*seqs)):
+        start_index = self._skip_equal_lines(seqs)
+        pairs = itertools.izip(*(itertools.islice(seq, start_index, None) for seq in seqs))
+        for line_index, lines in enumerate(pairs, start_index):
             if self._lines_equal(lines):
                 continue
             # Otherwise, the lines are different.
@@ -325,26 +582,49 @@ class _LineComparer(object):
                 return None
             # Otherwise, one sequence has more lines, in which case
             # character indices do not apply.
-            line_index += 1
+            line_index = min(len(seq) for seq in seqs)
             char_indices = None
         return _DiffInfo(line_index=line_index, char_indices=char_indices)
 
 
 class _StringComparer(object):
 
-    def __init__(self, fuzz=None, context=None):
+    def __init__(self, fuzz=None, context=None, max_hunks=None):
+        """
+        Arguments:
+
+          max_hunks: if not None, describe every differing hunk (up to
+            max_hunks hunks) rather than only the first difference.
+
+        """
         if context is None:
             context = defaults.DIFF_CONTEXT
         if fuzz is None:
             fuzz = defaults.DIFF_FUZZ
         self.context = context
         self.fuzz = fuzz
+        self.max_hunks = max_hunks
 
     def _describe(self, info, seqs):
         describer = _DiffDescriber(context=self.context)
         info = describer.describe(info, seqs)
         return info
 
+    def _describe_hunks(self, comparer, seqs, offset=0):
+        """
+        Describe every hunk, or return None if there are too many edits.
+
+        """
+        actual, expected = seqs
+        equal = lambda expected_line, actual_line: comparer._lines_equal((actual_line, expected_line))
+        opcodes = get_opcodes(expected, actual, equal=equal,
+                              max_d=defaults.DIFF_MAX_EDITS)
+        if opcodes is None:
+            _log.debug("too many differences to describe every hunk")
+            return None
+        describer = _HunkDescriber(context=self.context, max_hunks=self.max_hunks)
+        return describer.describe(opcodes, seqs, offset=offset)
+
     def compare_strings(self, strs):
         """
         Compare whether two unicode strings match.
@@ -362,8 +642,81 @@ class _StringComparer(object):
         info = comparer.compare_seqs(seqs)
         if info is None:
             return []
+        if self.max_hunks is not None:
+            report = self._describe_hunks(comparer, seqs)
+            if report is not None:
+                return report
         return self._describe(info, seqs)
 
+    def compare_lines(self, iters, segments=None):
+        """
+        Compare whether two iterables of unicode lines match.
+
+        Lines are consumed only up to the first difference, and only the
+        lines needed for the context of the description are retained.
+        This keeps memory use bounded regardless of the number of lines.
+
+        Returns the same value as compare_strings().
+
+        Parameters:
+
+          iters: a pair of iterables of unicode lines, each line
+            including its line ending (as with splitlines(True)).
+
+          segments: see the _LineComparer constructor.
+
+        """
+        comparer = _LineComparer(fuzz=self.fuzz, segments=segments)
+        iters = [iter(lines) for lines in iters]
+        windows = tuple(_LineWindow(self.context + 1) for i in range(2))
+        offset = 0
+        while True:
+            # Reading lines in blocks lets compare_seqs() skip equal lines
+            # many at a time.
+            blocks = [list(itertools.islice(lines, _BLOCK_LINES)) for lines in iters]
+            info = comparer.compare_seqs(blocks)
+            if info is not None:
+                break
+            if not blocks[0]:
+                return []
+            for window, block in zip(windows, blocks):
+                window.extend(block)
+            offset += len(blocks[0])
+        # Retain the lines through the differing line, and put back
+        # the lines after it.
+        end = info.line_index + 1
+        for window, block in zip(windows, blocks):
+            window.extend(block[:end])
+        iters = [itertools.chain(block[end:], lines) for block, lines in zip(blocks, iters)]
+        info = _DiffInfo(line_index=offset + info.line_index,
+                         char_indices=info.char_indices)
+        if self.max_hunks is not None:
+            return self._describe_rest(comparer, info, windows, iters)
+        return self._describe(info, windows)
+
+    def _describe_rest(self, comparer, info, windows, iters):
+        """
+        Read the rest of the lines and describe every hunk.
+
+        Falls back to describing the first difference if there are
+        more than defaults.DIFF_MAX_LINES remaining lines or more than
+        defaults.DIFF_MAX_EDITS edits.
+
+        """
+        max_lines = defaults.DIFF_MAX_LINES
+        rests = [list(itertools.islice(lines, max_lines + 1)) for lines in iters]
+        if any(len(rest) > max_lines for rest in rests):
+            _log.debug("too many lines to describe every hunk")
+            return self._describe(info, windows)
+        # Start both sequences at the same line so line numbers agree.
+        offset = max(window.start for window in windows)
+        seqs = tuple(window[offset:window.count] + rest for
+                     window, rest in zip(windows, rests))
+        report = self._describe_hunks(comparer, seqs, offset=offset)
+        if report is None:
+            return self._describe(info, windows)
+        return report
+
 
 class _FileComparer(object):
 
@@ -371,32 +724,153 @@ class _FileComparer(object):
         """
         Parameters:
 
-          scomparer: an object with a compare_strings(strs) method.
+          scomparer: an object with a compare_lines(iters) method.
 
         """
         self.scomparer = scomparer
 
-    # TODO: handle binary files differently.
+    def _describe_binary(self, path):
+        return ["Binary files differ: %s\n" % path]
+
     # TODO: handle alternate encodings.
+    def compare_files(self, paths, segments=None):
+        """
+        Compare two text files.
+
+        The files are read line by line rather than all at once, so
+        comparing very large files does not require holding them in memory.
+        Files that cannot be decoded are compared byte for byte.
+
+        """
+        path1, path2 = paths
+        try:
+            with molt_io.open_text(path1, _ENCODING, _ERRORS) as f1:
+                with molt_io.open_text(path2, _ENCODING, _ERRORS) as f2:
+                    return self.scomparer.compare_lines((f1, f2), segments=segments)
+        except UnicodeDecodeError:
+            _log.debug("comparing as binary: %s" % path2)
+        if compare_files(path1, path2):
+            return []
+        return self._describe_binary(path2)
+
+    def compare_data(self, b, path, segments=None):
+        """
+        Compare the bytes of a file not on disk with a text file.
+
+        """
+        try:
+            # Split the lines in the same way as molt_io.open_text().
+            lines = io.StringIO(b.decode(_ENCODING, _ERRORS), newline='')
+            with molt_io.open_text(path, _ENCODING, _ERRORS) as f:
+                return self.scomparer.compare_lines((lines, f), segments=segments)
+        except UnicodeDecodeError:
+            _log.debug("comparing as binary: %s" % path)
+        with open(path, 'rb') as f:
+            if f.read() == b:
+                return []
+        return self._describe_binary(path)
+
+
+class _IndexedFileComparer(object):
+
+    """
+    Compares files using a manifest of the expected directory.
+
+    Expected files without fuzz are compared by size and digest, so the
+    expected file is only opened if the files differ (to describe the
+    difference).  Expected files with fuzz are compared line by line
+    using the fuzzy line segments recorded in the manifest.
+
+    """
+
+    def __init__(self, fcomparer, manifest):
+        """
+        Parameters:
+
+          fcomparer: a _FileComparer instance.
+
+          manifest: an ExpectedManifest instance.
+
+        """
+        self.fcomparer = fcomparer
+        self.manifest = manifest
+
+    def compare_files(self, paths):
+        actual_path, expected_path = paths
+        entry = self.manifest.get_entry(expected_path)
+        if entry is None:
+            return self.fcomparer.compare_files(paths)
+        if entry.has_fuzz:
+            segments = entry.make_patterns(self.manifest.fuzz)
+            return self.fcomparer.compare_files(paths, segments=segments)
+        if (os.path.getsize(actual_path) == entry.size and
+            molt_io.hash_file(actual_path) == entry.digest):
+            return []
+        return self.fcomparer.compare_files(paths)
+
+    def compare_data(self, b, path):
+        entry = self.manifest.get_entry(path)
+        if entry is None:
+            return self.fcomparer.compare_data(b, path)
+        if entry.has_fuzz:
+            segments = entry.make_patterns(self.manifest.fuzz)
+            return self.fcomparer.compare_data(b, path, segments=segments)
+        if len(b) == entry.size and molt_io.hash_bytes(b) == entry.digest:
+            return []
+        return self.fcomparer.compare_data(b, path)
+
+
+class _TreeFileComparer(object):
+
+    """
+    Compares the files of a RenderedTree with files on disk.
+
+    """
+
+    def __init__(self, fcomparer, tree):
+        """
+        Parameters:
+
+          fcomparer: a _FileComparer or _IndexedFileComparer instance.
+
+          tree: a molter.RenderedTree instance.
+
+        """
+        self.fcomparer = fcomparer
+        self.tree = tree
+
     def compare_files(self, paths):
-        """Compare two text files."""
-        strs = (molt_io.read(path, encoding=_ENCODING, errors=_ENCODING) for
-                path in paths)
-        return self.scomparer.compare_strings(strs)
+        """
+        Parameters:
+
+          paths: a pair (rel_path, expected_path), where rel_path is
+            the path of a file in the tree.
+
+        """
+        rel_path, expected_path = paths
+        try:
+            source_path = self.tree.copies[rel_path]
+        except KeyError:
+            return self.fcomparer.compare_data(self.tree.files[rel_path], expected_path)
+        return self.fcomparer.compare_files((source_path, expected_path))
 
 
 class Customizer(object):
 
     """Customizes DirComparer behavior."""
 
-    def __init__(self, fcomparer):
+    def __init__(self, fcomparer, show_diffs=True):
         """
         Parameters:
 
           comparer: an object with a compare_files(paths) method.
 
+          show_diffs: whether to print the differences of each differing
+            file.
+
         """
         self.fcomparer = fcomparer
+        self.show_diffs = show_diffs
 
     def files_same(self, path1, path2):
         _log.debug("comparing: %s and %s" % (path1, path2))
@@ -417,6 +891,8 @@ class Customizer(object):
 
         """
         _log.info("found different file: %s" % (rel_path, ))
+        if not self.show_diffs:
+            return
         # Otherwise we have a list of strings describing the difference.
         print("".join(result))
 
@@ -451,19 +927,45 @@ class Comparer(object):
 
     """
 
-    def __init__(self, fuzz=None, context=None):
+    def __init__(self, fuzz=None, context=None, ignore=None, manifest=None,
+                 max_hunks=None):
+        """
+        Arguments:
+
+          ignore: an IgnoreMatcher instance of paths to skip when
+            comparing directories.  Defaults to the patterns in
+            defaults.DIRCMP_IGNORE.
+
+          manifest: an optional ExpectedManifest instance for the
+            expected directory, to avoid reading expected files
+            that do not contain fuzz.
+
+          max_hunks: if not None, report every differing hunk of each
+            file (up to max_hunks) instead of only the first difference.
+
+        """
         if context is None:
             context = defaults.DIFF_CONTEXT
         if fuzz is None:
             fuzz = defaults.DIFF_FUZZ
+        if ignore is None:
+            ignore = IgnoreMatcher(defaults.DIRCMP_IGNORE)
         self.context = context
         self.fuzz = fuzz
+        self.ignore = ignore
+        self.manifest = manifest
+        self.max_hunks = max_hunks
 
-    def _dir_comparer(self):
-        scomparer = _StringComparer(fuzz=self.fuzz, context=self.context)
+    def _dir_comparer(self, tree=None, show_diffs=True):
+        scomparer = _StringComparer(fuzz=self.fuzz, context=self.context,
+                                    max_hunks=self.max_hunks)
         fcomparer = _FileComparer(scomparer=scomparer)
-        customizer = Customizer(fcomparer=fcomparer)
-        return dirdiff.DirComparer(custom=customizer)
+        if self.manifest is not None:
+            fcomparer = _IndexedFileComparer(fcomparer, self.manifest)
+        if tree is not None:
+            fcomparer = _TreeFileComparer(fcomparer, tree)
+        customizer = Customizer(fcomparer=fcomparer, show_diffs=show_diffs)
+        return dirdiff.DirComparer(custom=customizer, ignore=self.ignore)
 
     def compare_strings(self, strs):
         """
@@ -500,6 +1002,40 @@ class Comparer(object):
         _log.info("comparing directories: %s to %s" % dirs)
         dir_comparer = self._dir_comparer()
         info = dir_comparer.diff(*dirs)
+        return self._report(info)
+
+    def compare_tree(self, tree, expected_dir):
+        """
+        Return whether an in-memory rendered tree matches a directory.
+
+        Parameters:
+
+          tree: a molter.RenderedTree instance.
+
+        """
+        _log.info("comparing rendered tree to: %s" % expected_dir)
+        info = self.diff_tree(tree, expected_dir)
+        return self._report(info)
+
+    def diff_tree(self, tree, expected_dir, show_diffs=True):
+        """
+        Compare an in-memory rendered tree with a directory.
+
+        Returns a dirdiff.DirDiffInfo instance.
+
+        Parameters:
+
+          tree: a molter.RenderedTree instance.
+
+          show_diffs: whether to print the differences of each differing
+            file.
+
+        """
+        dir_comparer = self._dir_comparer(tree=tree, show_diffs=show_diffs)
+        return dir_comparer.diff(tree.ROOT, expected_dir,
+                                 list_funcs=(tree.list_dir, None))
+
+    def _report(self, info):
         does_match = info.does_match()
         if not does_match:
             print(repr(info))
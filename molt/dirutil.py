@@ -40,6 +40,8 @@ from shutil import copytree
 import stat
 
 from molt.general.error import Error
+from molt.general.ignore import IgnoreMatcher
+import molt.general.io as molt_io
 from molt import defaults
 
 
@@ -102,6 +104,34 @@ def make_available_dir(output_dir, format_dir_name=None):
         index += 1
 
 
+def make_ignore_matcher(template_dir=None, patterns=None):
+    """
+    Return an IgnoreMatcher for comparing rendered and expected directories.
+
+    The matcher combines, in increasing order of precedence, the patterns
+    in defaults.DIRCMP_IGNORE, the given patterns, and the patterns in the
+    template directory's ignore file (if the file exists).
+
+    Arguments:
+
+      template_dir: the path to a Groome template directory, or None.
+
+      patterns: an optional list of additional gitignore-style patterns.
+
+    """
+    all_patterns = list(defaults.DIRCMP_IGNORE)
+    if patterns is not None:
+        all_patterns.extend(patterns)
+    if template_dir is not None:
+        chooser = DirectoryChooser()
+        path = chooser.get_ignore_path(template_dir)
+        if path is not None:
+            u = molt_io.read(path, defaults.FILE_ENCODING, defaults.ENCODING_ERRORS)
+            all_patterns.extend(u.splitlines())
+
+    return IgnoreMatcher(all_patterns)
+
+
 def set_executable_bit(path):
     """
     Set the executable bits on a file.
@@ -217,6 +247,17 @@ class DirectoryChooser(object):
     def get_expected_dir(self, template_dir):
         return self._get_dir(template_dir, defaults.TEMPLATE_EXPECTED_DIR_NAME)
 
+    def has_expected_dir(self, path):
+        """
+        Return whether a path is a template directory with an expected directory.
+
+        """
+        names = (defaults.TEMPLATE_PROJECT_DIR_NAME, defaults.TEMPLATE_EXPECTED_DIR_NAME)
+        return all(self._get_dir(path, name) is not None for name in names)
+
+    def get_ignore_path(self, template_dir):
+        return self._get_dir(template_dir, defaults.TEMPLATE_IGNORE_FILE_NAME)
+
     def get_config_path(self, path, template_dir):
         """
         Arguments:
@@ -38,16 +38,25 @@ from __future__ import absolute_import
 
 import filecmp
 import os
-import sys
 
 # TODO: remove the dependency on molt.defaults.
 import molt.defaults as molt_defaults
+from molt.general.ignore import IgnoreMatcher
 import molt.general.io as molt_io
 
 
 _ENCODING = molt_defaults.FILE_ENCODING
 
 
+def list_dir(dir_path):
+    """
+    Return a dict mapping the names in a directory to whether each is a directory.
+
+    """
+    return dict((name, os.path.isdir(os.path.join(dir_path, name))) for
+                name in os.listdir(dir_path))
+
+
 def compare_files(path1, path2):
     """
     Return whether the file contents at the given paths are the same.
@@ -126,7 +135,6 @@ class DirComparer(object):
 
     # TODO: add a "max differences" argument that causes the function
     #   to terminate when that many differences are encountered.
-    # TODO: add support for ignoring files matching a certain pattern, etc.
     # TODO: remove the compare parameter.
     def __init__(self, compare=None, ignore=None, custom=None):
         """
@@ -137,6 +145,10 @@ class DirComparer(object):
             the same.  Defaults to compare_files.  If provided, the
             custom argument is ignored.
 
+          ignore: an IgnoreMatcher instance, or a list of gitignore-style
+            patterns of paths to skip.  Ignored directories are not
+            descended into.  Defaults to ignoring nothing.
+
           custom: an instance of a subclass of Customizer.
 
         """
@@ -148,68 +160,85 @@ class DirComparer(object):
 
         compare_func = compare_files if compare is None else compare
 
+        if not isinstance(ignore, IgnoreMatcher):
+            ignore = IgnoreMatcher(ignore)
+
         self.ignore = ignore
         self.compare_func = compare_func
         self.custom = custom
 
-    def _diff(self, dcmp, results, leading_path=''):
+    def _list_dir(self, list_func, dir_path, leading_path):
+        """
+        Return a dict mapping each non-ignored name to whether it is a directory.
+
+        """
+        return self.ignore.filter_names(list_func(dir_path), leading_path)
+
+    def _diff(self, dirs, results, list_funcs, leading_path=''):
         """
-        Recursively compare a filecmp.dircmp instance.
+        Recursively compare two directories.
 
         This method modifies the results container in place.
 
         Parameters:
 
-          dcmp: a filecmp.dircmp instance.
+          dirs: a pair of directory paths.
 
           results: a three-tuple of (left_only, right_only, diff_files).
 
+          list_funcs: a pair of functions like list_dir() for listing
+            the directories on each side.
+
           leading_path: the path at which the directory comparison
             is taking place.  The path is relative to the top-level
             directories passed to the initial call to diff().
 
         """
-        # TODO: simplify the implementation of this method if possible.
-        # For example, eliminate the use of on-the-fly lambdas.
-        make_rel_path = lambda name: os.path.join(leading_path, name)
-
-        # Since the file comparer being used may be more forgiving than the
-        # exact-match default, we need to check the names in dcmp.diff_files
-        # again to see if any are the same under the looser condition.
-        #
-        # Since dircmp only does "shallow" file comparisons (i.e. doesn't
-        # look at file contents), we need to check the files in
-        # dcmp.same_files again to see if they might in fact be different.
-        # See also: http://bugs.python.org/issue15250
+        left, right = (self._list_dir(func, path, leading_path) for
+                       func, path in zip(list_funcs, dirs))
+
+        left_only = [name for name in left if name not in right]
+        right_only = [name for name in right if name not in left]
+        common = sorted(name for name in left if name in right)
+
+        # A name that is a file on one side and a directory on the other
+        # is reported as only on each side, since the entries differ in
+        # kind rather than in contents.
+        mixed = [name for name in common if left[name] != right[name]]
+        left_only.extend(mixed)
+        right_only.extend(mixed)
+
+        # We compare every common file with the custom comparison since
+        # it may be either more or less forgiving than an exact match.
         diff_files = []
-        # The common_files list includes: same_files, diff_files, funny_files.
-        for name in dcmp.common_files:
-            paths = (os.path.join(path, name) for path in (dcmp.left, dcmp.right))
+        sub_dirs = []
+        for name in common:
+            is_dirs = left[name], right[name]
+            if all(is_dirs):
+                sub_dirs.append(name)
+                continue
+            if any(is_dirs):
+                # Then the name was added to left_only and right_only.
+                continue
+            paths = (os.path.join(path, name) for path in dirs)
             result = self.custom.files_same(*paths)
             if not result is True:
-                rel_path = make_rel_path(name)
+                rel_path = os.path.join(leading_path, name)
                 self.custom.on_diff_file(rel_path, result)
                 diff_files.append(name)
 
         # Process the higher-level paths before recursing so notifications
         # about these paths will occur earlier.
-        # TODO: incorporate common_funny into the result, which are names
-        # that may, for example, be a file name in one directory and a
-        # directory name in the other.
-        name_lists = [dcmp.left_only, dcmp.right_only, diff_files]
+        name_lists = [left_only, right_only, diff_files]
         for result_paths, names in zip(results, name_lists):
-            new_paths = [make_rel_path(name) for name in names]
-            result_paths.extend(new_paths)
+            result_paths.extend(os.path.join(leading_path, name) for name in names)
 
-        for dir_name, sub_dcmp in dcmp.subdirs.iteritems():
-            path = make_rel_path(dir_name)
-            self._diff(sub_dcmp, results, leading_path=path)
+        for name in sub_dirs:
+            sub_dirs_pair = tuple(os.path.join(path, name) for path in dirs)
+            self._diff(sub_dirs_pair, results, list_funcs,
+                       leading_path=os.path.join(leading_path, name))
 
-
-    # TODO: reimplement this method without using filecmp.dircmp because
-    # this might be more straightforward and easier to understand given
-    # filecmp.dircmp's use of shallow comparisons, etc.
-    def diff(self, dir1, dir2):
+    def diff(self, dir1, dir2, list_funcs=None):
         """
         Compare the directories at the given paths.
 
@@ -217,10 +246,20 @@ class DirComparer(object):
 
         Returns a DirDiffInfo instance.
 
+        Parameters:
+
+          list_funcs: an optional pair of functions to use instead of
+            list_dir() for listing the directories on each side, for
+            example to compare a directory tree that is not on disk.
+            A None item means to use list_dir().
+
         """
+        if list_funcs is None:
+            list_funcs = (None, None)
+        list_funcs = [list_dir if func is None else func for func in list_funcs]
         info = DirDiffInfo([] for i in range(3))
-        dcmp = filecmp.dircmp(dir1, dir2, ignore=self.ignore)
-        self._diff(dcmp, info)
+        self._diff((dir1, dir2), info, list_funcs)
         # Normalize the result sequences for testing and display purposes.
-        map(lambda seq: seq.sort(), info)
+        for seq in info:
+            seq.sort()
         return info
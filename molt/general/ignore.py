@@ -0,0 +1,243 @@
+# encoding: utf-8
+#
+# Copyright (C) 2012 Chris Jerdonek. All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# * Redistributions of source code must retain the above copyright notice,
+#   this list of conditions and the following disclaimer.
+# * Redistributions in binary form must reproduce the above copyright notice,
+#   this list of conditions and the following disclaimer in the documentation
+#   and/or other materials provided with the distribution.
+# * The names of the copyright holders may not be used to endorse or promote
+#   products derived from this software without specific prior written
+#   permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+# CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+# SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+#
+
+"""
+Provides gitignore-style matching of relative paths.
+
+An IgnoreMatcher compiles a list of patterns into a small number of
+regular expressions, so checking whether a path is ignored does not
+require looping over the patterns in Python.  The supported syntax is
+the subset of gitignore syntax that makes sense for comparing
+directories:
+
+  * Blank lines and lines beginning with "#" are skipped.
+  * A leading "!" negates the pattern.  The last matching pattern wins.
+  * A trailing "/" makes the pattern match only directories.
+  * A pattern containing a "/" (other than a trailing one) is anchored
+    to the root.  Otherwise it matches a name at any depth.
+  * "*", "?" and "[...]" match within a single path component, and "**"
+    matches across path components.
+
+As with git, if a directory is ignored then callers should not descend
+into it.  This module does not check whether a parent directory is
+ignored when matching a path.
+
+"""
+
+from __future__ import absolute_import
+
+import os
+import re
+
+
+def _translate_glob(glob):
+    """
+    Translate a glob (without "!" or a trailing "/") into a regex string.
+
+    """
+    parts = []
+    i, n = 0, len(glob)
+    while i < n:
+        c = glob[i]
+        if c == '*':
+            if glob[i:i + 2] == '**' and (i == 0 or glob[i - 1] == '/'):
+                if glob[i + 2:i + 3] == '/':
+                    # Then "**/" matches zero or more directories.
+                    parts.append('(?:.*/)?')
+                    i += 3
+                    continue
+                if i + 2 == n:
+                    # Then a trailing "**" matches everything inside.
+                    parts.append('.+')
+                    i += 2
+                    continue
+            parts.append('[^/]*')
+            # Collapse any run of stars that is not special.
+            while glob[i:i + 1] == '*':
+                i += 1
+            continue
+        if c == '?':
+            parts.append('[^/]')
+        elif c == '[':
+            # A "]" immediately after the "[" is part of the set.
+            j = glob.find(']', i + 2)
+            if j < 0:
+                parts.append(re.escape(c))
+            else:
+                chars = glob[i + 1:j].replace('\\', '\\\\')
+                if chars.startswith('!'):
+                    chars = '^' + chars[1:]
+                parts.append('[%s]' % chars)
+                i = j
+        elif c == '\\' and i + 1 < n:
+            i += 1
+            parts.append(re.escape(glob[i]))
+        else:
+            parts.append(re.escape(c))
+        i += 1
+    return ''.join(parts)
+
+
+def compile_pattern(line):
+    """
+    Return a pair (regex_string, is_negated) for a line of patterns text.
+
+    Returns None if the line is blank or a comment.
+
+    Examples:
+
+    >>> compile_pattern("docs")
+    ('(?:.*/)?docs/?', False)
+    >>> compile_pattern("!/build/")
+    ('build/', True)
+    >>> compile_pattern("# comment") is None
+    True
+
+    """
+    line = line.rstrip()
+    if not line or line.startswith('#'):
+        return None
+    is_negated = line.startswith('!')
+    if is_negated:
+        line = line[1:]
+    elif line.startswith('\\!') or line.startswith('\\#'):
+        line = line[1:]
+    is_dir_only = line.endswith('/')
+    line = line.rstrip('/')
+    if not line:
+        return None
+    is_anchored = '/' in line
+    line = line.lstrip('/')
+
+    prefix = '' if is_anchored else '(?:.*/)?'
+    suffix = '/' if is_dir_only else '/?'
+    regex = "%s%s%s" % (prefix, _translate_glob(line), suffix)
+
+    return regex, is_negated
+
+
+class IgnoreMatcher(object):
+
+    """
+    Decides whether relative paths should be ignored.
+
+    For example--
+
+    >>> matcher = IgnoreMatcher(['*.pyc', 'build/', '!keep.pyc'])
+    >>> matcher.matches('a/b.pyc')
+    True
+    >>> matcher.matches('a/keep.pyc')
+    False
+    >>> matcher.matches('build'), matcher.matches('build', is_dir=True)
+    (False, True)
+
+    """
+
+    def __init__(self, patterns=None):
+        """
+        Arguments:
+
+          patterns: an iterable of gitignore-style pattern strings.
+            Later patterns take precedence over earlier ones.
+
+        """
+        if patterns is None:
+            patterns = []
+        self.patterns = list(patterns)
+        self._groups = self._compile(self.patterns)
+
+    def __repr__(self):
+        return "%s(%r)" % (self.__class__.__name__, self.patterns)
+
+    def _compile(self, patterns):
+        """
+        Return a list of (regex, is_negated) pairs, one per run of patterns.
+
+        Consecutive patterns with the same sign are combined into a
+        single alternation, so the number of regexes is the number of
+        sign changes rather than the number of patterns.
+
+        """
+        runs = []
+        for line in patterns:
+            compiled = compile_pattern(line)
+            if compiled is None:
+                continue
+            regex, is_negated = compiled
+            if runs and runs[-1][1] == is_negated:
+                runs[-1][0].append(regex)
+            else:
+                runs.append(([regex], is_negated))
+
+        groups = []
+        for regexes, is_negated in runs:
+            source = "^(?:%s)\\Z" % "|".join(regexes)
+            groups.append((re.compile(source, re.DOTALL), is_negated))
+        return groups
+
+    def matches(self, path, is_dir=False):
+        """
+        Return whether the given path should be ignored.
+
+        Arguments:
+
+          path: a path relative to the root of the directories being
+            walked, using either "/" or os.sep as the separator.
+
+          is_dir: whether the path is a directory.
+
+        """
+        if not self._groups:
+            return False
+        if os.sep != '/':
+            path = path.replace(os.sep, '/')
+        if is_dir:
+            path += '/'
+        # The last matching pattern decides, so check the runs in reverse.
+        for regex, is_negated in reversed(self._groups):
+            if regex.match(path) is not None:
+                return not is_negated
+        return False
+
+    def filter_names(self, entries, leading_path=''):
+        """
+        Return a copy of a directory listing without the ignored names.
+
+        Arguments:
+
+          entries: a dict mapping each name in the directory to whether
+            it is a directory (e.g. as returned by dirdiff.list_dir()).
+
+          leading_path: the path of the directory relative to the root.
+
+        """
+        if not self._groups:
+            return dict(entries)
+        return dict((name, is_dir) for name, is_dir in entries.iteritems() if
+                    not self.matches(os.path.join(leading_path, name), is_dir=is_dir))
@@ -35,7 +35,9 @@ Exposes wrapper functions for file IO.
 from __future__ import absolute_import
 
 import codecs
+import hashlib
 from contextlib import contextmanager
+import io
 import json
 import logging
 import os
@@ -47,11 +49,23 @@ from molt.general.error import reraise
 
 _log = logging.getLogger(__name__)
 
-try:
-    # We make it so that not having YAML is not fatal.
-    import yaml
-except ImportError, err:
-    _log.debug("yaml not found: %s" % repr(err))
+_CHUNK_SIZE = 64 * 1024
+
+
+def _import_yaml():
+    """
+    Import and return the yaml module.
+
+    We import yaml only when reading a YAML file since importing it is
+    slow, and we make it so that not having YAML is only fatal then.
+
+    """
+    try:
+        import yaml
+    except ImportError, err:
+        _log.debug("yaml not found: %s" % repr(err))
+        raise
+    return yaml
 
 
 def read(path, encoding, errors):
@@ -69,13 +83,55 @@ def read(path, encoding, errors):
         reraise("path: %s" % path)
 
 
+def open_text(path, encoding, errors):
+    """
+    Open a text file for iterating over its lines as unicode strings.
+
+    Line endings are not translated, so the lines are the same as those
+    returned by read(...).splitlines(True), except that only "\\n", "\\r"
+    and "\\r\\n" are treated as line endings.
+
+    """
+    return io.open(path, 'r', encoding=encoding, errors=errors, newline='')
+
+
+def hash_file(path):
+    """
+    Return the hex SHA-1 digest of the contents of a file.
+
+    """
+    sha = hashlib.sha1()
+    with open(path, 'rb') as f:
+        while True:
+            b = f.read(_CHUNK_SIZE)
+            if not b:
+                break
+            sha.update(b)
+    return sha.hexdigest()
+
+
+def hash_bytes(b):
+    """
+    Return the hex SHA-1 digest of a byte string, as hash_file() would.
+
+    """
+    return hashlib.sha1(b).hexdigest()
+
+
 def write(u, path, encoding, errors):
     """
     Write a unicode string to a file.
 
     """
     b = u.encode(encoding=encoding, errors=errors)
+    write_bytes(b, path)
+
 
+def write_bytes(b, path):
+    """
+    Write a byte string to a file.
+
+    """
     _log.debug("Writing: %s" % repr(str(path)))
     with open(path, 'wb') as f:
         f.write(b)
@@ -128,7 +184,7 @@ def deserialize(path, encoding, errors):
     ext = os.path.splitext(path)[1]
 
     if ext.startswith(".y"):  # e.g. ".yaml" or ".yml".
-        return yaml.safe_load(u)
+        return _import_yaml().safe_load(u)
     return json.loads(u)
 
 
@@ -138,6 +194,7 @@ def unserialize_yaml_file(path, encoding):
     Deserialize a yaml file.
 
     """
+    yaml = _import_yaml()
     with codecs.open(path, "r", encoding=encoding) as f:
         data = yaml.load(f)
 
@@ -0,0 +1,215 @@
+# encoding: utf-8
+#
+# Copyright (C) 2012 Chris Jerdonek. All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# * Redistributions of source code must retain the above copyright notice,
+#   this list of conditions and the following disclaimer.
+# * Redistributions in binary form must reproduce the above copyright notice,
+#   this list of conditions and the following disclaimer in the documentation
+#   and/or other materials provided with the distribution.
+# * The names of the copyright holders may not be used to endorse or promote
+#   products derived from this software without specific prior written
+#   permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+# CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+# SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+#
+
+"""
+Provides an O(ND) difference algorithm with a pluggable line equality.
+
+This is the greedy algorithm from Eugene W. Myers, "An O(ND) Difference
+Algorithm and Its Variations" (1986).  Unlike Python's difflib, it lets
+the caller decide when two items are equal, which lets callers treat
+some items (e.g. lines containing a wildcard) as matching many others.
+
+The functions return and accept opcodes in the same format as
+difflib.SequenceMatcher.get_opcodes(): 5-tuples (tag, i1, i2, j1, j2)
+with tag one of 'equal', 'replace', 'delete' and 'insert'.
+
+"""
+
+from __future__ import absolute_import
+
+import operator
+
+
+def _shortest_edit(a, b, equal, max_d):
+    """
+    Return the list of "V" arrays for each edit distance, or None.
+
+    Returns None if the sequences differ by more than max_d edits.
+
+    """
+    n, m = len(a), len(b)
+    v = {1: 0}
+    trace = []
+    for d in range(max_d + 1):
+        trace.append(v.copy())
+        for k in range(-d, d + 1, 2):
+            if k == -d or (k != d and v[k - 1] < v[k + 1]):
+                # Then move down (an insertion).
+                x = v[k + 1]
+            else:
+                # Otherwise, move right (a deletion).
+                x = v[k - 1] + 1
+            y = x - k
+            # Follow the "snake" of equal items.
+            while x < n and y < m and equal(a[x], b[y]):
+                x += 1
+                y += 1
+            v[k] = x
+            if x >= n and y >= m:
+                return trace
+    return None
+
+
+def _backtrack(trace, n, m):
+    """
+    Return the list of (i, j) index pairs of matching items, in order.
+
+    """
+    matches = []
+    x, y = n, m
+    for d in range(len(trace) - 1, -1, -1):
+        v = trace[d]
+        k = x - y
+        if k == -d or (k != d and v[k - 1] < v[k + 1]):
+            prev_k = k + 1
+        else:
+            prev_k = k - 1
+        prev_x = v[prev_k]
+        prev_y = prev_x - prev_k
+        while x > prev_x and y > prev_y:
+            x -= 1
+            y -= 1
+            matches.append((x, y))
+        x, y = prev_x, prev_y
+    matches.reverse()
+    return matches
+
+
+def _make_opcodes(matches, n, m):
+    """
+    Convert a list of matching index pairs into a list of opcodes.
+
+    """
+    opcodes = []
+    i = j = 0
+    # The sentinel flushes the final non-matching run.
+    for mi, mj in matches + [(n, m)]:
+        if i < mi and j < mj:
+            opcodes.append(('replace', i, mi, j, mj))
+        elif i < mi:
+            opcodes.append(('delete', i, mi, j, j))
+        elif j < mj:
+            opcodes.append(('insert', i, i, j, mj))
+        if mi == n and mj == m:
+            break
+        if opcodes and opcodes[-1][0] == 'equal' and opcodes[-1][2] == mi:
+            tag, i1, i2, j1, j2 = opcodes.pop()
+            opcodes.append((tag, i1, mi + 1, j1, mj + 1))
+        else:
+            opcodes.append(('equal', mi, mi + 1, mj, mj + 1))
+        i, j = mi + 1, mj + 1
+    return opcodes
+
+
+def get_opcodes(a, b, equal=None, max_d=None):
+    """
+    Return a list of opcodes that transform sequence a into sequence b.
+
+    Returns None if the sequences differ by more than max_d insertions
+    and deletions, which bounds the running time at O((N + M) * max_d).
+
+    Arguments:
+
+      equal: a function that accepts an item of a and an item of b, and
+        returns whether they should be considered equal.  Defaults to
+        the == operator.
+
+      max_d: the maximum number of edits to search.  Defaults to no limit.
+
+    For example--
+
+    >>> get_opcodes("abcabba", "cbabac")
+    [('delete', 0, 2, 0, 0), ('equal', 2, 3, 0, 1), ('insert', 3, 3, 1, 2), ('equal', 3, 5, 2, 4), ('delete', 5, 6, 4, 4), ('equal', 6, 7, 4, 5), ('insert', 7, 7, 5, 6)]
+
+    """
+    if equal is None:
+        equal = operator.eq
+    n, m = len(a), len(b)
+
+    # Trimming the common prefix and suffix first is cheap and often
+    # leaves very little for the quadratic part of the algorithm.
+    prefix = 0
+    while prefix < n and prefix < m and equal(a[prefix], b[prefix]):
+        prefix += 1
+    suffix = 0
+    while (suffix < n - prefix and suffix < m - prefix and
+           equal(a[n - 1 - suffix], b[m - 1 - suffix])):
+        suffix += 1
+
+    a_mid, b_mid = a[prefix:n - suffix], b[prefix:m - suffix]
+    n_mid, m_mid = len(a_mid), len(b_mid)
+    if max_d is None or max_d > n_mid + m_mid:
+        max_d = n_mid + m_mid
+
+    trace = _shortest_edit(a_mid, b_mid, equal, max_d)
+    if trace is None:
+        return None
+    matches = [(i + prefix, j + prefix) for i, j in _backtrack(trace, n_mid, m_mid)]
+
+    all_matches = ([(i, i) for i in range(prefix)] + matches +
+                   [(n - suffix + i, m - suffix + i) for i in range(suffix)])
+
+    return _make_opcodes(all_matches, n, m)
+
+
+def group_opcodes(opcodes, context=3):
+    """
+    Isolate change clusters by eliminating ranges with no changes.
+
+    Returns a list of groups, each a list of opcodes with up to context
+    items of surrounding equal opcodes.  This is the same as
+    difflib.SequenceMatcher.get_grouped_opcodes(), but for any opcodes.
+
+    """
+    codes = list(opcodes)
+    if not codes:
+        codes = [('equal', 0, 1, 0, 1)]
+    # Fix up leading and trailing groups if they show no changes.
+    if codes[0][0] == 'equal':
+        tag, i1, i2, j1, j2 = codes[0]
+        codes[0] = tag, max(i1, i2 - context), i2, max(j1, j2 - context), j2
+    if codes[-1][0] == 'equal':
+        tag, i1, i2, j1, j2 = codes[-1]
+        codes[-1] = tag, i1, min(i2, i1 + context), j1, min(j2, j1 + context)
+
+    groups = []
+    group = []
+    span = context * 2
+    for tag, i1, i2, j1, j2 in codes:
+        # End the current group and start a new one whenever
+        # there is a large range with no changes.
+        if tag == 'equal' and i2 - i1 > span:
+            group.append((tag, i1, min(i2, i1 + context), j1, min(j2, j1 + context)))
+            groups.append(group)
+            group = []
+            i1, j1 = max(i1, i2 - context), max(j1, j2 - context)
+        group.append((tag, i1, i2, j1, j2))
+    if group and not (len(group) == 1 and group[0][0] == 'equal'):
+        groups.append(group)
+    return groups
@@ -0,0 +1,352 @@
+# encoding: utf-8
+#
+# Copyright (C) 2012 Chris Jerdonek. All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# * Redistributions of source code must retain the above copyright notice,
+#   this list of conditions and the following disclaimer.
+# * Redistributions in binary form must reproduce the above copyright notice,
+#   this list of conditions and the following disclaimer in the documentation
+#   and/or other materials provided with the distribution.
+# * The names of the copyright holders may not be used to endorse or promote
+#   products derived from this software without specific prior written
+#   permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+# CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+# SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+#
+
+"""
+Supports indexing a template's expected directory for faster checking.
+
+The index (or "manifest") records for each expected file its relative
+path, size, modification time, and SHA-1 digest, and whether the file
+contains fuzz.  For
+files containing fuzz, it also records the fuzzy lines already split
+into their literal segments.  When checking a template, files without
+fuzz can then be compared by digest without opening the expected file,
+and only files with fuzz need to be decoded and compared line by line.
+
+The manifest is considered stale and is not used if a file was added to
+or removed from the expected directory, or if the size or modification
+time of an expected file or of the template's ignore file differs from
+what the manifest recorded.  Because modification times can be coarse,
+an expected file whose recorded modification time is not older than the
+manifest itself is also compared by digest.
+
+"""
+
+from __future__ import absolute_import
+
+import json
+import logging
+import os
+
+from molt import defaults
+from molt.dirutil import make_ignore_matcher, DirectoryChooser
+from molt.general.error import Error
+import molt.general.io as molt_io
+
+
+MANIFEST_VERSION = 2
+
+_ENCODING = defaults.FILE_ENCODING
+_ERRORS = defaults.ENCODING_ERRORS
+
+_log = logging.getLogger(__name__)
+
+
+def get_manifest_path(template_dir):
+    return os.path.join(template_dir, defaults.TEMPLATE_MANIFEST_FILE_NAME)
+
+
+def _to_rel_path(leading_path, name):
+    return "%s/%s" % (leading_path, name) if leading_path else name
+
+
+def _get_stat(path):
+    """
+    Return the [size, mtime] pair of a file, or None if path is None.
+
+    """
+    if path is None:
+        return None
+    stat = os.stat(path)
+    return [stat.st_size, stat.st_mtime]
+
+
+def _iter_files(expected_dir, ignore):
+    """
+    Yield a (rel_path, path) pair for each file in the expected directory.
+
+    """
+    def iter_dir(dir_path, leading_path):
+        for name in os.listdir(dir_path):
+            path = os.path.join(dir_path, name)
+            rel_path = _to_rel_path(leading_path, name)
+            is_dir = os.path.isdir(path)
+            if ignore.matches(rel_path, is_dir=is_dir):
+                continue
+            if is_dir:
+                for item in iter_dir(path, rel_path):
+                    yield item
+                continue
+            yield rel_path, path
+
+    return iter_dir(expected_dir, '')
+
+
+def _fuzzy_segments(path, fuzz):
+    """
+    Return a list of (line_index, parts) pairs for the fuzzy lines of a file.
+
+    Returns None if the file cannot be decoded as text.
+
+    """
+    try:
+        segments = []
+        with molt_io.open_text(path, _ENCODING, _ERRORS) as f:
+            for line_index, line in enumerate(f):
+                if fuzz in line:
+                    segments.append((line_index, line.split(fuzz)))
+    except UnicodeDecodeError:
+        return None
+    return segments
+
+
+class ManifestEntry(object):
+
+    """
+    Describes a single file in an expected directory.
+
+    """
+
+    def __init__(self, size, digest, segments=None, mtime=None):
+        """
+        Arguments:
+
+          mtime: the modification time of the file when it was indexed.
+
+          segments: a list of (line_index, parts) pairs, where parts is
+            the list of literal strings between fuzz markers on the line.
+            An empty list or None means that the file has no fuzz.
+
+        """
+        if segments is None:
+            segments = []
+        self.digest = digest
+        self.mtime = mtime
+        self.segments = segments
+        self.size = size
+
+    @property
+    def has_fuzz(self):
+        return bool(self.segments)
+
+    def make_patterns(self, fuzz):
+        """
+        Return a dict mapping each fuzzy line to its parts.
+
+        """
+        return dict((fuzz.join(parts), parts) for line_index, parts in self.segments)
+
+    def to_json(self):
+        return {'size': self.size, 'mtime': self.mtime, 'sha1': self.digest,
+                'fuzz': self.has_fuzz,
+                'segments': [[i, parts] for i, parts in self.segments]}
+
+    @classmethod
+    def from_json(cls, data):
+        segments = [(i, parts) for i, parts in data['segments']]
+        return cls(size=data['size'], digest=data['sha1'], segments=segments,
+                   mtime=data['mtime'])
+
+
+class ExpectedManifest(object):
+
+    """
+    An index of the files in a template's expected directory.
+
+    """
+
+    def __init__(self, expected_dir, entries, fuzz=None, ignore_stat=None):
+        """
+        Arguments:
+
+          entries: a dict mapping "/"-separated relative paths to
+            ManifestEntry instances.
+
+          ignore_stat: the [size, mtime] pair of the template's ignore
+            file when the directory was indexed, or None if there was none.
+
+        """
+        if fuzz is None:
+            fuzz = defaults.DIFF_FUZZ
+        self.entries = entries
+        self.expected_dir = expected_dir
+        self.fuzz = fuzz
+        self.ignore_stat = ignore_stat
+
+    @classmethod
+    def build(cls, expected_dir, ignore, fuzz=None, ignore_path=None):
+        """
+        Index the expected directory and return an ExpectedManifest.
+
+        Arguments:
+
+          ignore: an IgnoreMatcher instance of paths to leave out.
+
+          ignore_path: the path to the ignore file that ignore was read
+            from, or None.
+
+        """
+        if fuzz is None:
+            fuzz = defaults.DIFF_FUZZ
+        entries = {}
+        for rel_path, path in _iter_files(expected_dir, ignore):
+            # Stat the file before reading it so that a change made while
+            # indexing shows up as a different modification time.
+            size, mtime = _get_stat(path)
+            segments = _fuzzy_segments(path, fuzz)
+            entries[rel_path] = ManifestEntry(size=size, mtime=mtime,
+                                              digest=molt_io.hash_file(path),
+                                              segments=segments)
+
+        return cls(expected_dir, entries, fuzz=fuzz,
+                   ignore_stat=_get_stat(ignore_path))
+
+    def is_stale(self, ignore, ignore_path, written_time):
+        """
+        Return whether the expected directory changed since it was indexed.
+
+        Arguments:
+
+          ignore: an IgnoreMatcher instance of paths to leave out.
+
+          ignore_path: the path to the ignore file that ignore was read
+            from, or None.
+
+          written_time: the modification time of the manifest file.
+
+        """
+        if _get_stat(ignore_path) != self.ignore_stat:
+            return True
+        rel_paths = set()
+        for rel_path, path in _iter_files(self.expected_dir, ignore):
+            entry = self.entries.get(rel_path)
+            if entry is None or _get_stat(path) != [entry.size, entry.mtime]:
+                return True
+            # Then the file may have changed within the same clock tick
+            # as the manifest was written, leaving its mtime unchanged.
+            if entry.mtime >= written_time and molt_io.hash_file(path) != entry.digest:
+                return True
+            rel_paths.add(rel_path)
+        return len(rel_paths) != len(self.entries)
+
+    def get_entry(self, path):
+        """
+        Return the ManifestEntry for a path in the expected directory, or None.
+
+        """
+        rel_path = os.path.relpath(path, self.expected_dir)
+        if os.sep != '/':
+            rel_path = rel_path.replace(os.sep, '/')
+        return self.entries.get(rel_path)
+
+    def to_json(self):
+        files = dict((rel_path, entry.to_json()) for
+                     rel_path, entry in self.entries.items())
+        return {'version': MANIFEST_VERSION, 'fuzz': self.fuzz,
+                'ignore': self.ignore_stat, 'files': files}
+
+    def write(self, path):
+        u = json.dumps(self.to_json(), indent=2, separators=(',', ': '),
+                       sort_keys=True)
+        if not isinstance(u, unicode):
+            u = u.decode('ascii')
+        molt_io.write(u + u"\n", path, _ENCODING, _ERRORS)
+
+    @classmethod
+    def read(cls, path, expected_dir):
+        data = json.loads(molt_io.read(path, _ENCODING, _ERRORS))
+        if data.get('version') != MANIFEST_VERSION:
+            return None
+        entries = dict((rel_path, ManifestEntry.from_json(entry)) for
+                       rel_path, entry in data['files'].items())
+        return cls(expected_dir, entries, fuzz=data['fuzz'],
+                   ignore_stat=data['ignore'])
+
+
+def is_stale(template_dir, expected_dir):
+    """
+    Return whether the manifest is missing or out of date.
+
+    """
+    manifest_path = get_manifest_path(template_dir)
+    if not os.path.exists(manifest_path):
+        return True
+    manifest = ExpectedManifest.read(manifest_path, expected_dir)
+    if manifest is None:
+        return True
+    return _is_stale(manifest, template_dir, manifest_path)
+
+
+def _is_stale(manifest, template_dir, manifest_path):
+    chooser = DirectoryChooser()
+    ignore_path = chooser.get_ignore_path(template_dir)
+    ignore = make_ignore_matcher(template_dir)
+    return manifest.is_stale(ignore, ignore_path, os.path.getmtime(manifest_path))
+
+
+def index_expected_dir(template_dir, chooser=None):
+    """
+    Write the manifest of a template's expected directory, and return its path.
+
+    """
+    if chooser is None:
+        chooser = DirectoryChooser()
+    expected_dir = chooser.get_expected_dir(template_dir)
+    if expected_dir is None:
+        raise Error("Expected directory not found in template: %s" % template_dir)
+    ignore = make_ignore_matcher(template_dir)
+    ignore_path = chooser.get_ignore_path(template_dir)
+    manifest = ExpectedManifest.build(expected_dir, ignore, ignore_path=ignore_path)
+    path = get_manifest_path(template_dir)
+    manifest.write(path)
+    _log.info("indexed %d files in: %s" % (len(manifest.entries), expected_dir))
+    return path
+
+
+def load_manifest(template_dir, expected_dir, fuzz=None):
+    """
+    Return the ExpectedManifest for a template, or None if unavailable.
+
+    Returns None if the manifest does not exist, is stale, or was written
+    for a different fuzz marker or manifest version.
+
+    """
+    if fuzz is None:
+        fuzz = defaults.DIFF_FUZZ
+    path = get_manifest_path(template_dir)
+    if not os.path.exists(path):
+        _log.debug("expected manifest missing: %s" % template_dir)
+        return None
+    manifest = ExpectedManifest.read(path, expected_dir)
+    if manifest is None or manifest.fuzz != fuzz:
+        return None
+    if _is_stale(manifest, template_dir, path):
+        _log.debug("expected manifest stale: %s" % template_dir)
+        return None
+    _log.debug("using expected manifest: %s" % path)
+    return manifest
@@ -34,10 +34,12 @@ Exposes a Molter class to render a template directory.
 
 from __future__ import absolute_import
 
+from functools import partial
 import logging
 import os
 from shutil import copyfile
 from subprocess import Popen, PIPE, STDOUT
+import time
 
 from pystache import Renderer as PystacheRenderer
 
@@ -47,6 +49,7 @@ from molt.general.error import Error
 from molt.general.popen import call_script
 from  molt import defaults
 from molt.dirutil import DirectoryChooser
+from molt.profiler import NullProfile
 
 
 TEMPLATE_EXT = '.mustache'
@@ -74,13 +77,23 @@ def preprocess_filename(filename):
     return filename, is_template
 
 
-def _lambda_from_script(path):
+def _lambda_from_script(path, on_call=None):
+    """
+    Arguments:
+
+      on_call: a function to call after each call to the script with
+        the arguments (seconds, bytes_in, bytes_out).
+
+    """
     def func(u=None):
         if u is None:
             u = ''
         bytes_in = u.encode(defaults.LAMBDA_ENCODING, errors=defaults.ENCODING_ERRORS)
 
+        start_time = time.time()
         stdout, stderr, return_code = call_script(path, bytes_in)
+        if on_call is not None:
+            on_call(time.time() - start_time, len(bytes_in), len(stdout))
 
         return stdout.decode(defaults.LAMBDA_ENCODING, errors=defaults.ENCODING_ERRORS)
 
@@ -89,13 +102,31 @@ def _lambda_from_script(path):
 
 class Molter(object):
 
-    def __init__(self, encoding='utf-8', decode_errors='strict', chooser=None):
+    def __init__(self, encoding='utf-8', decode_errors='strict', chooser=None,
+                 profile=None, observers=None):
+        """
+        Arguments:
+
+          profile: a molt.profiler.RenderProfile instance to record the
+            time spent rendering each file and calling each lambda.
+
+          observers: an iterable of molt.observers.RenderObserver
+            instances to notify of render events.
+
+        """
         if chooser is None:
             chooser = DirectoryChooser()
+        if observers is None:
+            observers = []
 
         self.chooser = chooser
         self.decode_errors = decode_errors
         self.encoding = encoding
+        self.observers = list(observers)
+        self.profile = profile
+
+        # The number of lambda calls in the render in progress.
+        self._lambda_calls = 0
 
     def _get_config_path(self, template_dir, config_path):
         return self.chooser.get_config_path(config_path, template_dir)
@@ -134,23 +165,40 @@ class Molter(object):
                 continue
 
             script_path = os.path.join(lambda_dir, file_name)
-            func = _lambda_from_script(script_path)
             root_name, ext = os.path.splitext(file_name)
 
             root_name = unicode(root_name)
+            on_call = None
+            if self.profile is not None or self.observers:
+                on_call = partial(self._on_lambda_call, root_name)
+            func = _lambda_from_script(script_path, on_call=on_call)
 
             lambdas[root_name] = func
 
         return lambdas
 
-    # TODO: create a class to hold and pass the arguments along.
-    def molt(self, template_dir, output_dir, config_path=None):
+    def _on_lambda_call(self, name, seconds, bytes_in, bytes_out):
+        self._lambda_calls += 1
+        if self.profile is not None:
+            self.profile.add_lambda_call(name, seconds, bytes_in, bytes_out)
+        for observer in self.observers:
+            observer.on_lambda_call(name, seconds)
+
+    def _render(self, template_dir, config_path, target, output_dir):
         chooser = self.chooser
+        observers = self.observers
+
+        start_time = time.time()
+        self._lambda_calls = 0
+        for observer in observers:
+            observer.on_render_start(template_dir)
 
         project_dir = chooser.get_project_dir(template_dir)
         partials_dir = chooser.get_partials_dir(template_dir)
         lambdas_dir = chooser.get_lambdas_dir(template_dir)
         config_path = self._get_config_path(template_dir, config_path)
+        profile = self.profile or NullProfile()
+        profile.start_render(template_dir, project_dir, output_dir)
 
         context = self.get_context(template_dir, config_path)
 
@@ -169,10 +217,158 @@ Rendering:
 
         pystache_renderer = PystacheRenderer(search_dirs=search_dirs, file_encoding=self.encoding)
 
-        renderer = _Renderer(pystache_renderer)
+        renderer = _Renderer(pystache_renderer, target=target, profile=profile,
+                             observers=observers)
 
         renderer.render(structure_dir=project_dir, context=context, output_dir=output_dir)
+        profile.end_render()
+        if observers:
+            stats = {'template_dir': template_dir, 'files': len(renderer.origins),
+                     'bytes': renderer.bytes_written, 'lambda_calls': self._lambda_calls,
+                     'seconds': time.time() - start_time}
+            for observer in observers:
+                observer.on_render_done(stats)
+
+        start_dir = output_dir or os.curdir
+        return dict((os.path.relpath(new_path, start_dir), os.path.relpath(path, project_dir)) for
+                    new_path, path in renderer.origins.iteritems())
+
+    # TODO: create a class to hold and pass the arguments along.
+    def molt(self, template_dir, output_dir, config_path=None):
+        """
+        Render a template to an output directory.
+
+        Returns a dict mapping the path of each output file relative to
+        the output directory to the path of the file it was rendered or
+        copied from, relative to the template structure directory.
+
+        """
+        origins = self._render(template_dir, config_path, target=_DirTarget(),
+                               output_dir=output_dir)
         _log.debug("Wrote new project to: %s" % repr(output_dir))
+        return origins
+
+    def render_tree(self, template_dir, config_path=None):
+        """
+        Render a template in memory, and return a RenderedTree instance.
+
+        """
+        tree = RenderedTree()
+        self._render(template_dir, config_path, target=tree,
+                     output_dir=RenderedTree.ROOT)
+        _log.debug("Rendered project in memory: %d files" % len(tree))
+        return tree
+
+
+class _DirTarget(object):
+
+    """
+    Writes rendered output to the file system.
+
+    A render target has the methods below, each accepting paths that
+    start with the output directory passed to _Renderer.render().
+
+    """
+
+    def has_dir(self, path):
+        return os.path.isdir(path)
+
+    def make_dir(self, path):
+        os.mkdir(path)
+
+    def copy_file(self, source_path, path):
+        copyfile(source_path, path)
+
+    def write_file(self, u, path):
+        io.write(u, path, defaults.OUTPUT_FILE_ENCODING, defaults.ENCODING_ERRORS)
+
+
+class RenderedTree(object):
+
+    """
+    A render target that keeps the rendered output in memory.
+
+    Paths are relative to the output root.  Rendered files are kept as
+    the encoded bytes that would have been written, and files that would
+    have been copied as-is are kept as the path of their source file.
+
+    """
+
+    ROOT = ''
+
+    def __init__(self):
+        # A dict mapping each directory to a dict mapping the names in
+        # that directory to whether the name is a directory.
+        self.dirs = {self.ROOT: {}}
+        self.files = {}
+        self.copies = {}
+
+    def __len__(self):
+        return len(self.files) + len(self.copies)
+
+    def _add(self, path, is_dir):
+        dir_path, name = os.path.split(path)
+        self.dirs[dir_path][name] = is_dir
+
+    def has_dir(self, path):
+        return path in self.dirs
+
+    def make_dir(self, path):
+        self._add(path, True)
+        self.dirs[path] = {}
+
+    def copy_file(self, source_path, path):
+        self._add(path, False)
+        self.copies[path] = source_path
+
+    def write_file(self, u, path):
+        self._add(path, False)
+        self.files[path] = u.encode(defaults.OUTPUT_FILE_ENCODING,
+                                    defaults.ENCODING_ERRORS)
+
+    def read(self, path):
+        """
+        Return the contents of a file in the tree as bytes.
+
+        """
+        try:
+            return self.files[path]
+        except KeyError:
+            with open(self.copies[path], 'rb') as f:
+                return f.read()
+
+    def list_dir(self, path):
+        """
+        Return a dict mapping the names in a directory to whether each is a directory.
+
+        """
+        return dict(self.dirs[path])
+
+    def write(self, output_dir, path=None):
+        """
+        Write the tree to an existing directory.
+
+        Arguments:
+
+          output_dir: the directory corresponding to the root of the tree.
+
+          path: the path of a file or directory in the tree to write
+            instead of the whole tree.  The parent directory of the path
+            must exist in the output directory.
+
+        """
+        if path is None:
+            path = self.ROOT
+        target_path = os.path.join(output_dir, path)
+        if path in self.dirs:
+            if path != self.ROOT:
+                os.mkdir(target_path)
+            for name in sorted(self.dirs[path]):
+                self.write(output_dir, os.path.join(path, name))
+        elif path in self.files:
+            io.write_bytes(self.files[path], target_path)
+        else:
+            copyfile(self.copies[path], target_path)
 
 
 # TODO: combine this class with the Molter class.
@@ -183,14 +379,38 @@ class _Renderer(object):
 
     """
 
-    def __init__(self, pystache_renderer):
+    def __init__(self, pystache_renderer, target=None, profile=None,
+                 observers=None):
         """
         Arguments:
 
           pystacher: a pystache.Renderer instance.
 
+          target: the object to write the rendered output to, for example
+            a RenderedTree instance.  Defaults to writing to disk.
+
+          profile: a molt.profiler.RenderProfile instance on which a
+            render has been started.
+
+          observers: a list of molt.observers.RenderObserver instances
+            to notify as each file is rendered.
+
         """
+        if observers is None:
+            observers = []
+        if profile is None:
+            profile = NullProfile()
+        if target is None:
+            target = _DirTarget()
+        # The number of bytes written, which is only counted if there
+        # are observers.
+        self.bytes_written = 0
+        self.observers = observers
+        # A dict mapping each output file path to its source path.
+        self.origins = {}
+        self.profile = profile
         self.pystacher = pystache_renderer
+        self.target = target
 
     def _parse_basename(self, path, context, preprocess):
         """
@@ -238,19 +458,56 @@ class _Renderer(object):
         """
         Render the template at a path to a file.
 
+        Returns the unicode string written.
+
+        """
+        with self.profile.timing('render_seconds'):
+            u = self._render_path_to_string(path, context)
+        with self.profile.timing('write_seconds'):
+            self.target.write_file(u, target_path)
+        return u
+
+    def _notify_file_done(self, path, u, start_time):
+        """
+        Arguments:
+
+          u: the rendered unicode string, or None if the file was copied.
+
         """
-        u = self._render_path_to_string(path, context)
-        io.write(u, target_path, defaults.OUTPUT_FILE_ENCODING, defaults.ENCODING_ERRORS)
+        seconds = time.time() - start_time
+        if u is None:
+            bytes_out = os.path.getsize(path)
+        else:
+            bytes_out = len(u.encode(defaults.OUTPUT_FILE_ENCODING,
+                                     defaults.ENCODING_ERRORS))
+        self.bytes_written += bytes_out
+        for observer in self.observers:
+            observer.on_file_done(path, bytes_out, seconds)
 
     def molt_file(self, path, context, output_dir):
-        filename, is_template = self.parse_filename(path, context)
+        observers = self.observers
+        if observers:
+            start_time = time.time()
+            for observer in observers:
+                observer.on_file_start(path)
+        profile = self.profile
+        profile.start_file(path)
+        with profile.timing('name_seconds'):
+            filename, is_template = self.parse_filename(path, context)
 
         new_path = os.path.join(output_dir, filename)
+        self.origins[new_path] = path
 
         if not is_template:
-            copyfile(path, new_path)
+            u = None
+            with profile.timing('copy_seconds'):
+                self.target.copy_file(path, new_path)
         else:
-            self._render_path_to_file(path, context, new_path)
+            u = self._render_path_to_file(path, context, new_path)
+        profile.end_file(new_path, u)
+
+        if observers:
+            self._notify_file_done(path, u, start_time)
 
     def _molt_dir(self, dir_path, context, output_dir):
         """
@@ -269,7 +526,7 @@ class _Renderer(object):
             # Otherwise, it is a directory.
             new_name = self.parse_dirname(path, context)[0]
             new_output_dir = os.path.join(output_dir, new_name)
-            os.mkdir(new_output_dir)
+            self.target.make_dir(new_output_dir)
             self._molt_dir(path, context, new_output_dir)
 
     def render(self, structure_dir, context, output_dir):
@@ -287,7 +544,7 @@ class _Renderer(object):
         #   actually called by end-users.
         if not os.path.exists(structure_dir):
             raise (Error("Structure directory missing: %s" % structure_dir))
-        if not os.path.exists(output_dir):
+        if not self.target.has_dir(output_dir):
             raise (Error("Output directory missing: %s" % output_dir))
 
         self._molt_dir(structure_dir, context, output_dir)
@@ -0,0 +1,125 @@
+# encoding: utf-8
+#
+# Copyright (C) 2012 Chris Jerdonek. All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# * Redistributions of source code must retain the above copyright notice,
+#   this list of conditions and the following disclaimer.
+# * Redistributions in binary form must reproduce the above copyright notice,
+#   this list of conditions and the following disclaimer in the documentation
+#   and/or other materials provided with the distribution.
+# * The names of the copyright holders may not be used to endorse or promote
+#   products derived from this software without specific prior written
+#   permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+# CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+# SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+#
+
+"""
+Exposes classes to observe the rendering of templates.
+
+"""
+
+from __future__ import absolute_import
+
+import json
+import os
+import time
+
+
+class RenderObserver(object):
+
+    """
+    Base class for objects notified of events while rendering a template.
+
+    Pass instances to the Molter constructor.  Subclasses should override
+    the methods of the events they are interested in.  File paths are the
+    paths of files in the template structure directory.
+
+    """
+
+    def on_render_start(self, template_dir):
+        pass
+
+    def on_file_start(self, path):
+        pass
+
+    def on_file_done(self, path, bytes, seconds):
+        """
+        Arguments:
+
+          bytes: the number of bytes written (or copied) to the output.
+
+          seconds: the time taken to render (or copy) the file, including
+            rendering its name.
+
+        """
+        pass
+
+    def on_lambda_call(self, name, seconds):
+        pass
+
+    def on_render_done(self, stats):
+        """
+        Arguments:
+
+          stats: a dict with keys "template_dir", "files", "bytes",
+            "lambda_calls", and "seconds".
+
+        """
+        pass
+
+
+class NdjsonObserver(RenderObserver):
+
+    """
+    Writes each event as a line of JSON (NDJSON) to a file descriptor.
+
+    Each line is a JSON object with an "event" key naming the event
+    (for example "file_done"), a "time" key with the time of the event
+    as returned by time.time(), and a key for each argument of the event.
+    Each line is written with a single os.write() call where possible.
+    Only lines shorter than PIPE_BUF bytes (at least 512, and 4096 on
+    Linux) are guaranteed not to be interleaved with the lines of other
+    processes writing to the same pipe.  Longer lines may be written in
+    several parts.
+
+    """
+
+    def __init__(self, fd):
+        self.fd = fd
+
+    def _write(self, event, **kwargs):
+        kwargs.update(event=event, time=time.time())
+        data = json.dumps(kwargs, sort_keys=True) + "\n"
+        # os.write() can write fewer bytes than given, for example to a
+        # pipe for a record longer than PIPE_BUF.
+        while data:
+            data = data[os.write(self.fd, data):]
+
+    def on_render_start(self, template_dir):
+        self._write('render_start', template_dir=template_dir)
+
+    def on_file_start(self, path):
+        self._write('file_start', path=path)
+
+    def on_file_done(self, path, bytes, seconds):
+        self._write('file_done', path=path, bytes=bytes, seconds=seconds)
+
+    def on_lambda_call(self, name, seconds):
+        self._write('lambda_call', name=name, seconds=seconds)
+
+    def on_render_done(self, stats):
+        self._write('render_done', **stats)
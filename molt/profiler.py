@@ -0,0 +1,241 @@
+# encoding: utf-8
+#
+# Copyright (C) 2012 Chris Jerdonek. All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# * Redistributions of source code must retain the above copyright notice,
+#   this list of conditions and the following disclaimer.
+# * Redistributions in binary form must reproduce the above copyright notice,
+#   this list of conditions and the following disclaimer in the documentation
+#   and/or other materials provided with the distribution.
+# * The names of the copyright holders may not be used to endorse or promote
+#   products derived from this software without specific prior written
+#   permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+# CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+# SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+#
+
+"""
+Exposes a RenderProfile class to time the rendering of templates.
+
+"""
+
+from __future__ import absolute_import
+
+from contextlib import contextmanager
+import json
+import os
+import time
+
+from molt import defaults
+
+
+# The version of the JSON format written by RenderProfile.write_json().
+FORMAT_VERSION = 1
+
+# The keys of the times recorded for each file.  The render time includes
+# the time spent in lambdas called while rendering.
+FILE_TIME_KEYS = ('name_seconds', 'render_seconds', 'lambda_seconds',
+                  'write_seconds', 'copy_seconds')
+
+
+class NullProfile(object):
+
+    """
+    A profile that records nothing, for when profiling is not enabled.
+
+    """
+
+    def start_render(self, template_dir, structure_dir, output_dir):
+        pass
+
+    def end_render(self):
+        pass
+
+    def start_file(self, path):
+        pass
+
+    def end_file(self, path, u=None):
+        pass
+
+    @contextmanager
+    def timing(self, key):
+        yield
+
+    def add_lambda_call(self, name, seconds, bytes_in, bytes_out):
+        pass
+
+
+class RenderProfile(NullProfile):
+
+    """
+    Records the time spent rendering each file and calling each lambda.
+
+    Paths are recorded relative to the template structure directory and
+    the output directory.  The recorded data consists of lists of dicts
+    so that it can be serialized to JSON or passed between processes
+    (see the to_dict() and update() methods).
+
+    """
+
+    def __init__(self):
+        self.renders = []
+        self.files = []
+        self.lambdas = []
+
+        # The state of the render in progress.
+        self._file = None
+        self._file_start_time = None
+        self._lambdas = None
+        self._output_dir = None
+        self._render = None
+        self._start_time = None
+        self._structure_dir = None
+
+    def start_render(self, template_dir, structure_dir, output_dir):
+        self._render = {'template_dir': template_dir, 'seconds': 0.0,
+                        'files': 0}
+        self._lambdas = {}
+        self._output_dir = output_dir or os.curdir
+        self._structure_dir = structure_dir
+        self._start_time = time.time()
+
+    def end_render(self):
+        render = self._render
+        render['seconds'] = time.time() - self._start_time
+        self.renders.append(render)
+        self.lambdas.extend(self._lambdas[name] for name in sorted(self._lambdas))
+        self._render = None
+        self._lambdas = None
+
+    def start_file(self, path):
+        entry = {
+            'template_dir': self._render['template_dir'],
+            'path': os.path.relpath(path, self._structure_dir),
+            'output_path': None,
+            'kind': None,
+            'seconds': 0.0,
+            'bytes_in': os.path.getsize(path),
+            'bytes_out': 0,
+        }
+        entry.update((key, 0.0) for key in FILE_TIME_KEYS)
+        self._file = entry
+        self._file_start_time = time.time()
+
+    def end_file(self, path, u=None):
+        """
+        Arguments:
+
+          path: the output path.
+
+          u: the rendered unicode string, or None if the file was copied.
+
+        """
+        entry = self._file
+        entry['seconds'] = time.time() - self._file_start_time
+        entry['output_path'] = os.path.relpath(path, self._output_dir)
+        if u is None:
+            entry['kind'] = 'copy'
+            entry['bytes_out'] = entry['bytes_in']
+        else:
+            entry['kind'] = 'render'
+            entry['bytes_out'] = len(u.encode(defaults.OUTPUT_FILE_ENCODING,
+                                              defaults.ENCODING_ERRORS))
+        self.files.append(entry)
+        self._render['files'] += 1
+        self._file = None
+
+    @contextmanager
+    def timing(self, key):
+        """
+        Add the time spent in the with block to a time of the current file.
+
+        """
+        start_time = time.time()
+        try:
+            yield
+        finally:
+            self._file[key] += time.time() - start_time
+
+    def add_lambda_call(self, name, seconds, bytes_in, bytes_out):
+        try:
+            stats = self._lambdas[name]
+        except KeyError:
+            stats = {'template_dir': self._render['template_dir'],
+                     'name': name, 'calls': 0, 'seconds': 0.0,
+                     'bytes_in': 0, 'bytes_out': 0}
+            self._lambdas[name] = stats
+        stats['calls'] += 1
+        stats['seconds'] += seconds
+        stats['bytes_in'] += bytes_in
+        stats['bytes_out'] += bytes_out
+        if self._file is not None:
+            self._file['lambda_seconds'] += seconds
+
+    def to_dict(self):
+        return {'version': FORMAT_VERSION, 'renders': self.renders,
+                'files': self.files, 'lambdas': self.lambdas}
+
+    def update(self, data):
+        """
+        Add the data returned by another profile's to_dict() method.
+
+        """
+        self.renders.extend(data['renders'])
+        self.files.extend(data['files'])
+        self.lambdas.extend(data['lambdas'])
+
+    def write_json(self, path):
+        with open(path, 'w') as f:
+            json.dump(self.to_dict(), f, indent=2, sort_keys=True)
+            f.write('\n')
+
+    def _format_path(self, entry):
+        if len(self.renders) > 1:
+            return os.path.join(entry['template_dir'], entry['path'])
+        return entry['path']
+
+    def format_report(self, count):
+        """
+        Return a report of the totals and the count slowest files and lambdas.
+
+        """
+        seconds = sum(render['seconds'] for render in self.renders)
+        lines = ["profile: %d templates, %d files, %d lambdas in %.3fs" %
+                 (len(self.renders), len(self.files), len(self.lambdas), seconds)]
+
+        files = sorted(self.files, key=lambda entry: entry['seconds'], reverse=True)
+        if files:
+            lines.append("slowest files (total, names, render, lambdas, write/copy):")
+        for entry in files[:count]:
+            lines.append("  %7.3fs %7.3fs %7.3fs %7.3fs %7.3fs  %6s  %8d -> %8d bytes  %s" %
+                         (entry['seconds'], entry['name_seconds'],
+                          entry['render_seconds'], entry['lambda_seconds'],
+                          entry['write_seconds'] + entry['copy_seconds'],
+                          entry['kind'], entry['bytes_in'], entry['bytes_out'],
+                          self._format_path(entry)))
+
+        lambdas = sorted(self.lambdas, key=lambda stats: stats['seconds'], reverse=True)
+        if lambdas:
+            lines.append("slowest lambdas (total, calls):")
+        for stats in lambdas[:count]:
+            name = stats['name']
+            if len(self.renders) > 1:
+                name = "%s (%s)" % (name, stats['template_dir'])
+            lines.append("  %7.3fs  %5d calls  %8d -> %8d bytes  %s" %
+                         (stats['seconds'], stats['calls'], stats['bytes_in'],
+                          stats['bytes_out'], name))
+
+        return "\n".join(lines)
@@ -47,6 +47,7 @@ _README_PATH = 'README.md'
 _SETUP_PACKAGE_DIR = 'molt_setup'
 
 # The below are relative to the main Molt package directory.
+_BENCHMARK_BASELINES_DIR = 'benchmark/baselines'
 _DEMO_TEMPLATE_DIR = 'demo'
 _TEST_DATA_DIR = 'test/data'
 
@@ -137,6 +138,11 @@ class Locator(object):
     def extra_package_dirs(self):
         return [_SETUP_PACKAGE_DIR]
 
+    @property
+    @package_dir
+    def benchmark_baselines_dir(self):
+        return _BENCHMARK_BASELINES_DIR
+
     @property
     @package_dir
     def demo_template_dir(self):
@@ -54,13 +54,35 @@ METAVAR_INPUT_DIR = 'DIRECTORY'
 OPTION_CHECK_DIRS = Option(('--check-dirs', ))
 OPTION_CHECK_EXPECTED = Option(('--check-output', ))
 OPTION_CHECK_TEMPLATE = Option(('--check-template', ))
+OPTION_FAIL_FAST = Option(('--fail-fast', ))
+OPTION_FAILED_FIRST = Option(('--failed-first', ))
 OPTION_HELP = Option(('-h', '--help'))
+OPTION_INDEX_EXPECTED = Option(('--index-expected', ))
+OPTION_JOBS = Option(('-j', '--jobs'))
+OPTION_JUNIT_XML = Option(('--junit-xml', ))
 OPTION_LICENSE = Option(('--license', ))
+OPTION_MAX_BYTES_PER_FILE = Option(('--max-bytes-per-file', ))
+OPTION_MAX_FILES = Option(('--max-files', ))
 OPTION_OUTPUT_DIR = Option(('-o', '--output-dir'))
+OPTION_PROFILE = Option(('--profile', ))
+OPTION_MODE_BENCHMARKS = Option(('--run-benchmarks', ))
 OPTION_MODE_DEMO = Option(('--create-demo', ))
+OPTION_MODE_MERGE_RESULTS = Option(('--merge-test-results', ))
 OPTION_MODE_TESTS = Option(('--run-tests', ))
 OPTION_MODE_VISUALIZE = Option(('--visualize', ))
+OPTION_NO_TEST_CACHE = Option(('--no-test-cache', ))
+OPTION_EVENT_FD = Option(('--event-fd', ))
+OPTION_EXPAND = Option(('--expand', ))
+OPTION_SHARD = Option(('--shard', ))
+OPTION_SLOWEST_TESTS = Option(('--slowest-tests', ))
+OPTION_SUMMARY = Option(('--summary', ))
+OPTION_TEST_RESULTS = Option(('--test-results', ))
+OPTION_TEST_TIMINGS = Option(('--test-timings', ))
+OPTION_TEST_TMPFS = Option(('--test-tmpfs', ))
+OPTION_TEST_TMPFS_DIR = Option(('--test-tmpfs-dir', ))
 OPTION_SOURCE_DIR = Option(('--dev-source-dir', ))
+OPTION_UPDATE_BASELINE = Option(('--update-baseline', ))
+OPTION_UPDATE_EXPECTED = Option(('--update-expected', ))
 OPTION_WITH_VISUALIZE = Option(('--with-visualize', ))
 OPTION_VERBOSE = Option(('-v', '--verbose'))
 OPTION_SUCCINCT_LOGGING = Option(('-s', '--succinct', ))
@@ -159,18 +181,59 @@ EXPECTED_DIR.  Writes the differences to stderr and reports the result via
 the exit status.  EXPECTED_DIR defaults to the template's expected directory.
 """,
     OPTION_CHECK_EXPECTED: """\
-when rendering, checks whether the output directory matches the contents of
-EXPECTED_DIR.  Writes the differences to stderr and reports the result via
-the exit status.  EXPECTED_DIR defaults to the template's expected directory.
-""",
+check that the already-rendered output directory %s matches the contents
+of EXPECTED_DIR, instead of rendering a template directory.  EXPECTED_DIR
+may also be a template directory, in which case the template's expected
+directory, ignore file, and expected index (see %s) are used.  Writes the
+differences to stdout and reports the result via the exit status.
+""" % (METAVAR_INPUT_DIR, OPTION_INDEX_EXPECTED.display("/")),
     OPTION_CHECK_TEMPLATE: """\
-check that the input template %s rendered with its default configuration
-file matches the template's expected directory.  Writes the differences
-to stderr and reports the result via the exit status.  By default, the
-template is rendered to a temporary output directory and deleted afterwards.
-However, if %s is provided and a difference is found, the output directory
-is not deleted to allow for inspection.
-""" % (METAVAR_INPUT_DIR, OPTION_OUTPUT_DIR.display("/")),
+check that each template %s rendered with its default configuration
+file matches the template's expected directory.  %s may be given more
+than once, and may be a glob pattern like 'templates/*' (quoted to
+prevent shell expansion).  Writes the differences to stdout and reports
+the result via the exit status.  Templates are rendered in memory.  If %s
+is provided and a difference is found, the rendered output is written to
+that directory for inspection (to a subdirectory per template when
+checking more than one template).  When checking more than one template,
+the templates are checked in parallel (see %s), and a summary with the
+time taken by each template is printed at the end.
+""" % (METAVAR_INPUT_DIR, METAVAR_INPUT_DIR, OPTION_OUTPUT_DIR.display("/"),
+       OPTION_JOBS.display("/")),
+    OPTION_INDEX_EXPECTED: """\
+index the expected directory of the input template %s, instead of
+rendering a template directory.  Writes the file %s to the template
+directory, which %s uses to compare files without fuzz by digest and
+to read only the expected files containing fuzz.  The index is ignored
+once the expected directory is modified, so re-run this option after
+updating the expected directory.
+""" % (METAVAR_INPUT_DIR, repr(defaults.TEMPLATE_MANIFEST_FILE_NAME),
+       OPTION_CHECK_TEMPLATE.display("/")),
+    OPTION_UPDATE_EXPECTED: """\
+update the expected directory of the input template %s to match the
+template rendered with its default configuration file, instead of
+rendering to an output directory.  Only files whose contents differ are
+rewritten, so expected files with fuzz whose lines still match are kept.
+Files and directories are added or removed as needed, and ignored paths
+are left alone.  Writes a summary of the changes to stdout.
+""" % METAVAR_INPUT_DIR,
+    OPTION_JOBS: """\
+the number of processes to use when checking more than one template
+with %s, or when running tests with %s.  Defaults to the number of CPUs
+when checking templates, and to running tests in a single process.""" % (
+        OPTION_CHECK_TEMPLATE.display("/"), OPTION_MODE_TESTS.display("/")),
+    OPTION_PROFILE: """\
+when rendering or with %s, time the rendering of each file and the calls
+to each lambda, and write a report of the totals and the %d slowest files
+and lambdas to stderr.  If PATH is given, also write all timings to PATH
+as JSON.  When giving PATH, put the option after %s or use the form
+--profile=PATH.""" % (OPTION_CHECK_TEMPLATE.display("/"),
+                      defaults.PROFILE_REPORT_COUNT, METAVAR_INPUT_DIR),
+    OPTION_EVENT_FD: """\
+when rendering or with %s, write an event for the start and end of the
+render, each file, and each lambda call to the open file descriptor FD
+as a line of JSON (for example, 2 for stderr).  Useful for feeding render
+metrics into other tools.""" % OPTION_CHECK_TEMPLATE.display("/"),
     OPTION_MODE_DEMO: """\
 create a copy of the Molt demo template to play with, instead of rendering
 a template directory.  The demo illustrates most major features of Groome.
@@ -187,10 +250,92 @@ with one of the strings are run.  Test names begin with the fully qualified
 module name.  If the %s option is provided, then test failure data is
 retained for inspection in a subset of that directory.
 """ % OPTION_OUTPUT_DIR.display(' or '),
+    OPTION_MODE_BENCHMARKS: """\
+run the performance benchmarks, instead of rendering a template directory.
+Benchmarks time rendering synthetic templates, comparing generated
+directories, and calling lambda scripts, varying the size and shape of
+the input, and report details like a breakdown by phase, throughput, or
+latency percentiles, compared with a stored baseline.  If %%(metavar)s arguments are provided, then only
+benchmarks whose names (of the form SUITE.NAME) begin with one of the
+strings are run.  See also %s.""" % OPTION_UPDATE_BASELINE.display(' or '),
+    OPTION_SLOWEST_TESTS: """\
+with %s, report the N slowest tests after the tests run, timing each
+test including its setup and teardown.  Defaults to %d if N is not
+given.""" % (OPTION_MODE_TESTS.display(' or '), defaults.SLOWEST_TESTS_COUNT),
+    OPTION_JUNIT_XML: """\
+with %s, write the test results with the time taken by each test to
+PATH in JUnit XML format.""" % OPTION_MODE_TESTS.display(' or '),
+    OPTION_NO_TEST_CACHE: """\
+with %s, run all tests without using data cached by earlier runs.  By
+default, test discovery is cached, and template tests are skipped if
+the template, its expected directory, the Molt source, and the pystache
+version are unchanged since the test last passed.""" % OPTION_MODE_TESTS.display(' or '),
+    OPTION_FAILED_FIRST: """\
+with %s, run the tests that failed in earlier runs before the other
+tests.  The IDs of failed tests are recorded in the system temp directory
+after each run.""" % OPTION_MODE_TESTS.display(' or '),
+    OPTION_FAIL_FAST: """\
+with %s, stop the test run after the first failure or error.
+""" % OPTION_MODE_TESTS.display(' or '),
+    OPTION_SHARD: """\
+with %s, run only the K-th of N shards of the tests, numbering from 1.
+Tests are split the same way by each of the N runs: in sorted order, or
+balanced using the test durations in the file given by %s.  Writes the
+results to the file given by %s, or else to %s in the current
+directory, for merging with %s.""" % (OPTION_MODE_TESTS.display(' or '),
+                                      OPTION_TEST_TIMINGS.display(' or '),
+                                      OPTION_TEST_RESULTS.display(' or '),
+                                      repr(defaults.TEST_RESULTS_FILE_NAME % ('K', 'N')),
+                                      OPTION_MODE_MERGE_RESULTS.display(' or ')),
+    OPTION_TEST_RESULTS: """\
+with %s, write the test results to PATH in a format that %s can read.
+""" % (OPTION_MODE_TESTS.display(' or '), OPTION_MODE_MERGE_RESULTS.display(' or ')),
+    OPTION_TEST_TIMINGS: """\
+the file of test durations with which to balance shards with %s.  Pass
+the same file to each shard.  Runs of all tests with %s and runs of %s
+update the file, which defaults to a file in the system temp directory.""" % (OPTION_SHARD.display(' or '),
+                                    OPTION_MODE_TESTS.display(' or '),
+                                    OPTION_MODE_MERGE_RESULTS.display(' or ')),
+    OPTION_MODE_MERGE_RESULTS: """\
+merge the test results files written by the shards of a test run (see
+%s) and report the outcome as a single test run, instead of rendering a
+template directory.  The exit status reflects whether all tests passed.
+Also accepts %s and %s.""" % (OPTION_SHARD.display(' or '),
+                              OPTION_SLOWEST_TESTS.display(' or '),
+                              OPTION_JUNIT_XML.display(' or ')),
+    OPTION_TEST_TMPFS: """\
+with %s, create the test run directory and the sandbox directories of
+tests in %s, a directory on an in-memory file system (tmpfs), to avoid
+disk I/O.  Ignored if %s is provided or if the directory is not
+available.  See also %s.""" % (OPTION_MODE_TESTS.display(' or '), defaults.TEST_TMPFS_DIR,
+                               OPTION_OUTPUT_DIR.display(' or '),
+                               OPTION_TEST_TMPFS_DIR.display(' or ')),
+    OPTION_TEST_TMPFS_DIR: """\
+like %s, but using the in-memory file system directory DIR.
+""" % OPTION_TEST_TMPFS.display(' or '),
+    OPTION_UPDATE_BASELINE: """\
+with %s, store the results as the new baseline of each benchmark run.
+""" % OPTION_MODE_BENCHMARKS.display(' or '),
     OPTION_MODE_VISUALIZE: """\
 print to stdout in a human-readable format the contents of all files in
-input directory %s, instead of rendering a template directory.  Uses `diff`
-under the hood.""" % METAVAR_INPUT_DIR,
+input directory %s, instead of rendering a template directory.  Binary
+files are summarized rather than printed.  See also %s and %s.""" % (
+METAVAR_INPUT_DIR,
+OPTION_MAX_BYTES_PER_FILE.display(' or '),
+OPTION_MAX_FILES.display(' or ')),
+    OPTION_SUMMARY: """\
+when visualizing, print only the directory tree with the size of each
+file (and, after rendering, the template file it came from) instead of
+the contents of all files.  File contents are not read except for the
+paths given by %s.""" % OPTION_EXPAND.display(' or '),
+    OPTION_EXPAND: """\
+with %s, also print the line count and contents of the file or directory
+at PATH, relative to the directory being visualized.  Can be given more
+than once.""" % OPTION_SUMMARY.display(' or '),
+    OPTION_MAX_BYTES_PER_FILE: """\
+when visualizing, print at most N bytes of each file.""",
+    OPTION_MAX_FILES: """\
+when visualizing, print at most N files.""",
 }
 
 def _get_version_header():
@@ -227,6 +372,20 @@ def preparse_args(sys_argv):
     return ns
 
 
+def _parse_shard(text):
+    """
+    Parse a string of the form "K/N", and return the pair (K, N).
+
+    """
+    try:
+        index, count = [int(part) for part in text.split("/")]
+    except ValueError:
+        raise argparse.ArgumentTypeError("not of the form K/N: %s" % repr(text))
+    if not 1 <= index <= count:
+        raise argparse.ArgumentTypeError("K not between 1 and N: %s" % repr(text))
+    return index, count
+
+
 def parse_args(sys_argv, chooser=None, suppress_help_exit=False, usage=None):
     """
     Parse arguments and return a Namespace object.
@@ -272,19 +431,56 @@ def _create_parser(chooser, suppress_help_exit=False, usage=None):
     add_arg(('-c', '--config-file'), metavar='FILE', dest='config_path',
             action='store')
     add_arg(OPTION_WITH_VISUALIZE, dest='with_visualize', action='store_true')
-    add_arg(OPTION_CHECK_TEMPLATE, dest='mode_check_template',
-            action='store_true'),
-    # TODO: check the validity of the following comment.
-    # Option present without DIRECTORY yields True; option absent yields None.
+    # Defaults to the empty list if provided with no directories, or else None.
+    add_arg(OPTION_CHECK_TEMPLATE, metavar=METAVAR_INPUT_DIR,
+            dest='check_template_dirs', nargs='*')
+    add_arg(OPTION_UPDATE_EXPECTED, dest='mode_update_expected',
+            action='store_true')
+    add_arg(OPTION_JOBS, metavar='N', dest='jobs', type=int, action='store')
+    add_arg(OPTION_PROFILE, metavar='PATH', dest='profile_path', nargs='?',
+            const='')
+    add_arg(OPTION_EVENT_FD, metavar='FD', dest='event_fd', type=int,
+            action='store')
+    add_arg(OPTION_INDEX_EXPECTED, dest='mode_index_expected',
+            action='store_true')
     add_arg(OPTION_CHECK_EXPECTED, metavar='EXPECTED_DIR',
-            dest='expected_dir', action='store', nargs='?', const=True)
+            dest='expected_dir', action='store')
     # TODO: should this be called CHECK_DIR?
     add_arg(OPTION_CHECK_DIRS, metavar=('EXPECTED_DIR', 'ACTUAL_DIR'),
             dest='check_dir', nargs=2)
     add_arg(OPTION_MODE_DEMO, dest='create_demo_mode', action='store_true')
     # Defaults to the empty list if provided with no names, or else None.
     add_arg(OPTION_MODE_TESTS, metavar='NAME', dest='test_names', nargs='*')
+    add_arg(OPTION_SLOWEST_TESTS, metavar='N', dest='slowest_tests', type=int,
+            nargs='?', const=defaults.SLOWEST_TESTS_COUNT)
+    add_arg(OPTION_JUNIT_XML, metavar='PATH', dest='junit_xml_path',
+            action='store')
+    add_arg(OPTION_NO_TEST_CACHE, dest='use_test_cache', action='store_false')
+    add_arg(OPTION_FAILED_FIRST, dest='failed_first', action='store_true')
+    add_arg(OPTION_FAIL_FAST, dest='fail_fast', action='store_true')
+    add_arg(OPTION_SHARD, metavar='K/N', dest='shard', type=_parse_shard,
+            action='store')
+    add_arg(OPTION_TEST_RESULTS, metavar='PATH', dest='test_results_path',
+            action='store')
+    add_arg(OPTION_TEST_TIMINGS, metavar='PATH', dest='test_timings_path',
+            action='store')
+    add_arg(OPTION_MODE_MERGE_RESULTS, metavar='PATH', dest='merge_results_paths',
+            nargs='+')
+    # A separate option takes the directory so that --test-tmpfs cannot
+    # consume a test name following it.
+    add_arg(OPTION_TEST_TMPFS, dest='use_test_tmpfs', action='store_true')
+    add_arg(OPTION_TEST_TMPFS_DIR, metavar='DIR', dest='test_tmpfs_dir_option',
+            action='store')
+    add_arg(OPTION_MODE_BENCHMARKS, metavar='NAME', dest='benchmark_names',
+            nargs='*')
+    add_arg(OPTION_UPDATE_BASELINE, dest='update_baseline', action='store_true')
     add_arg(OPTION_MODE_VISUALIZE, dest='visualize_mode', action='store_true')
+    add_arg(OPTION_SUMMARY, dest='visualize_summary', action='store_true')
+    add_arg(OPTION_EXPAND, metavar='PATH', dest='expand_paths', action='append')
+    add_arg(OPTION_MAX_BYTES_PER_FILE, metavar='N', dest='max_bytes_per_file',
+            type=int, action='store')
+    add_arg(OPTION_MAX_FILES, metavar='N', dest='max_files', type=int,
+            action='store')
     # This argument is the path to a source checkout or source distribution.
     # This lets one specify project resources not available in a package
     # build or install, when doing development testing.  Defaults to no
@@ -320,6 +516,30 @@ class Namespace(argparse.Namespace):
         # In particular, an empty list of test names should return True.
         return not self.test_names is None
 
+    @property
+    def mode_run_benchmarks(self):
+        """Return whether to run benchmarks."""
+        # In particular, an empty list of benchmark names should return True.
+        return self.benchmark_names is not None
+
+    @property
+    def mode_merge_test_results(self):
+        """Return whether to merge the results files of test shards."""
+        return self.merge_results_paths is not None
+
+    @property
+    def test_tmpfs_dir(self):
+        """Return the in-memory file system directory for tests, or None."""
+        if self.test_tmpfs_dir_option is not None:
+            return self.test_tmpfs_dir_option
+        return defaults.TEST_TMPFS_DIR if self.use_test_tmpfs else None
+
+    @property
+    def mode_check_template(self):
+        """Return whether to check templates."""
+        # In particular, an empty list of directories should return True.
+        return self.check_template_dirs is not None
+
     @property
     def check_output(self):
         """Return whether to check the output directory."""
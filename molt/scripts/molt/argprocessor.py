@@ -30,32 +30,29 @@
 """
 Provides the main sys.argv processing code, but without the try-catch.
 
+To keep startup fast (e.g. for --version), modules needed only by some
+modes (e.g. pystache via molt.molter, the diff engine, and the test
+harness) are imported inside the functions that use them.
+
 """
 
-import codecs
-from datetime import datetime
+import glob
 import logging
 import os
 import shutil
-from StringIO import StringIO
 import sys
-import tempfile
+import time
 
 import molt
 from molt.general.error import Error
 from molt import constants
 from molt import defaults
-import molt.diff as diff
 import molt.dirutil as dirutil
+import molt.general.io as molt_io
 # TODO: eliminate these from ... imports.
 from molt.dirutil import stage_template_dir, DirectoryChooser
-from molt.molter import Molter
-from molt.projectmap import Locator
 from molt.scripts.molt import argparsing
 import molt.scripts.molt.general.optionparser as optionparser
-from molt.test.harness import test_logger as tlog
-from molt.test.harness.main import run_molt_tests
-from molt import visualizer
 
 METAVAR_INPUT_DIR = argparsing.METAVAR_INPUT_DIR
 
@@ -64,8 +61,22 @@ _log = logging.getLogger(__name__)
 ENCODING_DEFAULT = 'utf-8'
 
 
-def visualize(dir_path):
-    visualizer.visualize(dir_path)
+def visualize(ns, dir_path, origins=None):
+    """
+    Arguments:
+
+      origins: see visualizer.summarize().
+
+    """
+    from molt import visualizer
+
+    if ns.visualize_summary:
+        visualizer.summarize(dir_path, expand=ns.expand_paths, origins=origins,
+                             max_bytes_per_file=ns.max_bytes_per_file,
+                             max_files=ns.max_files)
+        return
+    visualizer.visualize(dir_path, max_bytes_per_file=ns.max_bytes_per_file,
+                         max_files=ns.max_files)
 
 
 # TODO: consider whether we can have argparse handle this logic.
@@ -86,11 +97,128 @@ def _get_input_dir(ns, desc):
     return input_dir
 
 
+def _has_glob_chars(path):
+    return any(char in path for char in '*?[')
+
+
+def _get_template_dirs(ns):
+    """
+    Return the list of template directories to check, expanding globs.
+
+    """
+    paths = list(ns.check_template_dirs)
+    if ns.input_directory is not None:
+        paths.append(ns.input_directory)
+    if not paths:
+        # Raises a UsageError.
+        _get_input_dir(ns, argparsing.OPTION_CHECK_TEMPLATE)
+
+    template_dirs = []
+    for path in paths:
+        # Check for an existing path first so that a directory whose
+        # name contains glob characters (e.g. "foo[1]") is not expanded.
+        if os.path.exists(path) or not _has_glob_chars(path):
+            if not os.path.exists(path):
+                raise Error("Input directory not found: %s" % path)
+            template_dirs.append(path)
+            continue
+        # Otherwise, the path is a glob pattern.
+        matches = sorted(match for match in glob.glob(path) if os.path.isdir(match))
+        if not matches:
+            raise Error("No directories match pattern: %s" % path)
+        template_dirs.extend(matches)
+
+    return template_dirs
+
+
+def _make_profile(ns):
+    """
+    Return a RenderProfile instance if profiling is enabled, else None.
+
+    """
+    if ns.profile_path is None:
+        return None
+    from molt.profiler import RenderProfile
+    return RenderProfile()
+
+
+def _make_observers(event_fd):
+    """
+    Return the list of RenderObserver instances for the given options.
+
+    """
+    if event_fd is None:
+        return []
+    from molt.observers import NdjsonObserver
+    return [NdjsonObserver(event_fd)]
+
+
+def _report_profile(ns, profile):
+    """
+    Write the profile report to stderr and, if requested, to a JSON file.
+
+    """
+    if profile is None:
+        return
+    sys.stderr.write(profile.format_report(defaults.PROFILE_REPORT_COUNT) + "\n")
+    if ns.profile_path:
+        profile.write_json(ns.profile_path)
+        _log.info("wrote profile to: %s" % ns.profile_path)
+
+
+def _with_profile_report(run, ns, profile):
+    """
+    Wrap a runner returned by ArgProcessor.make_runner() to report a profile.
+
+    """
+    if profile is None:
+        return run
+    def run_and_report():
+        result = run()
+        _report_profile(ns, profile)
+        return result
+    return run_and_report
+
+
+def _get_test_results_path(ns):
+    path = ns.test_results_path
+    if path is None and ns.shard is not None:
+        path = defaults.TEST_RESULTS_FILE_NAME % ns.shard
+    return path
+
+
+def run_mode_merge_test_results(ns, test_runner_stream):
+    """
+    Merge the results files of test shards, and return the exit status.
+
+    """
+    from molt.test.harness import sharding
+    from molt.test.harness.main import get_timings_path
+
+    result = sharding.merge_results(ns.merge_results_paths, stream=test_runner_stream)
+    if ns.slowest_tests:
+        test_runner_stream.write(result.format_slowest(ns.slowest_tests) + "\n")
+    if ns.junit_xml_path:
+        result.write_junit_xml(ns.junit_xml_path, suite_name=molt.__name__)
+        _log.info("wrote JUnit XML to: %s" % ns.junit_xml_path)
+    timings_path = ns.test_timings_path
+    if timings_path is None and ns.use_test_cache:
+        timings_path = get_timings_path()
+    if timings_path is not None:
+        sharding.write_timings(timings_path, result)
+
+    return constants.EXIT_STATUS_SUCCESS if result.wasSuccessful() else constants.EXIT_STATUS_FAIL
+
+
 def run_mode_tests(ns, test_names, test_runner_stream, from_source):
     """
     Run project tests, and return the exit status to exit with.
 
     """
+    from StringIO import StringIO
+    from molt.test.harness import test_logger as tlog
+    from molt.test.harness.main import run_molt_tests
+
     # Suppress the display of standard out while tests are running.
     tlog.info("running tests: suppressing stdout; from_source: %s" % from_source)
     stdout = sys.stdout
@@ -102,12 +230,22 @@ def run_mode_tests(ns, test_names, test_runner_stream, from_source):
                                                    source_dir=ns.source_dir,
                                                    test_names=test_names,
                                                    test_output_dir=ns.output_directory,
-                                                   test_runner_stream=test_runner_stream)
+                                                   test_runner_stream=test_runner_stream,
+                                                   jobs=ns.jobs,
+                                                   slowest_count=ns.slowest_tests,
+                                                   junit_xml_path=ns.junit_xml_path,
+                                                   tmpfs_dir=ns.test_tmpfs_dir,
+                                                   use_cache=ns.use_test_cache,
+                                                   shard=ns.shard,
+                                                   results_path=_get_test_results_path(ns),
+                                                   timings_path=ns.test_timings_path,
+                                                   failed_first=ns.failed_first,
+                                                   fail_fast=ns.fail_fast)
     finally:
         sys.stdout = stdout
 
     if ns.with_visualize and test_run_dir is not None:
-        visualize(test_run_dir)
+        visualize(ns, test_run_dir)
 
     return constants.EXIT_STATUS_SUCCESS if test_result.wasSuccessful() else constants.EXIT_STATUS_FAIL
 
@@ -121,6 +259,8 @@ def _make_output_directory(ns, default_output_dir):
 
 
 def run_mode_create_demo(ns):
+    from molt.projectmap import Locator
+
     # TODO: inject the locator instance instead of constructing it here.
     locator = Locator()
     demo_template_dir = locator.demo_template_dir
@@ -132,7 +272,7 @@ def run_mode_create_demo(ns):
     stage_template_dir(demo_template_dir, output_dir)
 
     if ns.with_visualize:
-        visualize(output_dir)
+        visualize(ns, output_dir)
 
     _log.info("Created demo template directory: %s" % output_dir)
 
@@ -144,33 +284,47 @@ def run_mode_render(ns, chooser):
     template_dir = _get_input_dir(ns, 'when rendering a template')
     config_path = ns.config_path
     output_dir = _make_output_directory(ns, defaults.OUTPUT_DIR)
+    profile = _make_profile(ns)
 
     renderer = TemplateRenderer(chooser=chooser, template_dir=template_dir,
-                                output_dir=output_dir, config_path=config_path)
-    renderer.render()
+                                output_dir=output_dir, config_path=config_path,
+                                profile=profile,
+                                observers=_make_observers(ns.event_fd))
+    origins = renderer.render()
+    _report_profile(ns, profile)
 
     if ns.with_visualize:
-        visualize(output_dir)
+        visualize(ns, output_dir, origins=origins)
 
     return output_dir
 
 
 def run_mode_visualize(ns):
     target_dir = _get_input_dir(ns, argparsing.OPTION_MODE_VISUALIZE)
-    visualize(target_dir)
+    visualize(ns, target_dir)
 
     return None  # no need to print anything more.
 
 
-# TODO: check-output should support checking a rendered directory.
-# In other words, to check an output directory, it shouldn't be
-# necessary to have to render each time.  As a side benefit, this
-# resolves the stdout/stderr question for this case.
-def check_output(output_dir, expected_dir):
-    """Return whether the output directory matches the expected."""
-    print("output: %s\nexpected: %s" % (output_dir, expected_dir))
-    # TODO: implement this.
-    return True
+def _make_comparer(template_dir, expected_dir):
+    """
+    Return a diff.Comparer for checking against an expected directory.
+
+    Arguments:
+
+      template_dir: the template directory containing the expected
+        directory, or None if the expected directory is standalone.
+
+    """
+    import molt.diff as diff
+    import molt.manifest as manifest
+
+    ignore = dirutil.make_ignore_matcher(template_dir)
+    expected_manifest = None
+    if template_dir is not None:
+        expected_manifest = manifest.load_manifest(template_dir, expected_dir)
+    return diff.Comparer(ignore=ignore, manifest=expected_manifest,
+                         max_hunks=defaults.DIFF_MAX_HUNKS)
 
 
 # TODO: rename this to process() or process_args().
@@ -188,10 +342,17 @@ def run_args(sys_argv, writer, chooser=None, test_runner_stream=None,
     ns = argparsing.parse_args(sys_argv, chooser)
 
     if ns.run_test_mode:
+        test_names = list(ns.test_names)
+        # A name after a later option (e.g. "--run-tests --test-tmpfs NAME")
+        # is parsed as the input directory.
+        if ns.input_directory is not None:
+            test_names.append(ns.input_directory)
         # Run all tests if no test names provided.
-        test_names = ns.test_names or None
+        test_names = test_names or None
         return run_mode_tests(ns, test_names=test_names, test_runner_stream=test_runner_stream,
                              from_source=from_source)
+    if ns.mode_merge_test_results:
+        return run_mode_merge_test_results(ns, test_runner_stream=test_runner_stream)
 
     processor = ArgProcessor(chooser=chooser, writer=writer)
     run = processor.make_runner(ns)
@@ -218,11 +379,6 @@ def run_args(sys_argv, writer, chooser=None, test_runner_stream=None,
     else:
         output = run_mode_render(ns, chooser)
 
-    # TODO: ensure that check_output raises an error if running in
-    # a mode that doesn't create an ouput directory.
-    if ns.check_output and not check_output(output, ns.expected_dir):
-        exit_status = constants.EXIT_STATUS_FAIL
-
     if output is not None:
         stdout.write(output)
         if not output.endswith("\n"):
@@ -239,92 +395,463 @@ class ArgProcessor(object):
 
     def make_runner(self, ns):
         if ns.mode_check_template:
-            template_dir = _get_input_dir(ns, argparsing.OPTION_CHECK_TEMPLATE)
+            template_dirs = _get_template_dirs(ns)
             output_dir = ns.output_directory
-            checker = TemplateChecker(chooser=self.chooser,
-                                      template_dir=template_dir,
-                                      output_dir=output_dir,
-                                      writer=self.writer)
+            profile = _make_profile(ns)
+            if len(template_dirs) > 1:
+                checker = MultiTemplateChecker(chooser=self.chooser,
+                                               template_dirs=template_dirs,
+                                               output_dir=output_dir,
+                                               jobs=ns.jobs, profile=profile,
+                                               event_fd=ns.event_fd)
+            else:
+                observers = _make_observers(ns.event_fd)
+                checker = TemplateChecker(chooser=self.chooser,
+                                          template_dir=template_dirs[0],
+                                          output_dir=output_dir,
+                                          writer=self.writer, profile=profile,
+                                          observers=observers)
+            return _with_profile_report(checker.check, ns, profile)
+        if ns.check_output:
+            output_dir = _get_input_dir(ns, argparsing.OPTION_CHECK_EXPECTED)
+            checker = OutputChecker(chooser=self.chooser,
+                                    expected_dir=ns.expected_dir,
+                                    output_dir=output_dir,
+                                    writer=self.writer)
             return checker.check
+        if ns.mode_update_expected:
+            template_dir = _get_input_dir(ns, argparsing.OPTION_UPDATE_EXPECTED)
+            updater = ExpectedUpdater(chooser=self.chooser, template_dir=template_dir)
+            return updater.update
+        if ns.mode_run_benchmarks:
+            def run_benchmarks():
+                from molt.benchmark.harness import run_benchmarks
+                summary = run_benchmarks(names=ns.benchmark_names or None,
+                                         update_baseline=ns.update_baseline)
+                return True, summary
+            return run_benchmarks
+        if ns.mode_index_expected:
+            template_dir = _get_input_dir(ns, argparsing.OPTION_INDEX_EXPECTED)
+            def index():
+                import molt.manifest as manifest
+                path = manifest.index_expected_dir(template_dir, chooser=self.chooser)
+                return True, path
+            return index
         return None
 
 
 # This class should not depend on the Namespace returned by parse_args().
 class TemplateRenderer(object):
 
-    def __init__(self, chooser, template_dir, output_dir, config_path=None):
+    def __init__(self, chooser, template_dir, output_dir, config_path=None,
+                 profile=None, observers=None):
+        """
+        Arguments:
+
+          profile: a molt.profiler.RenderProfile instance to record the
+            render with, or None.
+
+          observers: see the Molter constructor.
+
+        """
         self.chooser = chooser
         self.config_path = config_path
+        self.observers = observers
         self.output_dir = output_dir
+        self.profile = profile
         self.template_dir = template_dir
 
     def render(self):
-        molter = Molter(chooser=self.chooser)
-        molter.molt(template_dir=self.template_dir,
-                    output_dir=self.output_dir,
-                    config_path=self.config_path)
+        """
+        Render the template, and return the origins dict of Molter.molt().
+
+        """
+        from molt.molter import Molter
+
+        molter = Molter(chooser=self.chooser, profile=self.profile,
+                        observers=self.observers)
+        return molter.molt(template_dir=self.template_dir,
+                           output_dir=self.output_dir,
+                           config_path=self.config_path)
 
 
 # This class should not depend on the Namespace returned by parse_args().
 class TemplateChecker(object):
 
-    def __init__(self, chooser, template_dir, output_dir, writer):
+    def __init__(self, chooser, template_dir, output_dir, writer=None,
+                 profile=None, observers=None):
+        """
+        Arguments:
+
+          writer: an object with a write(msg) method for reporting the
+            result, or None to not report the result.
+
+          profile, observers: see the TemplateRenderer constructor.
+
+        """
         self.chooser = chooser
+        self.observers = observers
         self.output_dir = output_dir
+        self.profile = profile
         self.template_dir = template_dir
         self.writer = writer
 
     def _write(self, msg):
         # TODO: use the output log.
-        self.writer.write(msg)
+        if self.writer is not None:
+            self.writer.write(msg)
 
     # TODO: extract this into a separate helper function or class?
     # A helper would be useful for the --compare-dirs option that has
     # not yet been implemented.
-    def _compare(self, actual_dir, expected_dir):
-        comparer = diff.Comparer()
-        return comparer.compare_dirs((actual_dir, expected_dir))
+    def _compare(self, tree, expected_dir):
+        comparer = _make_comparer(self.template_dir, expected_dir)
+        return comparer.compare_tree(tree, expected_dir)
+
+    def check(self):
+        """
+        Returns a (does_check, output_dir) pair.
+
+        The template is rendered in memory.  The rendered output is only
+        written to disk if an output directory was given and the check
+        fails, in which case output_dir is the directory written to.
+        Otherwise, output_dir is None.
+
+        """
+        from molt.molter import Molter
 
-    def _check(self, output_dir):
-        """Render and return whether the directories match."""
         chooser = self.chooser
         template_dir = self.template_dir
-        renderer = TemplateRenderer(chooser=chooser, template_dir=template_dir,
-                                    output_dir=output_dir)
-        renderer.render()
+        molter = Molter(chooser=chooser, profile=self.profile,
+                        observers=self.observers)
+        tree = molter.render_tree(template_dir)
         expected_dir = chooser.get_expected_dir(template_dir)
-        does_match = self._compare(output_dir, expected_dir)
-        return does_match
+        does_match = self._compare(tree, expected_dir)
+        if does_match:
+            msg = "template okay!"
+        else:
+            msg = "template not okay :("
+        self._write(msg)
+        output_dir = None
+        if not does_match and self.output_dir is not None:
+            # Increment the output directory if necessary.
+            output_dir = dirutil.make_available_dir(self.output_dir)
+            tree.write(output_dir)
+            _log.debug("leaving output dir: %s" % output_dir)
+        return does_match, output_dir
+
+
+# This class should not depend on the Namespace returned by parse_args().
+class OutputChecker(object):
+
+    """
+    Checks an already-rendered output directory without rendering.
+
+    """
+
+    def __init__(self, chooser, expected_dir, output_dir, writer=None):
+        """
+        Arguments:
+
+          expected_dir: the expected directory, or a template directory
+            whose expected directory to use.
+
+          writer: see the TemplateChecker constructor.
+
+        """
+        self.chooser = chooser
+        self.expected_dir = expected_dir
+        self.output_dir = output_dir
+        self.writer = writer
+
+    def _get_dirs(self):
+        """
+        Return a (template_dir, expected_dir) pair.
+
+        """
+        chooser = self.chooser
+        path = self.expected_dir
+        if not os.path.isdir(path):
+            raise Error("Expected directory not found: %s" % path)
+        if not chooser.has_expected_dir(path):
+            return None, path
+        _log.info("using the expected directory of template: %s" % path)
+        return path, chooser.get_expected_dir(path)
 
     def check(self):
         """
-        Returns a (does_check, output_dir) pair.
+        Returns a (does_check, None) pair.
+
+        """
+        template_dir, expected_dir = self._get_dirs()
+        comparer = _make_comparer(template_dir, expected_dir)
+        does_match = comparer.compare_dirs((self.output_dir, expected_dir))
+        if does_match:
+            msg = "output okay!"
+        else:
+            msg = "output not okay :("
+        if self.writer is not None:
+            self.writer.write(msg)
+        return does_match, None
+
+
+# This class should not depend on the Namespace returned by parse_args().
+class ExpectedUpdater(object):
+
+    """
+    Updates the expected directory of a template to match its rendering.
+
+    """
+
+    def __init__(self, chooser, template_dir):
+        self.chooser = chooser
+        self.template_dir = template_dir
+
+    def _get_expected_dir(self):
+        expected_dir = self.chooser.get_expected_dir(self.template_dir)
+        if expected_dir is None:
+            expected_dir = os.path.join(self.template_dir,
+                                        defaults.TEMPLATE_EXPECTED_DIR_NAME)
+            os.mkdir(expected_dir)
+            _log.info("created expected directory: %s" % expected_dir)
+        return expected_dir
+
+    def _remove(self, path):
+        if os.path.isdir(path) and not os.path.islink(path):
+            shutil.rmtree(path)
+        else:
+            os.remove(path)
+
+    def _update_file(self, tree, expected_dir, path):
+        """
+        Rewrite an expected file, keeping its fuzzy lines that still match.
+
+        Files that do not decode (e.g. binary files) are copied as is.
+
+        """
+        import molt.diff as diff
+
+        expected_path = os.path.join(expected_dir, path)
+        encoding, errors = defaults.FILE_ENCODING, defaults.ENCODING_ERRORS
+        with open(expected_path, 'rb') as f:
+            expected_bytes = f.read()
+        try:
+            expected = expected_bytes.decode(encoding, errors)
+            actual = tree.read(path).decode(encoding, errors)
+        except UnicodeDecodeError:
+            # Then there is no fuzz to keep.
+            expected = None
+        if expected is None or defaults.DIFF_FUZZ not in expected:
+            tree.write(expected_dir, path)
+            return
+        u = diff.merge_fuzz(actual, expected)
+        molt_io.write(u, expected_path, defaults.OUTPUT_FILE_ENCODING, errors)
+
+    def update(self):
+        """
+        Returns a (True, summary) pair.
+
+        """
+        from molt.molter import Molter
+
+        template_dir = self.template_dir
+        molter = Molter(chooser=self.chooser)
+        tree = molter.render_tree(template_dir)
+        expected_dir = self._get_expected_dir()
+
+        comparer = _make_comparer(template_dir, expected_dir)
+        info = comparer.diff_tree(tree, expected_dir, show_diffs=False)
+        added, removed, updated = info
+
+        for path in removed:
+            self._remove(os.path.join(expected_dir, path))
+        for path in updated:
+            self._update_file(tree, expected_dir, path)
+        for path in added:
+            tree.write(expected_dir, path)
+
+        if info.does_match():
+            return True, "expected directory up to date: %s" % expected_dir
+        lines = ["updated expected directory: %s" % expected_dir]
+        for label, paths in zip(("added", "removed", "updated"), info):
+            lines.extend("  %s: %s" % (label, path) for path in paths)
+        lines.append("%d added, %d removed, %d updated" %
+                     (len(added), len(removed), len(updated)))
+        return True, "\n".join(lines)
+
+
+class TemplateCheckResult(object):
+
+    """
+    The outcome of checking one template with MultiTemplateChecker.
+
+    """
+
+    def __init__(self, template_dir, does_match, output_dir, seconds,
+                 report, error=None, profile_data=None):
+        """
+        Arguments:
+
+          report: the differences written to stdout while checking.
+
+          error: if checking raised an exception, a string describing
+            the exception.
+
+          profile_data: if profiling, the return value of the
+            RenderProfile.to_dict() method.
 
         """
+        self.does_match = does_match
+        self.error = error
+        self.output_dir = output_dir
+        self.profile_data = profile_data
+        self.report = report
+        self.seconds = seconds
+        self.template_dir = template_dir
+
+    def describe(self):
+        if self.error is not None:
+            status = "ERROR"
+        elif self.does_match:
+            status = "ok"
+        else:
+            status = "FAILED"
+        line = "  %-6s %7.2fs  %s" % (status, self.seconds, self.template_dir)
+        if self.error is not None:
+            line += "\n    %s" % self.error
+        if self.output_dir is not None:
+            line += "\n    output: %s" % self.output_dir
+        return line
+
+
+def _check_template(args):
+    """
+    Check a template, and return a TemplateCheckResult instance.
+
+    This is a module-level function so that it can run in a process pool.
+    Exceptions are reported in the result so that one template cannot
+    prevent the others from being checked.
+
+    Arguments:
+
+      args: a tuple of (chooser, template_dir, output_dir, do_profile,
+        event_fd).
+
+    """
+    from StringIO import StringIO
+    from molt.profiler import RenderProfile
+
+    chooser, template_dir, output_dir, do_profile, event_fd = args
+    does_match, error = False, None
+    profile = RenderProfile() if do_profile else None
+    start_time = time.time()
+    # Capture the differences written to stdout so that the differences
+    # of templates checked at the same time are not interleaved.
+    stdout = sys.stdout
+    sys.stdout = StringIO()
+    try:
+        checker = TemplateChecker(chooser=chooser, template_dir=template_dir,
+                                  output_dir=output_dir, profile=profile,
+                                  observers=_make_observers(event_fd))
+        does_match, output_dir = checker.check()
+    except Exception, err:
         output_dir = None
-        does_match = True
-        _given_output_dir = self.output_dir
+        error = "%s: %s" % (err.__class__.__name__, err)
+        # Do not report the timings of an incomplete render.
+        profile = None
+    finally:
+        report = sys.stdout.getvalue()
+        sys.stdout = stdout
+    seconds = time.time() - start_time
+    profile_data = None if profile is None else profile.to_dict()
+    return TemplateCheckResult(template_dir, does_match, output_dir,
+                               seconds, report, error=error,
+                               profile_data=profile_data)
+
+
+# This class should not depend on the Namespace returned by parse_args().
+class MultiTemplateChecker(object):
+
+    """
+    Checks several templates in a process pool, and summarizes the results.
+
+    """
+
+    def __init__(self, chooser, template_dirs, output_dir, jobs=None, stdout=None,
+                 profile=None, event_fd=None):
+        """
+        Arguments:
+
+          output_dir: if not None, the directory in which to write the
+            rendered output of each failing template, in a subdirectory
+            named after the template.
+
+          jobs: the number of processes to use.  Defaults to the number
+            of CPUs.  If 1, templates are checked in this process.
+
+          profile: a molt.profiler.RenderProfile instance to add the
+            timings of each template to, or None.
+
+          event_fd: a file descriptor to which each process writes render
+            events as NDJSON, or None.
+
+        """
+        import multiprocessing
+
+        if jobs is None:
+            jobs = multiprocessing.cpu_count()
+        if stdout is None:
+            stdout = sys.stdout
+        self.chooser = chooser
+        self.event_fd = event_fd
+        self.jobs = jobs
+        self.output_dir = output_dir
+        self.profile = profile
+        self.stdout = stdout
+        self.template_dirs = template_dirs
+
+    def _get_output_dir(self, template_dir):
+        if self.output_dir is None:
+            return None
+        name = os.path.basename(os.path.normpath(template_dir))
+        return os.path.join(self.output_dir, name)
+
+    def _check_all(self):
+        import multiprocessing
+
+        do_profile = self.profile is not None
+        args = [(self.chooser, template_dir, self._get_output_dir(template_dir),
+                 do_profile, self.event_fd) for template_dir in self.template_dirs]
+        jobs = min(self.jobs, len(args))
+        if jobs <= 1:
+            return map(_check_template, args)
+        _log.info("checking %d templates using %d processes" % (len(args), jobs))
+        pool = multiprocessing.Pool(processes=jobs)
         try:
-            if _given_output_dir is None:
-                output_dir = tempfile.mkdtemp()
-            else:
-                # Increment the output directory if necessary.
-                output_dir = dirutil.make_available_dir(_given_output_dir)
-            _log.debug("created output dir: %s" % output_dir)
-            does_match = self._check(output_dir)
-            if does_match:
-                msg = "template okay!"
-            else:
-                msg = "template not okay :("
-            self._write(msg)
+            # A chunk size of 1 keeps slow templates from holding up others.
+            return pool.map(_check_template, args, chunksize=1)
         finally:
-            if output_dir is None:
-                # Then directory creation failed.
-                pass
-            elif _given_output_dir is None or does_match:
-                _log.debug("deleting output dir: %s" % output_dir)
-                shutil.rmtree(output_dir)
-                output_dir = None
-            else:
-                _log.debug("leaving output dir: %s" % output_dir)
-        return does_match, output_dir
+            pool.close()
+            pool.join()
+
+    def check(self):
+        """
+        Returns a (did_succeed, summary) pair.
+
+        """
+        start_time = time.time()
+        results = self._check_all()
+        seconds = time.time() - start_time
+
+        for result in results:
+            if result.report:
+                self.stdout.write("==> %s\n%s" % (result.template_dir, result.report))
+            if result.profile_data is not None:
+                self.profile.update(result.profile_data)
+
+        passed = [result for result in results if result.does_match]
+        lines = ["checked %d templates in %.2fs: %d passed, %d failed" %
+                 (len(results), seconds, len(passed), len(results) - len(passed))]
+        lines.extend(result.describe() for result in results)
+        did_succeed = len(passed) == len(results)
+        return did_succeed, "\n".join(lines)
@@ -51,11 +51,16 @@ from molt.scripts.molt import argparsing
 from molt.scripts.molt.argparsing import OPTION_HELP
 import molt.scripts.molt.general.logconfig as logconfig
 from molt.scripts.molt.general.optionparser import UsageError
-from molt.test.harness import test_logger
+# We import the test package rather than the test harness for the name
+# of the test logger since the harness imports much of the package.
+import molt.test
 
 
 LOGGING_LEVEL_DEFAULT = logging.INFO
 
+# The name of the logger for non-diagnostic application output.
+OUTPUT_LOGGER_NAME = "molt.output"
+
 _app_log = logging.getLogger("molt.app")
 _log = logging.getLogger(__name__)
 
@@ -75,8 +80,7 @@ def _configure_output_logger(stream):
     """Configure a special logger for non-diagnostic application output."""
     configurer = logconfig.LogConfigurer(stream=stream)
     handler = configurer.make_handler("molt: %(message)s")
-    # TODO: put this string constant somewhere else.
-    log = logging.getLogger("molt.output")
+    log = logging.getLogger(OUTPUT_LOGGER_NAME)
     log.propagate = False
     log.setLevel(logging.INFO)
     log.addHandler(handler)
@@ -123,7 +127,7 @@ def _configure_logging(sys_argv, sys_stderr=None):
     # Set the loggers to display during test runs.
     if is_running_tests:
         # TODO: tighten the list of names to allow.
-        names = [logconfig.__name__, _app_log.name, test_logger.name]
+        names = [logconfig.__name__, _app_log.name, molt.test.__name__]
     elif succinct_logging:
         # Let the error-catching logger log.
         # TODO: add a test for this.
@@ -0,0 +1,299 @@
+# encoding: utf-8
+#
+# Copyright (C) 2012 Chris Jerdonek. All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# * Redistributions of source code must retain the above copyright notice,
+#   this list of conditions and the following disclaimer.
+# * Redistributions in binary form must reproduce the above copyright notice,
+#   this list of conditions and the following disclaimer in the documentation
+#   and/or other materials provided with the distribution.
+# * The names of the copyright holders may not be used to endorse or promote
+#   products derived from this software without specific prior written
+#   permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+# CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+# SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+#
+
+"""
+Unit tests for molt.test.harness.alltest.
+
+"""
+
+import json
+import os
+from StringIO import StringIO
+import sys
+import unittest
+from unittest import TestCase, TestSuite
+from unittest.runner import _WritelnDecorator
+
+from molt.test.harness import config_load_tests, SandBoxDirMixin
+from molt.test.harness.alltest import (could_match, discover_modules, get_module_mtimes,
+                                       order_suite, read_discovery_cache, read_failed_ids,
+                                       ResultSummary, TimingTestResult,
+                                       write_discovery_cache, write_failed_ids)
+from molt.test.harness.loading import _test_gen
+
+
+# Trigger the load_tests protocol.
+load_tests = config_load_tests
+
+
+class CouldMatchTestCase(unittest.TestCase):
+
+    def test_none(self):
+        self.assertTrue(could_match('molt.diff', None))
+
+    def test_prefix_of_name(self):
+        self.assertTrue(could_match('molt.test.diff_test', ['molt.test']))
+        self.assertTrue(could_match('molt.diff', ['molt.di']))
+
+    def test_name_of_prefix(self):
+        self.assertTrue(could_match('molt.test.diff_test', ['molt.test.diff_test.FooTestCase']))
+        self.assertFalse(could_match('molt.diff', ['molt.diff_test']))
+
+    def test_no_match(self):
+        self.assertFalse(could_match('molt.test.diff_test', ['molt.test.dirutil_test', 'README']))
+
+
+class DiscoveryCacheTestCase(unittest.TestCase, SandBoxDirMixin):
+
+    def _write_file(self, path, contents=""):
+        with open(path, 'w') as f:
+            f.write(contents)
+
+    def test_get_module_mtimes(self):
+        with self.sandboxDir() as temp_dir:
+            package_dir = os.path.join(temp_dir, 'package')
+            os.makedirs(os.path.join(package_dir, 'sub'))
+            self._write_file(os.path.join(package_dir, '__init__.py'))
+            self._write_file(os.path.join(package_dir, 'data.txt'))
+            self._write_file(os.path.join(package_dir, 'foo.py'))
+            os.utime(os.path.join(package_dir, 'foo.py'), (1000, 1000))
+            # A directory without __init__.py is not a package.
+            self._write_file(os.path.join(package_dir, 'sub', 'bar.py'))
+            mtimes = get_module_mtimes([package_dir])
+            self.assertEquals(sorted(mtimes), ['package.foo'])
+            self.assertEquals(mtimes['package.foo'], 1000)
+
+            self._write_file(os.path.join(package_dir, 'sub', '__init__.py'))
+            self.assertEquals(sorted(get_module_mtimes([package_dir])),
+                              ['package.foo', 'package.sub', 'package.sub.bar'])
+
+    def test_read_discovery_cache(self):
+        with self.sandboxDir() as temp_dir:
+            cache_path = os.path.join(temp_dir, 'cache', 'discovery.json')
+            self.assertIs(read_discovery_cache(cache_path), None)
+
+            inventory = {'version': 2, 'layout': 'abc', 'module_names': ['foo'],
+                         'has_doctests': {}}
+            self.assertTrue(write_discovery_cache(cache_path, inventory))
+            self.assertEquals(read_discovery_cache(cache_path), inventory)
+
+            inventory['version'] = 1
+            self.assertTrue(write_discovery_cache(cache_path, inventory))
+            self.assertIs(read_discovery_cache(cache_path), None)
+
+    def test_read_discovery_cache__unreadable(self):
+        with self.sandboxDir() as temp_dir:
+            cache_path = os.path.join(temp_dir, 'discovery.json')
+            self._write_file(cache_path, "{")
+            self.assertIs(read_discovery_cache(cache_path), None)
+
+    def _discover(self, package_dir, test_names, cache_path):
+        module_names, suites = discover_modules([package_dir], test_names=test_names,
+                                                cache_path=cache_path)
+        return sorted(test.id() for suite in suites for test in _test_gen(suite))
+
+    def test_discover_modules(self):
+        package_name = 'molt_sample_discovery'
+        with self.sandboxDir() as temp_dir:
+            package_dir = os.path.join(temp_dir, package_name)
+            os.mkdir(package_dir)
+            self._write_file(os.path.join(package_dir, '__init__.py'))
+            self._write_file(os.path.join(package_dir, 'has_doctest.py'),
+                             'def foo():\n    """\n    >>> 1\n    1\n\n    """\n')
+            plain_path = os.path.join(package_dir, 'plain.py')
+            self._write_file(plain_path, '"""Plain."""\n')
+            os.utime(plain_path, (1000, 1000))
+            # Modules not matching the test names are not imported.
+            self._write_file(os.path.join(package_dir, 'broken.py'), 'raise Exception()\n')
+            cache_path = os.path.join(temp_dir, 'discovery.json')
+            test_names = [package_name + '.has_doctest', package_name + '.plain']
+            sys.path.insert(0, temp_dir)
+            try:
+                self.assertEquals(self._discover(package_dir, test_names, cache_path),
+                                  [package_name + '.has_doctest.foo'])
+                # Unchanged modules without doctests are not imported again.
+                self._write_file(plain_path, '"""Plain."""\nraise Exception()\n')
+                os.utime(plain_path, (1000, 1000))
+                self.assertEquals(self._discover(package_dir, test_names, cache_path),
+                                  [package_name + '.has_doctest.foo'])
+                # Changed modules are.
+                os.utime(plain_path, (2000, 2000))
+                del sys.modules[package_name + '.plain']
+                self.assertRaises(Exception, self._discover, package_dir, test_names,
+                                  cache_path)
+            finally:
+                sys.path.remove(temp_dir)
+                for name in list(sys.modules):
+                    if name.split('.')[0] == package_name:
+                        del sys.modules[name]
+
+
+def _make_sample_tests():
+    # The class is defined in a function to hide it from test discovery.
+    class SampleTestCase(TestCase):
+
+        def test_pass(self):
+            pass
+
+        def test_fail(self):
+            """Sample failure."""
+            self.fail("sample failure")
+
+        @unittest.skip("sample reason")
+        def test_skip(self):
+            pass
+
+    return [SampleTestCase(name) for name in ['test_pass', 'test_fail', 'test_skip']]
+
+
+def _make_result():
+    return TimingTestResult(_WritelnDecorator(StringIO()), descriptions=True, verbosity=1)
+
+
+class TimingTestResultTestCase(unittest.TestCase):
+
+    def _run(self):
+        result = _make_result()
+        TestSuite(_make_sample_tests()).run(result)
+        return result
+
+    def test_durations(self):
+        result = self._run()
+        self.assertEquals([test_id.rsplit('.', 1)[1] for test_id, seconds in result.durations],
+                          ['test_pass', 'test_fail', 'test_skip'])
+        for test_id, seconds in result.durations:
+            self.assertTrue(seconds >= 0)
+
+    def test_format_slowest(self):
+        result = self._run()
+        result.durations = [('a', 1.0), ('b', 3.0), ('c', 2.0)]
+        self.assertEquals(result.format_slowest(2), """\
+slowest 2 of 3 tests (6.000s total):
+    3.000s  b
+    2.000s  c""")
+
+    def test_make_junit_xml(self):
+        result = self._run()
+        suite = result.make_junit_xml('sample').getroot()
+        self.assertEquals(suite.tag, 'testsuite')
+        self.assertEquals([suite.get(name) for name in ['name', 'tests', 'failures',
+                                                        'errors', 'skipped']],
+                          ['sample', '3', '1', '0', '1'])
+        cases = suite.findall('testcase')
+        self.assertEquals([case.get('name') for case in cases],
+                          ['test_pass', 'test_fail', 'test_skip'])
+        self.assertTrue(cases[0].get('classname').endswith('.SampleTestCase'))
+        self.assertEquals(list(cases[0]), [])
+        failure = cases[1].find('failure')
+        self.assertEquals(failure.get('message'), "AssertionError: sample failure")
+        self.assertIn("Traceback", failure.text)
+        self.assertEquals(cases[2].find('skipped').get('message'), "sample reason")
+
+
+class ResultSummaryTestCase(unittest.TestCase):
+
+    def _make_summary(self):
+        result = _make_result()
+        TestSuite(_make_sample_tests()).run(result)
+        return ResultSummary.from_result(result)
+
+    def test_add_to(self):
+        summary = self._make_summary()
+        self.assertFalse(summary.was_successful())
+        # Round-trip the summary through JSON.
+        summary = ResultSummary.from_dict(json.loads(json.dumps(summary.to_dict())))
+
+        merged = _make_result()
+        summary.add_to(merged)
+        summary.add_to(merged)
+
+        self.assertEquals(merged.testsRun, 6)
+        self.assertEquals(len(merged.durations), 6)
+        self.assertEquals(len(merged.skipped), 2)
+        self.assertFalse(merged.wasSuccessful())
+        self.assertEquals(len(merged.failures), 2)
+        test, traceback = merged.failures[0]
+        self.assertEquals(test.id(), "%s.SampleTestCase.test_fail" % __name__)
+        self.assertEquals(str(test), "test_fail (%s.SampleTestCase)\nSample failure." % __name__)
+        self.assertIn("sample failure", traceback)
+
+        # The placeholder describes itself in the merged result's report.
+        merged.printErrors()
+        self.assertIn("FAIL: test_fail (%s.SampleTestCase)\nSample failure." % __name__,
+                      merged.stream.getvalue())
+
+
+def _get_names(suite):
+    return [test.id().rsplit('.', 1)[1] for test in _test_gen(suite)]
+
+
+class OrderSuiteTestCase(unittest.TestCase):
+
+    def test_order_suite(self):
+        tests = _make_sample_tests()
+        suite = TestSuite([TestSuite(tests[:2]), tests[2]])
+        ordered = order_suite(suite, set([tests[1].id(), tests[2].id()]))
+        self.assertEquals(_get_names(ordered), ['test_fail', 'test_skip', 'test_pass'])
+
+    def test_order_suite__no_match(self):
+        ordered = order_suite(TestSuite(_make_sample_tests()), set(['foo']))
+        self.assertEquals(_get_names(ordered), ['test_pass', 'test_fail', 'test_skip'])
+
+
+class FailedIdsTestCase(unittest.TestCase, SandBoxDirMixin):
+
+    def test_read_failed_ids__missing(self):
+        with self.sandboxDir() as temp_dir:
+            self.assertEquals(read_failed_ids(os.path.join(temp_dir, 'failed.json')), set())
+
+    def test_write_failed_ids(self):
+        result = _make_result()
+        tests = _make_sample_tests()
+        TestSuite(tests).run(result)
+        # The test that passed this time is dropped, and the test that
+        # did not run is kept.
+        previous_ids = set([tests[0].id(), 'other.test'])
+        with self.sandboxDir() as temp_dir:
+            path = os.path.join(temp_dir, 'cache', 'failed.json')
+            failed_ids = write_failed_ids(path, result, previous_ids)
+            self.assertEquals(read_failed_ids(path), failed_ids)
+        self.assertEquals(failed_ids, set([tests[1].id(), 'other.test']))
+
+    def test_write_failed_ids__known_ids(self):
+        result = _make_result()
+        tests = _make_sample_tests()
+        TestSuite(tests).run(result)
+        # The test that no longer exists is dropped.
+        previous_ids = set(['other.test', 'removed.test'])
+        with self.sandboxDir() as temp_dir:
+            path = os.path.join(temp_dir, 'failed.json')
+            failed_ids = write_failed_ids(path, result, previous_ids,
+                                          known_ids=set(['other.test']))
+            self.assertEquals(read_failed_ids(path), failed_ids)
+        self.assertEquals(failed_ids, set([tests[1].id(), 'other.test']))
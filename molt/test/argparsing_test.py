@@ -115,3 +115,57 @@ class ParseArgsTestCase(unittest.TestCase):
         pargs = parse_args(argv)
         self.assertIs(pargs.input_directory, None)
 
+
+    def test_check_template_dirs__not_checking(self):
+        argv = ['prog', 'foo']
+        pargs = parse_args(argv)
+        self.assertIs(pargs.mode_check_template, False)
+
+    def test_check_template_dirs__input_directory(self):
+        argv = ['prog', 'foo', '--check-template']
+        pargs = parse_args(argv)
+        self.assertIs(pargs.mode_check_template, True)
+        self.assertListEqual(pargs.check_template_dirs, [])
+        self.assertEquals(pargs.input_directory, 'foo')
+
+    def test_check_template_dirs__several(self):
+        argv = ['prog', '--check-template', 'foo', 'bar/*', '--jobs', '2']
+        pargs = parse_args(argv)
+        self.assertListEqual(pargs.check_template_dirs, ['foo', 'bar/*'])
+        self.assertEquals(pargs.jobs, 2)
+
+    def test_shard(self):
+        argv = ['prog', '--shard', '2/3', '--run-tests']
+        pargs = parse_args(argv)
+        self.assertEquals(pargs.shard, (2, 3))
+
+    def test_shard__invalid(self):
+        for value in ['2', 'a/3', '0/3', '4/3']:
+            argv = ['prog', '--shard', value, '--run-tests']
+            self.assertRaises(UsageError, parse_args, argv)
+
+    def test_merge_test_results(self):
+        argv = ['prog', '--merge-test-results', 'a.json', 'b.json']
+        pargs = parse_args(argv)
+        self.assertIs(pargs.mode_merge_test_results, True)
+        self.assertListEqual(pargs.merge_results_paths, ['a.json', 'b.json'])
+
+    def test_failed_first_and_fail_fast(self):
+        pargs = parse_args(['prog', '--run-tests'])
+        self.assertIs(pargs.failed_first, False)
+        self.assertIs(pargs.fail_fast, False)
+        pargs = parse_args(['prog', '--failed-first', '--fail-fast', '--run-tests'])
+        self.assertIs(pargs.failed_first, True)
+        self.assertIs(pargs.fail_fast, True)
+
+    def test_test_tmpfs(self):
+        pargs = parse_args(['prog', '--run-tests'])
+        self.assertIs(pargs.test_tmpfs_dir, None)
+        # The option does not consume a following test name.
+        pargs = parse_args(['prog', '--run-tests', '--test-tmpfs', 'molt.test'])
+        self.assertEquals(pargs.test_tmpfs_dir, '/dev/shm')
+        self.assertEquals(pargs.input_directory, 'molt.test')
+
+    def test_test_tmpfs_dir(self):
+        pargs = parse_args(['prog', '--test-tmpfs-dir', 'foo', '--run-tests'])
+        self.assertEquals(pargs.test_tmpfs_dir, 'foo')
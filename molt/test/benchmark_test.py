@@ -0,0 +1,135 @@
+# encoding: utf-8
+#
+# Copyright (C) 2012 Chris Jerdonek. All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# * Redistributions of source code must retain the above copyright notice,
+#   this list of conditions and the following disclaimer.
+# * Redistributions in binary form must reproduce the above copyright notice,
+#   this list of conditions and the following disclaimer in the documentation
+#   and/or other materials provided with the distribution.
+# * The names of the copyright holders may not be used to endorse or promote
+#   products derived from this software without specific prior written
+#   permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+# CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+# SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+#
+
+"""
+Unit tests for the molt.benchmark package.
+
+"""
+
+import os
+from StringIO import StringIO
+import sys
+import unittest
+
+from molt.benchmark.diff import make_tree_pair
+from molt.benchmark.harness import load_baseline, run_benchmarks
+from molt.benchmark.lambdas import LambdaBenchmark, make_payload
+import molt.diff as diff
+from molt.benchmark.templates import make_template
+from molt.molter import Molter
+from molt.test.harness import config_load_tests, SandBoxDirMixin
+
+
+# Trigger the load_tests protocol.
+load_tests = config_load_tests
+
+
+class MakeTemplateTestCase(unittest.TestCase, SandBoxDirMixin):
+
+    def test_render(self):
+        with self.sandboxDir() as temp_dir:
+            template_dir = os.path.join(temp_dir, 'template')
+            make_template(template_dir, files=10, depth=3, partials=2, lambdas=1,
+                          file_size=500, context_size=5)
+            tree = Molter().render_tree(template_dir)
+            path = os.path.join(template_dir, 'structure', 'file_0_{{name}}.txt.mustache')
+            self.assertTrue(os.path.getsize(path) >= 500)
+
+        self.assertEqual(len(tree), 10)
+        self.assertEqual(sorted(tree.list_dir('bench_1')), ['bench_2', 'copied_4.txt',
+                                                             'file_5_bench.txt', 'file_6_bench.txt'])
+        text = tree.read('file_0_bench.txt')
+        self.assertTrue(text.startswith("bench: file 0\npartial 0 of bench\n"
+                                        "partial 1 of bench\nlambda text 0\n"))
+        self.assertIn("line 6: value 1 lorem", text)
+
+
+class MakeTreePairTestCase(unittest.TestCase, SandBoxDirMixin):
+
+    def _compare(self, diff_fraction):
+        with self.sandboxDir() as temp_dir:
+            dirs = tuple(os.path.join(temp_dir, name) for name in ('actual', 'expected'))
+            bytes = make_tree_pair(*dirs, files=150, file_size=300, fuzz_density=0.5,
+                                   diff_fraction=diff_fraction, binary_fraction=0.3)
+            self.assertTrue(bytes > 150 * 300)
+            self.assertEqual(sorted(os.listdir(dirs[0])), ['dir_0', 'dir_1'])
+            names = os.listdir(os.path.join(dirs[1], 'dir_1'))
+            self.assertEqual(len(names), 50)
+            self.assertEqual(set(os.path.splitext(name)[1] for name in names),
+                             set(['.bin', '.txt']))
+            stdout = sys.stdout
+            sys.stdout = StringIO()
+            try:
+                return diff.Comparer().compare_dirs(dirs)
+            finally:
+                sys.stdout = stdout
+
+    def test_same(self):
+        self.assertTrue(self._compare(diff_fraction=0.0))
+
+    def test_different(self):
+        self.assertFalse(self._compare(diff_fraction=1.0))
+
+
+class LambdaBenchmarkTestCase(unittest.TestCase, SandBoxDirMixin):
+
+    def test_make_payload(self):
+        for size in (0, 5, 1000):
+            self.assertEqual(len(make_payload(size).encode('utf-8')), size)
+
+    def test_run(self):
+        benchmark = LambdaBenchmark('bash_1kb', interpreter='bash', payload_size=1024,
+                                    calls=2)
+        with self.sandboxDir() as temp_dir:
+            result = benchmark.run(temp_dir, 1)
+        self.assertTrue(0 < result['p50'] <= result['p99'])
+        self.assertEqual(sorted(result['breakdown']),
+                         ['encode_decode', 'pipe_io', 'spawn', 'startup'])
+        self.assertIn("p99", benchmark.describe(result, None))
+
+
+class RunBenchmarksTestCase(unittest.TestCase, SandBoxDirMixin):
+
+    def test_baseline(self):
+        with self.sandboxDir() as temp_dir:
+            stream = StringIO()
+            summary = run_benchmarks(names=['render.default'], repeat=1,
+                                     update_baseline=True, baseline_dir=temp_dir,
+                                     stream=stream)
+            self.assertEqual(summary, "ran 1 benchmarks: 0 slower and 0 faster "
+                                      "than baseline, 1 without baseline")
+            self.assertIn("(no baseline)", stream.getvalue())
+            baseline = load_baseline(os.path.join(temp_dir, 'render.json'))
+            self.assertEqual(baseline.keys(), ['default'])
+            self.assertEqual(baseline['default']['files'], 50)
+
+            stream = StringIO()
+            summary = run_benchmarks(names=['render.default'], repeat=1,
+                                     baseline_dir=temp_dir, stream=stream)
+            self.assertTrue(summary.endswith(" 0 without baseline"))
@@ -37,7 +37,7 @@ import unittest
 
 import molt.diff as diff
 from molt.diff import match_fuzzy
-from molt.test.harness import config_load_tests
+from molt.test.harness import config_load_tests, SandBoxDirMixin
 
 
 # Trigger the load_tests protocol.
@@ -164,3 +164,199 @@ fuzz:     %r
         self._assert_diff_lines("a", "ab", 1)
         self._assert_diff_lines("", "a...", 0, 0, fuzz="...")
         self._assert_diff_lines("ablahcefgdefg", "a...c...d", 10, 9, fuzz="...")
+
+
+class CompareLinesTestCase(unittest.TestCase):
+
+    """Test _StringComparer.compare_lines()."""
+
+    def _comparer(self):
+        return diff._StringComparer(fuzz="...", context=2)
+
+    def _assert_same_as_strings(self, actual, expected):
+        """
+        Check that streaming gives the same result as comparing strings.
+
+        """
+        comparer = self._comparer()
+        strs = (actual, expected)
+        iters = [iter(u.splitlines(True)) for u in strs]
+        self.assertEqual(comparer.compare_lines(iters),
+                         comparer.compare_strings(strs))
+
+    def test_same(self):
+        self._assert_same_as_strings(u"a\nb\n", u"a\nb\n")
+        self._assert_same_as_strings(u"", u"")
+
+    def test_fuzzy(self):
+        self._assert_same_as_strings(u"a\nbcd\n", u"a\nb...\n")
+
+    def test_different_line(self):
+        self._assert_same_as_strings(u"a\nb\nc\nd\nx\ny\n", u"a\nb\nc\nd\nz\ny\n")
+
+    def test_different_number_of_lines(self):
+        self._assert_same_as_strings(u"a\nb\n", u"a\nb\nc\n")
+        self._assert_same_as_strings(u"a\nb\nc", u"a\nb\n")
+
+    def test_stops_at_first_difference(self):
+        """
+        Check that lines after the block of the first difference are not read.
+
+        """
+        def lines(first):
+            yield first
+            for i in range(diff._BLOCK_LINES - 1):
+                yield u"x\n"
+            raise AssertionError("read past the first difference")
+
+        comparer = self._comparer()
+        result = comparer.compare_lines((lines(u"a\n"), lines(u"b\n")))
+        self.assertEqual(result[0], "first difference found at line 1, "
+                                    "characters 1 and 1, resp.\n")
+
+    def test_difference_after_first_block(self):
+        expected = u"a\n" * (diff._BLOCK_LINES + 5)
+        actual = expected + u"b\n"
+        self._assert_same_as_strings(actual, expected)
+        actual = u"a\n" * (diff._BLOCK_LINES + 2) + u"c\n" + u"a\n" * 2
+        self._assert_same_as_strings(actual, expected)
+
+
+@unittest.skipIf(diff._import_numpy() is None, "numpy not available")
+class VectorizedTestCase(unittest.TestCase):
+
+    """Test that _LineComparer gives the same results with and without NumPy."""
+
+    def _compare_seqs(self, seqs):
+        comparer = diff._LineComparer(fuzz="...")
+        info = comparer.compare_seqs(seqs)
+        return None if info is None else (info.line_index, info.char_indices)
+
+    def _assert_vectorized(self, actual, expected, line_index):
+        seqs = (actual, expected)
+        result = self._compare_seqs(seqs)
+        numpy = diff.numpy
+        diff.numpy = None
+        try:
+            unvectorized = self._compare_seqs(seqs)
+        finally:
+            diff.numpy = numpy
+        self.assertEqual(result, unvectorized)
+        self.assertEqual(None if result is None else result[0], line_index)
+
+    def _lines(self):
+        count = 2 * diff._VECTORIZE_MIN_LINES
+        return [u"line %d\n" % i for i in range(count)]
+
+    def test_same(self):
+        lines = self._lines()
+        self._assert_vectorized(lines, list(lines), None)
+
+    def test_different_line(self):
+        expected = self._lines()
+        actual = list(expected)
+        actual[1500] = u"other\n"
+        self._assert_vectorized(actual, expected, 1500)
+
+    def test_different_number_of_lines(self):
+        expected = self._lines()
+        self._assert_vectorized(expected[:-1], expected, len(expected) - 1)
+
+    def test_equal_hashes(self):
+        """Check that lines with equal hashes are still compared."""
+        class SameHash(unicode):
+            def __hash__(self):
+                return 0
+
+        expected = [SameHash(line) for line in self._lines()]
+        actual = list(expected)
+        actual[1500] = SameHash(u"other\n")
+        self._assert_vectorized(actual, expected, 1500)
+
+    def test_fuzz(self):
+        expected = self._lines()
+        actual = list(expected)
+        expected[10] = u"li...0\n"
+        expected[20] = u"...\n"
+        actual[1500] = u"other\n"
+        self._assert_vectorized(actual, expected, 1500)
+        expected[30] = u"x...\n"
+        self._assert_vectorized(actual, expected, 30)
+
+
+class HunksTestCase(unittest.TestCase):
+
+    """Test _StringComparer with max_hunks."""
+
+    def _compare(self, actual, expected, max_hunks=10):
+        comparer = diff._StringComparer(fuzz="...", context=1, max_hunks=max_hunks)
+        report = comparer.compare_strings((actual, expected))
+        iters = [u.splitlines(True) for u in (actual, expected)]
+        self.assertEqual(comparer.compare_lines(iters), report)
+        return "".join(report)
+
+    def test_same(self):
+        self.assertEqual(self._compare(u"a\nb\n", u"a\nb...\n"), "")
+
+    def test_all_hunks(self):
+        actual = u"a\nb\nc\nd\ne\nf\ng\n"
+        expected = u"a\nx\nc\nd\ne\ng\n"
+        self.assertEqual(self._compare(actual, expected), u"""\
+differences found in 2 hunks.
+--- expected
++++ actual
+@@ -1,3 +1,3 @@
+ a
+-x
++b
+ c
+@@ -5,2 +5,3 @@
+ e
++f
+ g
+""")
+
+    def test_fuzz_is_wildcard(self):
+        actual = u"a\nb1\nc\n"
+        expected = u"a\nb...\nd\n"
+        self.assertEqual(self._compare(actual, expected), u"""\
+differences found in 1 hunk.
+--- expected
++++ actual
+@@ -2,2 +2,2 @@
+ b1
+-d
++c
+""")
+
+    def test_max_hunks(self):
+        actual = u"a\nb\nc\nd\ne\n"
+        expected = u"x\nb\nc\nd\ny\n"
+        report = self._compare(actual, expected, max_hunks=1)
+        self.assertTrue(report.endswith("(1 more hunks not shown)\n"), msg=report)
+
+
+class BinaryFileTestCase(unittest.TestCase, SandBoxDirMixin):
+
+    """Test comparing files that are not valid UTF-8."""
+
+    def _write(self, temp_dir, name, b):
+        path = os.path.join(temp_dir, name)
+        with open(path, 'wb') as f:
+            f.write(b)
+        return path
+
+    def test_compare_files(self):
+        with self.sandboxDir() as temp_dir:
+            paths = [self._write(temp_dir, name, "\x00\xff\xfe\n") for name in ('a', 'b')]
+            fcomparer = diff.Comparer()._dir_comparer().custom.fcomparer
+            self.assertEqual(fcomparer.compare_files(paths), [])
+            self._write(temp_dir, 'b', "\x00\xff\xfd\n")
+            self.assertEqual(fcomparer.compare_files(paths), ["Binary files differ: %s\n" % paths[1]])
+
+    def test_compare_data(self):
+        with self.sandboxDir() as temp_dir:
+            path = self._write(temp_dir, 'a', "\x00\xff\xfe\n")
+            fcomparer = diff.Comparer()._dir_comparer().custom.fcomparer
+            self.assertEqual(fcomparer.compare_data("\x00\xff\xfe\n", path), [])
+            self.assertEqual(len(fcomparer.compare_data("\xff", path)), 1)
@@ -32,18 +32,22 @@ Provides end-to-end tests that call Molt from the command-line.
 
 """
 
+import json
 import logging
 import os
+import shutil
 import sys
 from unittest import TestCase
 
+from molt.dirutil import stage_template_dir
 from molt.general.popen import call_script
 from molt.test.harness import (
     config_load_tests,
-    should_ignore_file,
     AssertDirMixin,
     SandBoxDirMixin,
+    IGNORE_PATTERNS,
 )
+from molt.test.harness.inprocess import call_molt_in_process
 
 
 ENCODING_DEFAULT = 'utf-8'
@@ -80,17 +84,28 @@ class EndToEndMixin(SandBoxDirMixin, AssertDirMixin):
     """
     Mixin class for TestCase classes in this module.
 
+    By default, molt is called in the test process, which is much faster
+    than starting an interpreter for each call.  Set in_process to False
+    to call molt from the command-line, as a real user would.
+
     """
 
+    in_process = True
+
     @property
     def _demo_template_dir(self):
         return self.test_config.project.demo_template_dir
 
     def _call_molt(self, args):
         """
-        Call `molt` from the command-line.
+        Call `molt`, and return (args, stdout, stderr, return_code).
 
         """
+        if self.in_process:
+            stdout, stderr, return_code = call_molt_in_process(args,
+                from_source=self.test_config.from_source)
+            return ['molt'] + args, stdout, stderr, return_code
+
         first_args = self.test_config.call_molt_args
         args = first_args + args
 
@@ -149,7 +164,7 @@ class EndToEndMixin(SandBoxDirMixin, AssertDirMixin):
         format_msg = self.make_format_message(args, stderr)
 
         self.assertDirectoriesEqual(actual_dir, expected_dir, format_msg=format_msg, fuzzy=fuzzy,
-                                    should_ignore=should_ignore_file)
+                                    ignore=IGNORE_PATTERNS)
 
 
 class ReadmeTestCase(TestCase, EndToEndMixin):
@@ -159,6 +174,9 @@ class ReadmeTestCase(TestCase, EndToEndMixin):
 
     """
 
+    # Run the README instructions exactly as a user would.
+    in_process = False
+
     def test_try_it(self):
         """
         Test the instructions in the "Try it" section of the README.
@@ -188,6 +206,9 @@ class ReadmeTestCase(TestCase, EndToEndMixin):
 
 class CreateDemoTestCase(TestCase, EndToEndMixin):
 
+    # Also test the installed command-line entry point.
+    in_process = False
+
     def test_create_demo__with_output(self):
         with self.sandboxDir() as temp_dir:
             output_dir = os.path.join(temp_dir, 'demo')
@@ -198,3 +219,206 @@ class CreateDemoTestCase(TestCase, EndToEndMixin):
 
             self.assert_molt(args, output_dir, expected_dir=expected_dir,
                              expected_stdout=output_dir)
+
+
+class CheckTemplateTestCase(TestCase, EndToEndMixin):
+
+    # Checking several templates starts a process pool.
+    in_process = False
+
+    def test_check_template__several(self):
+        with self.sandboxDir() as temp_dir:
+            for name in ('a', 'b'):
+                stage_template_dir(self._demo_template_dir, os.path.join(temp_dir, name))
+            with open(os.path.join(temp_dir, 'b', 'expected', 'hello.py'), 'ab') as f:
+                f.write("# extra line\n")
+
+            pattern = os.path.join(temp_dir, '*')
+            args, stdout, stderr, return_code = self._call_molt(
+                ['--check-template', pattern, '--jobs', '2'])
+            format_msg = self.make_format_message(args, stderr)
+
+            self.assertEquals(1, return_code, msg=format_msg("exit status: %s != 1" % return_code))
+            self.assertIn("checked 2 templates", stdout)
+            self.assertIn("==> %s" % os.path.join(temp_dir, 'b'), stdout)
+            lines = [line.split() for line in stdout.splitlines() if temp_dir in line]
+            statuses = [(words[0], words[-1]) for words in lines if words[0] != "==>"]
+            self.assertEquals(statuses, [("ok", os.path.join(temp_dir, 'a')),
+                                         ("FAILED", os.path.join(temp_dir, 'b'))])
+
+    def test_check_template__glob_chars_in_name(self):
+        """
+        Check that an existing path with glob characters is not expanded.
+
+        """
+        with self.sandboxDir() as temp_dir:
+            # As a pattern, "foo[1]" would match only "foo1".
+            template_dir = os.path.join(temp_dir, 'foo[1]')
+            stage_template_dir(self._demo_template_dir, template_dir)
+            args, stdout, stderr, return_code = self._call_molt(
+                ['--check-template', template_dir])
+            format_msg = self.make_format_message(args, stderr)
+
+            self.assertEquals(0, return_code, msg=format_msg("exit status: %s != 0" % return_code))
+
+
+class CheckOutputTestCase(TestCase, EndToEndMixin):
+
+    def test_check_output(self):
+        with self.sandboxDir() as temp_dir:
+            template_dir = os.path.join(temp_dir, 'template')
+            stage_template_dir(self._demo_template_dir, template_dir)
+            output_dir = os.path.join(temp_dir, 'output')
+            self._call_molt(['--output', output_dir, template_dir])
+
+            args = ['--check-output', template_dir, output_dir]
+            args, stdout, stderr, return_code = self._call_molt(args)
+            format_msg = self.make_format_message(args, stderr)
+            self.assertEquals(0, return_code, msg=format_msg("exit status: %s != 0" % return_code))
+
+            with open(os.path.join(output_dir, 'hello.py'), 'ab') as f:
+                f.write("# extra line\n")
+            expected_dir = os.path.join(template_dir, 'expected')
+            args = ['--check-output', expected_dir, output_dir]
+            args, stdout, stderr, return_code = self._call_molt(args)
+            format_msg = self.make_format_message(args, stderr)
+            self.assertEquals(1, return_code, msg=format_msg("exit status: %s != 1" % return_code))
+            self.assertIn("+# extra line", stdout)
+
+
+class UpdateExpectedTestCase(TestCase, EndToEndMixin):
+
+    def test_update_expected(self):
+        with self.sandboxDir() as temp_dir:
+            template_dir = os.path.join(temp_dir, 'template')
+            stage_template_dir(self._demo_template_dir, template_dir)
+            expected_dir = os.path.join(template_dir, 'expected')
+            hello_path = os.path.join(expected_dir, 'hello.py')
+            with open(hello_path, 'ab') as f:
+                f.write("# extra line\n")
+            with open(os.path.join(expected_dir, 'stale.txt'), 'wb') as f:
+                f.write("stale\n")
+            os.remove(os.path.join(expected_dir, 'hello', '__init__.py'))
+
+            args, stdout, stderr, return_code = self._call_molt(['--update-expected', template_dir])
+            format_msg = self.make_format_message(args, stderr)
+            self.assertEquals(0, return_code, msg=format_msg("exit status: %s != 0" % return_code))
+            self.assertEquals(stdout.splitlines()[1:], [
+                "  added: %s" % os.path.join('hello', '__init__.py'),
+                "  removed: stale.txt",
+                "  updated: hello.py",
+                "1 added, 1 removed, 1 updated"])
+
+            # Check that the fuzz was kept.
+            with open(hello_path, 'rb') as f:
+                self.assertIn("# Project auto-generated at: ...\n", f.read())
+            args, stdout, stderr, return_code = self._call_molt(['--check-template', template_dir])
+            format_msg = self.make_format_message(args, stderr)
+            self.assertEquals(0, return_code, msg=format_msg("exit status: %s != 0" % return_code))
+
+    def _update_expected(self, template_dir, check=True):
+        """
+        Update the expected directory, and return the summary lines.
+
+        Arguments:
+
+          check: whether to check the template after updating.
+
+        """
+        args, stdout, stderr, return_code = self._call_molt(['--update-expected', template_dir])
+        format_msg = self.make_format_message(args, stderr)
+        self.assertEquals(0, return_code, msg=format_msg("exit status: %s != 0" % return_code))
+        if not check:
+            return stdout.splitlines()[1:]
+        args, stdout2, stderr, return_code = self._call_molt(['--check-template', template_dir])
+        format_msg = self.make_format_message(args, stderr)
+        self.assertEquals(0, return_code, msg=format_msg("exit status: %s != 0" % return_code))
+        return stdout.splitlines()[1:]
+
+    def test_update_expected__binary_file(self):
+        with self.sandboxDir() as temp_dir:
+            template_dir = os.path.join(temp_dir, 'template')
+            stage_template_dir(self._demo_template_dir, template_dir)
+            with open(os.path.join(template_dir, 'expected', 'hello.py'), 'wb') as f:
+                f.write("\xff\xfe\x00binary")
+
+            self.assertEquals(self._update_expected(template_dir), [
+                "  updated: hello.py",
+                "0 added, 0 removed, 1 updated"])
+
+    def test_update_expected__file_and_directory(self):
+        with self.sandboxDir() as temp_dir:
+            template_dir = os.path.join(temp_dir, 'template')
+            stage_template_dir(self._demo_template_dir, template_dir)
+            expected_dir = os.path.join(template_dir, 'expected')
+            # Replace a directory with a file, and a file with a directory.
+            shutil.rmtree(os.path.join(expected_dir, 'hello'))
+            with open(os.path.join(expected_dir, 'hello'), 'wb') as f:
+                f.write("file\n")
+            os.remove(os.path.join(expected_dir, 'hello.py'))
+            os.mkdir(os.path.join(expected_dir, 'hello.py'))
+
+            # Added files are copied without fuzz, so the timestamp in the
+            # added hello/main.py would not match a later rendering.
+            self.assertEquals(self._update_expected(template_dir, check=False), [
+                "  added: hello",
+                "  added: hello.py",
+                "  removed: hello",
+                "  removed: hello.py",
+                "2 added, 2 removed, 0 updated"])
+            self.assertTrue(os.path.isdir(os.path.join(expected_dir, 'hello')))
+            self.assertTrue(os.path.isfile(os.path.join(expected_dir, 'hello.py')))
+
+
+class ProfileTestCase(TestCase, EndToEndMixin):
+
+    def test_profile__check_template(self):
+        with self.sandboxDir() as temp_dir:
+            template_dir = os.path.join(temp_dir, 'template')
+            stage_template_dir(self._demo_template_dir, template_dir)
+            profile_path = os.path.join(temp_dir, 'profile.json')
+
+            args = ['--check-template', template_dir, '--profile=%s' % profile_path]
+            args, stdout, stderr, return_code = self._call_molt(args)
+            format_msg = self.make_format_message(args, stderr)
+            self.assertEquals(0, return_code, msg=format_msg("exit status: %s != 0" % return_code))
+            self.assertIn("slowest lambdas", stderr)
+
+            with open(profile_path, 'rb') as f:
+                data = json.load(f)
+            self.assertEquals(len(data['renders']), 1)
+            self.assertEquals(sorted(entry['output_path'] for entry in data['files']),
+                              ['hello.py', os.path.join('hello', '__init__.py'),
+                               os.path.join('hello', 'main.py'),
+                               os.path.join('templates', 'hello.mustache')])
+            self.assertEquals(sorted(stats['name'] for stats in data['lambdas']),
+                              ['hash_comment', 'now'])
+
+
+class RunTestsTestCase(TestCase, EndToEndMixin):
+
+    in_process = False
+
+    def test_run_tests__jobs(self):
+        args = ['--jobs', '2', '--run-tests', 'molt.test.dirutil_test',
+                'molt.test.manifest_test']
+        args, stdout, stderr, return_code = self._call_molt(args)
+        format_msg = self.make_format_message(args, stderr)
+        self.assertEquals(0, return_code, msg=format_msg("exit status: %s != 0" % return_code))
+        self.assertIn("running 2 test units using 2 processes", stderr)
+        self.assertRegexpMatches(stderr, r"\nRan \d+ tests in ")
+
+    def test_run_tests__name_after_option(self):
+        """
+        Check that a test name after an option is still a test name.
+
+        """
+        with self.sandboxDir() as temp_dir:
+            args = ['--run-tests', '--test-tmpfs-dir', temp_dir, '--no-test-cache',
+                    'molt.test.dirutil_test']
+            args, stdout, stderr, return_code = self._call_molt(args)
+        format_msg = self.make_format_message(args, stderr)
+        self.assertEquals(0, return_code, msg=format_msg("exit status: %s != 0" % return_code))
+        self.assertIn("created test run dir: %s" % temp_dir, stderr)
+        self.assertNotIn("molt.test.diff_test", stderr)
+        self.assertIn("Ran 8 tests in ", stderr)
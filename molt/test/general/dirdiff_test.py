@@ -157,7 +157,32 @@ class DirComparerTestCase(unittest.TestCase):
 
         self._assert_diff(expected=expected, compare=compare)
 
+    def test_diff__ignore_patterns(self):
+        """
+        Check that ignored paths are skipped, including whole directories.
+
+        """
+        differ = DirComparer(ignore=['/b/', 'diff*.txt', '!diff2.txt'])
+        dir1, dir2 = (os.path.join(self._data_dir, name) for name in ('dir1', 'dir2'))
+        actual = differ.diff(dir1, dir2)
+
+        self._assert_results(actual, (['a.txt'], ['d'], ['a/diff2.txt']))
+
     def test_diff__directory_not_existing(self):
         differ = DirComparer()
         dir1, dir2 = (os.path.join(self._data_dir, name) for name in ('dir1', 'not_exist'))
         self.assertRaises(OSError, differ.diff, dir1, dir2)
+
+    def test_diff__file_and_directory(self):
+        """
+        Check that a file on one side and a directory on the other differ.
+
+        """
+        listings = [{'left': {'a': True, 'b': False, 'c': False}, 'left/a': {}},
+                    {'right': {'a': False, 'b': True, 'c': False}, 'right/b': {}}]
+        list_funcs = [lambda path, listing=listing: dict(listing[path]) for
+                      listing in listings]
+        differ = DirComparer(compare=lambda path1, path2: True)
+        actual = differ.diff('left', 'right', list_funcs=list_funcs)
+
+        self._assert_results(actual, (['a', 'b'], ['a', 'b'], []))
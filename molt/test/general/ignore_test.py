@@ -0,0 +1,110 @@
+# encoding: utf-8
+#
+# Copyright (C) 2012 Chris Jerdonek. All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# * Redistributions of source code must retain the above copyright notice,
+#   this list of conditions and the following disclaimer.
+# * Redistributions in binary form must reproduce the above copyright notice,
+#   this list of conditions and the following disclaimer in the documentation
+#   and/or other materials provided with the distribution.
+# * The names of the copyright holders may not be used to endorse or promote
+#   products derived from this software without specific prior written
+#   permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+# CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+# SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+#
+
+"""
+Unit tests for ignore.py.
+
+"""
+
+from __future__ import absolute_import
+
+import unittest
+
+from molt.general.ignore import IgnoreMatcher
+
+
+class IgnoreMatcherTestCase(unittest.TestCase):
+
+    def _assert(self, patterns, path, expected, is_dir=False):
+        matcher = IgnoreMatcher(patterns)
+        actual = matcher.matches(path, is_dir=is_dir)
+        msg = "%r: %r (is_dir=%s)" % (patterns, path, is_dir)
+        self.assertIs(actual, expected, msg=msg)
+
+    def test_no_patterns(self):
+        self._assert([], 'foo', False)
+
+    def test_blank_and_comment_lines(self):
+        self._assert(['', '  ', '# foo'], 'foo', False)
+        self._assert(['\\#foo'], '#foo', True)
+
+    def test_name__any_depth(self):
+        self._assert(['foo'], 'foo', True)
+        self._assert(['foo'], 'a/b/foo', True)
+        self._assert(['foo'], 'a/foo', True, is_dir=True)
+        self._assert(['foo'], 'foobar', False)
+
+    def test_wildcards(self):
+        self._assert(['*.pyc'], 'a/b.pyc', True)
+        self._assert(['*.pyc'], 'a/b.py', False)
+        self._assert(['?.txt'], 'a.txt', True)
+        self._assert(['?.txt'], 'ab.txt', False)
+        self._assert(['[ab].txt'], 'b.txt', True)
+        self._assert(['[!ab].txt'], 'b.txt', False)
+
+    def test_star__does_not_cross_directories(self):
+        self._assert(['a*c'], 'a/c', False)
+        self._assert(['a/*'], 'a/b/c', False)
+
+    def test_double_star(self):
+        self._assert(['**/foo'], 'foo', True)
+        self._assert(['**/foo'], 'a/b/foo', True)
+        self._assert(['a/**/b'], 'a/b', True)
+        self._assert(['a/**/b'], 'a/x/y/b', True)
+        self._assert(['a/**'], 'a/x/y', True)
+        self._assert(['a/**'], 'a', False, is_dir=True)
+
+    def test_anchored(self):
+        self._assert(['/foo'], 'foo', True)
+        self._assert(['/foo'], 'a/foo', False)
+        self._assert(['a/foo'], 'a/foo', True)
+        self._assert(['a/foo'], 'b/a/foo', False)
+
+    def test_directory_only(self):
+        self._assert(['foo/'], 'foo', True, is_dir=True)
+        self._assert(['foo/'], 'foo', False)
+
+    def test_negation__last_match_wins(self):
+        patterns = ['*.txt', '!keep.txt']
+        self._assert(patterns, 'a.txt', True)
+        self._assert(patterns, 'keep.txt', False)
+        self._assert(patterns + ['keep*'], 'keep.txt', True)
+
+    def test_literal_special_characters(self):
+        self._assert(['a+b(c).txt'], 'a+b(c).txt', True)
+        self._assert(['a.txt'], 'abtxt', False)
+
+    def test_filter_names(self):
+        matcher = IgnoreMatcher(['/a/build/', '*.pyc'])
+        entries = {'build': True, 'b.pyc': False, 'c.py': False}
+        self.assertEquals(matcher.filter_names(entries, 'a'), {'c.py': False})
+        self.assertEquals(matcher.filter_names(entries),
+                          {'build': True, 'c.py': False})
+        # The argument is not modified.
+        self.assertEquals(len(entries), 3)
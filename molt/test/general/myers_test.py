@@ -0,0 +1,99 @@
+# encoding: utf-8
+#
+# Copyright (C) 2012 Chris Jerdonek. All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# * Redistributions of source code must retain the above copyright notice,
+#   this list of conditions and the following disclaimer.
+# * Redistributions in binary form must reproduce the above copyright notice,
+#   this list of conditions and the following disclaimer in the documentation
+#   and/or other materials provided with the distribution.
+# * The names of the copyright holders may not be used to endorse or promote
+#   products derived from this software without specific prior written
+#   permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+# CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+# SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+#
+
+"""
+Unit tests for myers.py.
+
+"""
+
+from __future__ import absolute_import
+
+import unittest
+
+from molt.general.myers import get_opcodes, group_opcodes
+
+
+def _apply(opcodes, a, b):
+    """Return the result of applying the opcodes to a."""
+    result = []
+    for tag, i1, i2, j1, j2 in opcodes:
+        result.extend(a[i1:i2] if tag == 'equal' else b[j1:j2])
+    return result
+
+
+class GetOpcodesTestCase(unittest.TestCase):
+
+    def _assert_edits(self, a, b, expected_edits, equal=None):
+        opcodes = get_opcodes(a, b, equal=equal)
+        if equal is None:
+            self.assertEqual(_apply(opcodes, a, b), list(b))
+        edits = sum(i2 - i1 + j2 - j1 for tag, i1, i2, j1, j2 in opcodes if tag != 'equal')
+        self.assertEqual(edits, expected_edits)
+
+    def test_equal(self):
+        self.assertEqual(get_opcodes("abc", "abc"), [('equal', 0, 3, 0, 3)])
+
+    def test_empty(self):
+        self.assertEqual(get_opcodes("", ""), [])
+        self.assertEqual(get_opcodes("", "ab"), [('insert', 0, 0, 0, 2)])
+        self.assertEqual(get_opcodes("ab", ""), [('delete', 0, 2, 0, 0)])
+
+    def test_replace(self):
+        self.assertEqual(get_opcodes("axc", "ayc"),
+                         [('equal', 0, 1, 0, 1), ('replace', 1, 2, 1, 2),
+                          ('equal', 2, 3, 2, 3)])
+
+    def test_shortest(self):
+        # This is the example from Myers's paper, with D = 5.
+        self._assert_edits("abcabba", "cbabac", 5)
+        self._assert_edits("abcdefgh", "axcdyfgzh", 5)
+
+    def test_equal_function(self):
+        equal = lambda x, y: x == '*' or x == y
+        self._assert_edits("a*c", "abc", 0, equal=equal)
+        self._assert_edits("a*c", "abxc", 1, equal=equal)
+
+    def test_max_d(self):
+        self.assertIs(get_opcodes("abc", "xyz", max_d=5), None)
+        self.assertNotEqual(get_opcodes("abc", "xyz", max_d=6), None)
+
+
+class GroupOpcodesTestCase(unittest.TestCase):
+
+    def test_separate_groups(self):
+        a = "a1cdefghij2lm"
+        b = "a3cdefghij4lm"
+        groups = group_opcodes(get_opcodes(a, b), context=2)
+        self.assertEqual([[code[0] for code in group] for group in groups],
+                         [['equal', 'replace', 'equal'], ['equal', 'replace', 'equal']])
+        self.assertEqual(groups[0][0], ('equal', 0, 1, 0, 1))
+        self.assertEqual(groups[1][-1], ('equal', 11, 13, 11, 13))
+
+    def test_no_changes(self):
+        self.assertEqual(group_opcodes(get_opcodes("abc", "abc")), [])
@@ -37,10 +37,15 @@ Exposes a generic run_tests() function to run all tests in a project.
 from __future__ import absolute_import
 
 import doctest
+import hashlib
+import json
 import os
 from pkgutil import walk_packages
 import sys
-from unittest import TestCase, TestLoader, TestProgram, TestSuite, TextTestRunner
+import time
+from unittest import (TestCase, TestLoader, TestProgram, TestSuite, TextTestResult,
+                      TextTestRunner)
+from xml.etree import ElementTree
 
 from molt.general.error import reraise
 from molt.test.harness.common import test_logger as _log
@@ -75,17 +80,6 @@ def make_doctest_file_suites(paths):
     return suites
 
 
-def make_doctests(module_names, text_paths):
-    """
-    Return a list of TestSuite instances containing all project doctests.
-
-    """
-    suites = make_doctest_test_suites(module_names)
-    suites.extend(make_doctest_file_suites(text_paths))
-
-    return suites
-
-
 def find_modules(package_dir):
     """
     Return a list of the names of modules inside a package.
@@ -101,10 +95,185 @@ def find_modules(package_dir):
     return names
 
 
-def find_tests(package_dirs, is_unittest_module, doctest_paths, extra_tests):
+# The version of the format of the test discovery cache file.
+DISCOVERY_CACHE_VERSION = 2
+
+# The version of the format of the file of failed test IDs.
+FAILED_TESTS_VERSION = 1
+
+
+def could_match(name, test_names):
+    """
+    Return whether tests with the given name prefix could match test_names.
+
+    For example, both the module name "molt.test.diff_test" and the
+    doctest name "molt.diff.match_fuzzy" could match the prefix "molt.diff".
+
+    Arguments:
+
+      name: a module name or test name.
+
+      test_names: the list of test-name prefixes, or None to match all.
+
+    """
+    if test_names is None:
+        return True
+    for prefix in test_names:
+        if name.startswith(prefix) or prefix.startswith(name + "."):
+            return True
+    return False
+
+
+def get_module_mtimes(package_dirs):
+    """
+    Return a dict of the modification times of the modules in the packages.
+
+    The dict maps the name of each module with a .py file to the
+    modification time of the file.
+
+    """
+    mtimes = {}
+    for package_dir in package_dirs:
+        prefix = os.path.basename(package_dir)
+        for dir_path, dir_names, file_names in os.walk(package_dir):
+            # Like walk_packages(), only descend into packages.
+            dir_names[:] = [name for name in dir_names if
+                            os.path.exists(os.path.join(dir_path, name, '__init__.py'))]
+            for file_name in file_names:
+                if not file_name.endswith('.py'):
+                    continue
+                path = os.path.join(dir_path, file_name)
+                parts = os.path.relpath(path, package_dir)[:-len('.py')].split(os.sep)
+                if parts[-1] == '__init__':
+                    parts.pop()
+                if not parts:
+                    # Like find_modules(), skip the package itself.
+                    continue
+                name = ".".join([prefix] + parts)
+                mtimes[name] = os.path.getmtime(path)
+
+    return mtimes
+
+
+def read_discovery_cache(cache_path):
+    """
+    Return the cached test inventory as a dict, or None if not available.
+
+    """
+    if cache_path is None or not os.path.exists(cache_path):
+        return None
+    try:
+        with open(cache_path, 'rb') as f:
+            inventory = json.load(f)
+    except (IOError, ValueError), err:
+        _log.warning("ignoring unreadable test discovery cache: %s: %s" % (cache_path, err))
+        return None
+    if inventory.get('version') != DISCOVERY_CACHE_VERSION:
+        return None
+    return inventory
+
+
+def write_discovery_cache(cache_path, inventory):
+    """
+    Write the test inventory to the cache path, and return whether written.
+
+    """
+    temp_path = "%s.%d" % (cache_path, os.getpid())
+    try:
+        cache_dir = os.path.dirname(cache_path)
+        if not os.path.exists(cache_dir):
+            os.makedirs(cache_dir)
+        with open(temp_path, 'wb') as f:
+            json.dump(inventory, f, indent=2, sort_keys=True)
+        # Renaming keeps concurrent test processes from reading a partial file.
+        os.rename(temp_path, cache_path)
+    except (IOError, OSError), err:
+        _log.warning("error writing test discovery cache: %s: %s" % (cache_path, err))
+        return False
+    return True
+
+
+def discover_modules(package_dirs, test_names=None, cache_path=None):
+    """
+    Return a pair (module_names, doctest_suites).
+
+    The doctest suites are the TestSuite instances of the doctests in
+    the modules that could match test_names.  Finding them imports each
+    such module, so whether a module has doctests is cached at
+    cache_path, if provided, along with the module's modification time.
+    A module not modified since it was found to have no doctests is not
+    imported again.  The module names are cached until a module is
+    added or removed.
+
+    """
+    mtimes = get_module_mtimes(package_dirs)
+    layout = hashlib.sha1(repr(sorted(mtimes))).hexdigest()
+
+    inventory = read_discovery_cache(cache_path)
+    if inventory is not None and inventory['layout'] == layout:
+        _log.info("using test discovery cache: %s" % cache_path)
+        module_names = inventory['module_names']
+        has_doctests = inventory['has_doctests']
+        is_changed = False
+    else:
+        module_names_list = [find_modules(package_dir) for package_dir in package_dirs]
+        module_names = reduce(lambda names1, names2: names1 + names2, module_names_list)
+        module_names.sort()
+        # Keep the entries of the modules that still exist.
+        has_doctests = {} if inventory is None else inventory['has_doctests']
+        has_doctests = dict((name, entry) for name, entry in has_doctests.items() if
+                            name in mtimes)
+        is_changed = True
+
+    # Skip __main__.py files to avoid triggering a script to be run twice.
+    # We need to do this because calling doctest.DocTestSuite() on a module
+    # imports the module as a side effect.
+    candidate_names = [name for name in module_names if
+                       not name.endswith(".__main__") and could_match(name, test_names)]
+
+    doctest_suites = []
+    for name in candidate_names:
+        # Each entry is a pair [mtime, whether the module has doctests].
+        mtime = mtimes.get(name)
+        entry = has_doctests.get(name)
+        if mtime is not None and entry == [mtime, False]:
+            continue
+        suite = make_doctest_test_suites([name])[0]
+        is_doctest_module = suite.countTestCases() > 0
+        if is_doctest_module:
+            doctest_suites.append(suite)
+        if mtime is not None and entry != [mtime, is_doctest_module]:
+            has_doctests[name] = [mtime, is_doctest_module]
+            is_changed = True
+
+    if cache_path is not None and is_changed:
+        inventory = {
+            'version': DISCOVERY_CACHE_VERSION,
+            'layout': layout,
+            'module_names': module_names,
+            'has_doctests': has_doctests,
+        }
+        if write_discovery_cache(cache_path, inventory):
+            _log.info("wrote test discovery cache: %s" % cache_path)
+
+    return module_names, doctest_suites
+
+
+def find_tests(package_dirs, is_unittest_module, doctest_paths, extra_tests,
+               test_names=None, cache_path=None):
     """
     Find all tests and return a pair (test_suites, test_module_names).
 
+    Only the unit test modules and doctests that could match the
+    test-name prefixes in test_names are returned, so that running a
+    subset of tests does not require importing every module.
+
+    Arguments:
+
+      cache_path: the path to a file in which to cache the module names
+        and which modules have doctests between runs, or None not to
+        cache.  See discover_modules().
+
     """
     # TODO: consider using unittest's test discovery functionality
     #   added in Python 2.7.
@@ -115,28 +284,29 @@ def find_tests(package_dirs, is_unittest_module, doctest_paths, extra_tests):
     #
     # We use our own test discovery method here to support test discovery
     # in Python 2.6 and earlier.
-    module_names_list = [find_modules(package_dir) for package_dir in package_dirs]
-    module_names = reduce(lambda names1, names2: names1 + names2, module_names_list)
-    module_names.sort()
+    module_names, doctest_suites = discover_modules(package_dirs, test_names=test_names,
+                                                    cache_path=cache_path)
 
-    # Skip __main__.py files to avoid triggering a script to be run twice.
-    # We need to do this because calling doctest.DocTestSuite() on a module
-    # imports the module as a side effect.
-    doctest_module_names = filter(lambda name: not name.endswith(".__main__"),
-                                  module_names)
-    doctests = make_doctests(doctest_module_names, doctest_paths)
+    # The test name of a doctest file is its file name with the dots
+    # replaced by underscores (e.g. "README_md").
+    doctest_paths = [path for path in doctest_paths if
+                     could_match(os.path.basename(path).replace(".", "_"), test_names)]
+    doctests = doctest_suites + make_doctest_file_suites(doctest_paths)
 
     tests = extra_tests + doctests
 
-    test_module_names = filter(is_unittest_module, module_names)
+    test_module_names = [name for name in module_names if
+                         is_unittest_module(name) and could_match(name, test_names)]
 
     return tests, test_module_names
 
+
 def run_tests(package_dirs, is_unittest_module, test_config, test_names=None,
               extra_tests=None, doctest_paths=None, verbosity=1,
-              test_runner_stream=None):
+              test_runner_stream=None, cache_path=None, test_ids=None,
+              first_ids=None, fail_fast=False):
     """
-    Run all tests, and return a unittest.TestResult instance.
+    Run all tests, and return a TimingTestResult instance.
 
     Arguments:
 
@@ -156,6 +326,17 @@ def run_tests(package_dirs, is_unittest_module, test_config, test_names=None,
       test_runner_stream: the stream object to pass to unittest.TextTestRunner.
         Defaults to sys.stderr.
 
+      cache_path: the path to a file in which to cache test discovery
+        between runs, or None not to cache.  See find_tests().
+
+      test_ids: a set of test IDs to further filter tests by (for example
+        to run a shard of the tests), or None not to filter.
+
+      first_ids: a set of the IDs of tests to run before the others (for
+        example the tests that failed in the previous run), or None.
+
+      fail_fast: whether to stop the run after the first failure or error.
+
     """
     if extra_tests is None:
         extra_tests = []
@@ -165,18 +346,11 @@ def run_tests(package_dirs, is_unittest_module, test_config, test_names=None,
         test_runner_stream = sys.stderr
 
     tests, test_module_names = find_tests(package_dirs, is_unittest_module,
-                                          doctest_paths, extra_tests)
-
-    def should_include(test_case):
-        if test_names is None:
-            return True
-        name = test_case.id()
-        for prefix in test_names:
-            if name.startswith(prefix):
-                return True
-        return False
+                                          doctest_paths, extra_tests,
+                                          test_names=test_names, cache_path=cache_path)
 
-    test_program_class = make_test_program_class(tests, should_include)
+    should_include = make_test_filter(test_names, test_ids)
+    test_program_class = make_test_program_class(tests, should_include, first_ids)
 
     # unittest.TestLoader's constructor, which is called directly by
     # unittest.main(), does not permit the defaultTest parameter to be
@@ -190,7 +364,8 @@ def run_tests(package_dirs, is_unittest_module, test_config, test_names=None,
     test_loader = UnittestTestLoader()
     test_loader.test_config = test_config
 
-    test_runner = TextTestRunner(stream=test_runner_stream, verbosity=verbosity)
+    test_runner = TextTestRunner(stream=test_runner_stream, verbosity=verbosity,
+                                 failfast=fail_fast, resultclass=TimingTestResult)
 
     # The verbosity argument was added to Python 3 in Python 3.2.
     test_program = test_program_class(argv=argv, module=None, exit=False, verbosity=verbosity,
@@ -199,6 +374,64 @@ def run_tests(package_dirs, is_unittest_module, test_config, test_names=None,
     return test_program.result
 
 
+def make_test_suite(package_dirs, is_unittest_module, test_config, test_names=None,
+                    extra_tests=None, doctest_paths=None, cache_path=None,
+                    test_ids=None, first_ids=None):
+    """
+    Load all tests, and return a unittest.TestSuite instance.
+
+    This loads the same tests as run_tests() but without running them.
+    See run_tests() for a description of the arguments.
+
+    """
+    if extra_tests is None:
+        extra_tests = []
+    if doctest_paths is None:
+        doctest_paths = []
+
+    tests, test_module_names = find_tests(package_dirs, is_unittest_module,
+                                          doctest_paths, extra_tests,
+                                          test_names=test_names, cache_path=cache_path)
+
+    test_loader = UnittestTestLoader()
+    test_loader.test_config = test_config
+
+    suite = test_loader.loadTestsFromNames(test_module_names)
+    suite.addTests(tests)
+
+    suite = filter_suite(suite, make_test_filter(test_names, test_ids))
+    if first_ids:
+        suite = order_suite(suite, first_ids)
+
+    return suite
+
+
+def make_test_filter(test_names, test_ids=None):
+    """
+    Return a should_include lambda that filters tests by name.
+
+    Arguments:
+
+      test_names: the list of test-name prefixes, or None to include all.
+
+      test_ids: a set of the IDs of the tests to include, or None to
+        include all.
+
+    """
+    def should_include(test_case):
+        name = test_case.id()
+        if test_ids is not None and name not in test_ids:
+            return False
+        if test_names is None:
+            return True
+        for prefix in test_names:
+            if name.startswith(prefix):
+                return True
+        return False
+
+    return should_include
+
+
 def filter_suite(test_suite, should_include):
     """
     Return a copy of the given TestSuite filtered by prefix.
@@ -222,7 +455,28 @@ def filter_suite(test_suite, should_include):
     return filtered
 
 
-def make_test_program_class(tests, should_include):
+def order_suite(test_suite, first_ids):
+    """
+    Return a copy of the given TestSuite with some tests moved first.
+
+    The tests keep their relative order otherwise.
+
+    Arguments:
+
+      first_ids: a set of the IDs of the tests to run first.
+
+    """
+    def is_first(test_case):
+        return test_case.id() in first_ids
+
+    def is_not_first(test_case):
+        return test_case.id() not in first_ids
+
+    return TestSuite([filter_suite(test_suite, is_first),
+                      filter_suite(test_suite, is_not_first)])
+
+
+def make_test_program_class(tests, should_include, first_ids=None):
     """
     Return a unittest.TestProgram subclass that adds a list of custom tests.
 
@@ -234,6 +488,9 @@ def make_test_program_class(tests, should_include):
       should_include: a lambda accepting a TestCase instance and returning
         whether to include the test in the test run.
 
+      first_ids: a set of the IDs of the tests to run before the others,
+        or None.  See order_suite().
+
     """
     class PystacheTestProgram(TestProgram):
 
@@ -266,6 +523,8 @@ def make_test_program_class(tests, should_include):
             self.test.addTests(tests)
 
             self.test = filter_suite(self.test, should_include)
+            if first_ids:
+                self.test = order_suite(self.test, first_ids)
 
     return PystacheTestProgram
 
@@ -308,3 +567,283 @@ an ImportError in the module being processed.
 
         return self.suiteClass(suites)
 
+
+
+class TimingTestResult(TextTestResult):
+
+    """
+    A TextTestResult that records how long each test takes.
+
+    The duration of a test includes its setUp() and tearDown(), and for
+    tests using a sandbox directory, deleting the directory.
+
+    """
+
+    def __init__(self, *args, **kwargs):
+        super(TimingTestResult, self).__init__(*args, **kwargs)
+        # A list of (test_id, seconds) pairs in the order the tests ran.
+        self.durations = []
+        self._start_time = None
+
+    def startTest(self, test):
+        self._start_time = time.time()
+        super(TimingTestResult, self).startTest(test)
+
+    def stopTest(self, test):
+        super(TimingTestResult, self).stopTest(test)
+        self.durations.append((test.id(), time.time() - self._start_time))
+
+    def format_slowest(self, count):
+        """
+        Return a report of the count slowest tests.
+
+        """
+        durations = sorted(self.durations, key=lambda pair: pair[1], reverse=True)
+        total = sum(seconds for test_id, seconds in durations)
+        lines = ["slowest %d of %d tests (%.3fs total):" % (min(count, len(durations)),
+                                                            len(durations), total)]
+        for test_id, seconds in durations[:count]:
+            lines.append("  %7.3fs  %s" % (seconds, test_id))
+
+        return "\n".join(lines)
+
+    def _get_outcomes(self):
+        """
+        Return a dict mapping test ID to a pair (tag, details) for non-passes.
+
+        """
+        outcomes = {}
+        for tag, pairs in [('skipped', self.skipped), ('failure', self.failures),
+                           ('error', self.errors)]:
+            for test, details in pairs:
+                outcomes[test.id()] = (tag, details)
+        return outcomes
+
+    def make_junit_xml(self, suite_name):
+        """
+        Return the results with timings as a JUnit XML ElementTree.
+
+        """
+        outcomes = self._get_outcomes()
+        counts = {'failure': 0, 'error': 0, 'skipped': 0}
+
+        suite = ElementTree.Element('testsuite')
+        for test_id, seconds in self.durations:
+            class_name, _, name = test_id.rpartition('.')
+            case = ElementTree.SubElement(suite, 'testcase', classname=class_name,
+                                          name=name, time="%.3f" % seconds)
+            if test_id not in outcomes:
+                continue
+            tag, details = outcomes[test_id]
+            counts[tag] += 1
+            element = ElementTree.SubElement(case, tag)
+            if tag == 'skipped':
+                element.set('message', details)
+            else:
+                # The last line of a traceback is the exception.
+                element.set('message', details.rstrip().splitlines()[-1])
+                element.text = details
+
+        suite.set('name', suite_name)
+        suite.set('tests', str(len(self.durations)))
+        suite.set('failures', str(counts['failure']))
+        suite.set('errors', str(counts['error']))
+        suite.set('skipped', str(counts['skipped']))
+        suite.set('time', "%.3f" % sum(seconds for test_id, seconds in self.durations))
+
+        return ElementTree.ElementTree(suite)
+
+    def write_junit_xml(self, path, suite_name):
+        """
+        Write the results with timings to a JUnit XML file.
+
+        """
+        tree = self.make_junit_xml(suite_name)
+        with open(path, 'wb') as f:
+            tree.write(f, encoding='utf-8')
+
+
+class TestPlaceholder(object):
+
+    """
+    Stands in for a test run in another process in a TestResult.
+
+    """
+
+    def __init__(self, test_id, description):
+        self._id = test_id
+        self.description = description
+
+    def __str__(self):
+        return self.description
+
+    def id(self):
+        return self._id
+
+    def shortDescription(self):
+        # The description already includes the first docstring line.
+        return None
+
+
+class ResultSummary(object):
+
+    """
+    A summary of a TimingTestResult that can be pickled or stored as JSON.
+
+    Tests are summarized as (test_id, description, details) triples,
+    where details is a traceback, a skip reason, or None.
+
+    """
+
+    def __init__(self, tests_run=0, durations=None, errors=None, failures=None,
+                 skipped=None, expected_failures=None, unexpected_successes=None):
+        self.tests_run = tests_run
+        self.durations = durations or []
+        self.errors = errors or []
+        self.failures = failures or []
+        self.skipped = skipped or []
+        self.expected_failures = expected_failures or []
+        self.unexpected_successes = unexpected_successes or []
+
+    @classmethod
+    def from_result(cls, result):
+        """
+        Return a summary of a TimingTestResult instance.
+
+        """
+        def summarize(pairs):
+            return [(test.id(), result.getDescription(test), details) for
+                    test, details in pairs]
+
+        return cls(tests_run=result.testsRun,
+                   durations=list(result.durations),
+                   errors=summarize(result.errors),
+                   failures=summarize(result.failures),
+                   skipped=summarize(result.skipped),
+                   expected_failures=summarize(result.expectedFailures),
+                   unexpected_successes=summarize((test, None) for
+                                                  test in result.unexpectedSuccesses))
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(**data)
+
+    def to_dict(self):
+        return {
+            'tests_run': self.tests_run,
+            'durations': self.durations,
+            'errors': self.errors,
+            'failures': self.failures,
+            'skipped': self.skipped,
+            'expected_failures': self.expected_failures,
+            'unexpected_successes': self.unexpected_successes,
+        }
+
+    def was_successful(self):
+        return not (self.errors or self.failures)
+
+    def add_to(self, result):
+        """
+        Add the summarized results to a TimingTestResult instance.
+
+        """
+        def unsummarize(summaries):
+            return [(TestPlaceholder(test_id, description), details) for
+                    test_id, description, details in summaries]
+
+        result.testsRun += self.tests_run
+        result.durations.extend(tuple(pair) for pair in self.durations)
+        result.errors.extend(unsummarize(self.errors))
+        result.failures.extend(unsummarize(self.failures))
+        result.skipped.extend(unsummarize(self.skipped))
+        result.expectedFailures.extend(unsummarize(self.expected_failures))
+        result.unexpectedSuccesses.extend(test for test, details in
+                                          unsummarize(self.unexpected_successes))
+
+
+def write_summary(stream, result, seconds):
+    """
+    Write the summary of a test run in the format of unittest.TextTestRunner.
+
+    """
+    result.printErrors()
+    stream.writeln(result.separator2)
+    run = result.testsRun
+    stream.writeln("Ran %d test%s in %.3fs" % (run, run != 1 and "s" or "", seconds))
+    stream.writeln()
+
+    infos = []
+    if not result.wasSuccessful():
+        stream.write("FAILED")
+        failed, errored = map(len, (result.failures, result.errors))
+        if failed:
+            infos.append("failures=%d" % failed)
+        if errored:
+            infos.append("errors=%d" % errored)
+    else:
+        stream.write("OK")
+    for label, tests in [("skipped", result.skipped),
+                         ("expected failures", result.expectedFailures),
+                         ("unexpected successes", result.unexpectedSuccesses)]:
+        if tests:
+            infos.append("%s=%d" % (label, len(tests)))
+    if infos:
+        stream.writeln(" (%s)" % ", ".join(infos))
+    else:
+        stream.write("\n")
+
+
+def read_failed_ids(path):
+    """
+    Return the set of IDs in a file of failed tests, or the empty set.
+
+    """
+    if path is None or not os.path.exists(path):
+        return set()
+    try:
+        with open(path, 'rb') as f:
+            data = json.load(f)
+    except (IOError, ValueError), err:
+        _log.warning("ignoring unreadable failed tests file: %s: %s" % (path, err))
+        return set()
+    if data.get('version') != FAILED_TESTS_VERSION:
+        return set()
+    return set(data['failed'])
+
+
+def write_failed_ids(path, result, previous_ids=None, known_ids=None):
+    """
+    Update a file of failed tests from a TimingTestResult, and return the IDs.
+
+    The IDs of failed tests that did not run this time (e.g. because
+    they were filtered out) are kept from previous_ids, unless they are
+    missing from known_ids.
+
+    Arguments:
+
+      known_ids: a set of the IDs of all existing tests, or None not to
+        drop any of previous_ids.
+
+    """
+    ran_ids = set(test_id for test_id, seconds in result.durations)
+    failed_ids = set(test.id() for test, details in result.errors + result.failures)
+    if previous_ids:
+        previous_ids = previous_ids - ran_ids
+        if known_ids is not None:
+            previous_ids &= known_ids
+        failed_ids |= previous_ids
+    data = {
+        'version': FAILED_TESTS_VERSION,
+        'failed': sorted(failed_ids),
+    }
+    temp_path = "%s.%d" % (path, os.getpid())
+    try:
+        dir_path = os.path.dirname(path)
+        if dir_path and not os.path.exists(dir_path):
+            os.makedirs(dir_path)
+        with open(temp_path, 'wb') as f:
+            json.dump(data, f, indent=2, sort_keys=True)
+        os.rename(temp_path, path)
+    except (IOError, OSError), err:
+        _log.warning("error writing failed tests file: %s: %s" % (path, err))
+    return failed_ids
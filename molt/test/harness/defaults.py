@@ -35,17 +35,33 @@ Provides test-related code that may need to be tweaked on occasion.
 from __future__ import absolute_import
 
 
-# For passing to AssertDirMixin.assertDirectoriesEqual() as the
-# should_ignore argument.
+# Gitignore-style patterns to pass to AssertDirMixin.assertDirectoriesEqual()
+# as the ignore argument.
 # TODO: consider calling this from TestConfig to avoid having
 #   to import this from individual test modules.
-def should_ignore_file(base_name):
-    """
-    Arguments:
+IGNORE_PATTERNS = ['*.pyc']
 
-      base_name: a file or directory name.
+# The prefix, followed by the user name, of the name of the directory in the
+# system temp directory in which to keep data between test runs (e.g. the
+# test discovery cache).
+TEST_CACHE_DIR_NAME = 'molt-test-cache'
 
-    """
-    if base_name.endswith('.pyc'):
-        return True
-    return False
+DISCOVERY_CACHE_FILE_NAME = 'discovery.json'
+
+# The name of the directory in the test cache directory in which to record
+# passing template tests.
+TEMPLATE_RESULTS_DIR_NAME = 'template_results'
+
+# The name of the file in the test cache directory of the durations of
+# the tests in the last full test run, with which to balance shards.
+TIMINGS_FILE_NAME = 'timings.json'
+
+# The name of the file in the test cache directory of the IDs of the tests
+# that failed in earlier runs, for running them first.
+FAILED_TESTS_FILE_NAME = 'failed_tests.json'
+
+# The number of seconds after which to remove an unused passing template
+# test result from the test cache directory, and the maximum number of
+# results to keep.
+TEMPLATE_RESULTS_MAX_AGE = 30 * 24 * 60 * 60
+TEMPLATE_RESULTS_MAX_COUNT = 1000
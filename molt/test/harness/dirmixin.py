@@ -38,7 +38,8 @@ from filecmp import dircmp
 import os
 from textwrap import dedent
 
-from molt.defaults import DIRCMP_IGNORE
+from molt.dirutil import make_ignore_matcher
+from molt.general.ignore import IgnoreMatcher
 from molt.test.harness import indent
 from molt.test.harness.common import AssertFileMixin
 
@@ -90,6 +91,18 @@ class AssertDirMixin(AssertFileMixin):
 
         return attr_val
 
+    def _make_should_ignore(self, dcmp, ignore, leading_path):
+        """
+        Return a function that returns whether to ignore a name in dcmp.
+
+        """
+        def should_ignore(name):
+            is_dir = any(os.path.isdir(os.path.join(dir_path, name)) for
+                         dir_path in (dcmp.left, dcmp.right))
+            return ignore.matches(os.path.join(leading_path, name), is_dir=is_dir)
+
+        return should_ignore
+
     def _assert_empty(self, dcmp, attr_name, should_ignore, format_msg):
         """
         Arguments:
@@ -158,7 +171,7 @@ class AssertDirMixin(AssertFileMixin):
 
     def assertDirectoriesEqual(self, actual_dir, expected_dir, format_msg=None,
                                fuzzy=False, file_encoding='utf-8', errors='strict',
-                               should_ignore=None):
+                               ignore=None):
         """
         Assert that the contents of two directories are equal.
 
@@ -169,22 +182,28 @@ class AssertDirMixin(AssertFileMixin):
           format_msg: a function that accepts a details string and returns
             the desired text for the assertion error message.
 
-          should_ignore: a boolean-value function that accepts a file or
-            directory name and returns whether to ignore it.
-            Defaults to ignoring no files.
+          ignore: an IgnoreMatcher instance, or a list of gitignore-style
+            patterns to ignore in addition to molt.defaults.DIRCMP_IGNORE.
+            Ignored directories are not descended into.
 
         """
         if format_msg is None:
             format_msg = lambda msg: msg
-        if should_ignore is None:
-            should_ignore = lambda file_name: False
+        if not isinstance(ignore, IgnoreMatcher):
+            ignore = make_ignore_matcher(patterns=ignore)
 
         self.assertFileExists(actual_dir, label='actual directory', format_msg=format_msg)
         self.assertFileExists(expected_dir, label='expected directory', format_msg=format_msg)
 
-        # TODO: consider using dircmp's hide keyword argument.
-        # TODO: inject IGNORED_FILES at run-time using load_tests().
-        dcmp = dircmp(expected_dir, actual_dir, ignore=DIRCMP_IGNORE)
+        self._assert_dirs_equal(actual_dir, expected_dir, format_msg=format_msg,
+                                fuzzy=fuzzy, ignore=ignore, leading_path='')
+
+    def _assert_dirs_equal(self, actual_dir, expected_dir, format_msg, fuzzy,
+                           ignore, leading_path):
+        # Filtering is done by the matcher, so we pass dircmp nothing to
+        # ignore (its default would otherwise be ['RCS', 'CVS', 'tags']).
+        dcmp = dircmp(expected_dir, actual_dir, ignore=[])
+        should_ignore = self._make_should_ignore(dcmp, ignore, leading_path)
 
         subdir_format_msg = self._make_subdir_format_msg(actual_dir, expected_dir, format_msg=format_msg)
 
@@ -195,9 +214,11 @@ class AssertDirMixin(AssertFileMixin):
             self._assert_empty(dcmp, attr, should_ignore=should_ignore,
                                format_msg=subdir_format_msg)
 
-        for subdir in dcmp.common_dirs:
+        # Skipping ignored directories here prunes their whole subtree.
+        for subdir in self._get_dcmp_attr(dcmp, 'common_dirs', should_ignore):
             expected_subdir = os.path.join(expected_dir, subdir)
             actual_subdir = os.path.join(actual_dir, subdir)
-            self.assertDirectoriesEqual(actual_subdir, expected_subdir,
-                                        format_msg=format_msg, fuzzy=True,
-                                        should_ignore=should_ignore)
+            self._assert_dirs_equal(actual_subdir, expected_subdir,
+                                    format_msg=format_msg, fuzzy=True,
+                                    ignore=ignore,
+                                    leading_path=os.path.join(leading_path, subdir))
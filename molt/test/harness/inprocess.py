@@ -0,0 +1,144 @@
+# encoding: utf-8
+#
+# Copyright (C) 2012 Chris Jerdonek. All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# * Redistributions of source code must retain the above copyright notice,
+#   this list of conditions and the following disclaimer.
+# * Redistributions in binary form must reproduce the above copyright notice,
+#   this list of conditions and the following disclaimer in the documentation
+#   and/or other materials provided with the distribution.
+# * The names of the copyright holders may not be used to endorse or promote
+#   products derived from this software without specific prior written
+#   permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+# CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+# SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+#
+
+"""
+Exposes a call_molt_in_process() function to call molt without a subprocess.
+
+"""
+
+from __future__ import absolute_import
+
+import logging
+import os
+import sys
+
+import molt.scripts.molt
+from molt.scripts.molt.main import OUTPUT_LOGGER_NAME, run_molt
+
+
+ENCODING_DEFAULT = 'utf-8'
+
+# The loggers to which run_molt() adds handlers.
+_CONFIGURED_LOGGER_NAMES = ['', OUTPUT_LOGGER_NAME]
+
+
+class _CaptureStream(object):
+
+    """
+    A stand-in for sys.stdout or sys.stderr that captures what is written.
+
+    Unicode strings are encoded, so that str and unicode strings can be
+    written in any order, as with a real standard stream.
+
+    """
+
+    encoding = ENCODING_DEFAULT
+
+    def __init__(self):
+        self._chunks = []
+
+    def write(self, text):
+        if isinstance(text, unicode):
+            text = text.encode(self.encoding)
+        self._chunks.append(text)
+
+    def writelines(self, lines):
+        for line in lines:
+            self.write(line)
+
+    def flush(self):
+        pass
+
+    def isatty(self):
+        return False
+
+    def getvalue(self):
+        """Return the captured text as a unicode string."""
+        return "".join(self._chunks).decode(self.encoding)
+
+
+def _save_loggers():
+    saved = []
+    for name in _CONFIGURED_LOGGER_NAMES:
+        logger = logging.getLogger(name)
+        saved.append((logger, logger.level, logger.handlers[:]))
+    return saved
+
+
+def _restore_loggers(saved):
+    for logger, level, handlers in saved:
+        logger.setLevel(level)
+        logger.handlers[:] = handlers
+
+
+def call_molt_in_process(args, from_source=False):
+    """
+    Call molt in this process, and return (stdout, stderr, return_code).
+
+    This is a cheaper alternative to calling molt in a subprocess.  The
+    standard streams are captured while molt runs, and logging is
+    configured as for a command-line call and restored afterwards.  The
+    stdout and stderr returned are unicode strings.
+
+    Output written directly to the file descriptors (e.g. by lambda
+    scripts or subprocesses) is not captured.  Modes that start process
+    pools or run tests should be called in a subprocess instead.
+
+    Arguments:
+
+      args: the command-line arguments, not including the script name.
+
+      from_source: see molt.scripts.molt.main.run_molt().
+
+    """
+    script_path = os.path.join(os.path.dirname(molt.scripts.molt.__file__), '__main__.py')
+    sys_argv = [script_path] + list(args)
+
+    stdout, stderr = _CaptureStream(), _CaptureStream()
+    saved_loggers = _save_loggers()
+    saved_streams = sys.argv, sys.stdout, sys.stderr
+    # run_molt() reports usage errors using sys.argv.
+    sys.argv, sys.stdout, sys.stderr = sys_argv, stdout, stderr
+
+    # Remove the current handlers so that logging during the call goes
+    # only to the captured stderr.
+    for logger, level, handlers in saved_loggers:
+        logger.handlers[:] = []
+
+    try:
+        try:
+            return_code = run_molt(sys_argv, from_source=from_source)
+        except SystemExit, err:
+            # For example, argparse exits after printing help.
+            return_code = 0 if err.code is None else err.code
+    finally:
+        sys.argv, sys.stdout, sys.stderr = saved_streams
+        _restore_loggers(saved_loggers)
+
+    return stdout.getvalue(), stderr.getvalue(), return_code
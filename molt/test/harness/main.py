@@ -33,16 +33,22 @@ Exposes a run_molt_tests() function to run all tests in this project.
 """
 
 from datetime import datetime
+import getpass
 import logging
 import os
 from shutil import rmtree
 import sys
-from tempfile import mkdtemp
+from tempfile import gettempdir, mkdtemp
+import time
 
 import molt
 import molt.scripts.molt
 from molt.projectmap import Locator
-from molt.test.harness.alltest import run_tests
+from molt.test.harness import defaults, sharding
+from molt.test.harness.alltest import (make_test_filter, make_test_suite, read_failed_ids,
+                                       run_tests, write_failed_ids)
+from molt.test.harness.loading import _test_gen
+from molt.test.harness.resultcache import TemplateResultCache
 
 
 _log = logging.getLogger(__name__)
@@ -61,16 +67,64 @@ def is_empty(dir_path):
     return not os.listdir(dir_path)
 
 
-def make_test_run_dir(test_output_dir):
+def get_test_cache_dir():
+    """
+    Return the directory in which to keep data between test runs.
+
+    The directory is specific to the current user, so that users do not
+    share cached results, and is created readable only by the user.
+
+    """
+    dir_name = "%s-%s" % (defaults.TEST_CACHE_DIR_NAME, getpass.getuser())
+    dir_path = os.path.join(gettempdir(), dir_name)
+    if not os.path.exists(dir_path):
+        os.makedirs(dir_path, 0700)
+    return dir_path
+
+
+def get_tmpfs_dir(tmpfs_dir):
+    """
+    Return tmpfs_dir if it is a writable directory, and otherwise None.
+
+    """
+    if os.path.isdir(tmpfs_dir) and os.access(tmpfs_dir, os.W_OK):
+        return tmpfs_dir
+    _log.warning("tmpfs directory not available: %s" % tmpfs_dir)
+    return None
+
+
+def get_timings_path():
+    """
+    Return the default path to the file of test durations for sharding.
+
+    """
+    return os.path.join(get_test_cache_dir(), defaults.TIMINGS_FILE_NAME)
+
+
+def get_failed_tests_path():
+    """
+    Return the path to the file of the IDs of the tests that last failed.
+
+    """
+    return os.path.join(get_test_cache_dir(), defaults.FAILED_TESTS_FILE_NAME)
+
+
+def make_test_run_dir(test_output_dir, tmpfs_dir=None):
     """
     Create the test run directory and return its path.
 
     Arguments:
 
       test_output_dir: the directory in which to create the test run directory.
-        Defaults to a system-specific temp directory.
+        Defaults to tmpfs_dir if available, or else to a system-specific
+        temp directory.
+
+      tmpfs_dir: the path to a directory on an in-memory file system
+        (e.g. /dev/shm), or None.
 
     """
+    if test_output_dir is None and tmpfs_dir is not None:
+        test_output_dir = get_tmpfs_dir(tmpfs_dir)
     prefix = make_dir_prefix()
     dir_path = mkdtemp(prefix=prefix, dir=test_output_dir)
     _log.info("created test run dir: %s" % dir_path)
@@ -79,9 +133,14 @@ def make_test_run_dir(test_output_dir):
 
 
 def run_molt_tests(from_source, source_dir=None, verbose=False, test_names=None,
-                   test_output_dir=None, test_runner_stream=None):
+                   test_output_dir=None, test_runner_stream=None, jobs=None,
+                   slowest_count=None, junit_xml_path=None, tmpfs_dir=None,
+                   use_cache=True, shard=None, results_path=None, timings_path=None,
+                   failed_first=False, fail_fast=False):
     """
-    Run all project tests, and return a unittest.TestResult instance.
+    Run all project tests, and return a pair (test_result, test_run_dir).
+
+    The test_result is a TimingTestResult instance.
 
     Arguments:
 
@@ -102,6 +161,42 @@ def run_molt_tests(from_source, source_dir=None, verbose=False, test_names=None,
       test_runner_stream: the stream object to pass to unittest.TextTestRunner.
         Defaults to sys.stderr.
 
+      jobs: the number of processes to use.  If None or 1, tests are run
+        serially in the current process.
+
+      slowest_count: the number of slowest tests to report after the
+        tests run, or None not to report them.
+
+      junit_xml_path: the path to which to write the results with timings
+        as JUnit XML, or None not to write them.
+
+      tmpfs_dir: the path to a directory on an in-memory file system
+        (e.g. /dev/shm) in which to create the test run directory, so
+        that sandbox directories do not touch the disk.  Ignored if
+        test_output_dir is provided or if the directory is not available.
+
+      use_cache: whether to use the data cached by earlier test runs to
+        speed up test discovery and to skip template tests whose inputs
+        have not changed since they last passed.
+
+      shard: a pair (K, N) to run only the K-th of N shards of the tests,
+        or None to run all tests.  See sharding.assign_shards().
+
+      results_path: the path to which to write the results for merging
+        with the results of other shards, or None not to write them.
+
+      timings_path: the path to a file of test durations with which to
+        balance shards, or None to split the tests in sorted order.
+        After a run of all tests, the durations are written to this
+        file, or if None and use_cache is true, to a file in the test
+        cache directory.
+
+      failed_first: whether to run the tests that failed in earlier runs
+        before the other tests.  The IDs of failed tests are recorded
+        in the test cache directory after each run.
+
+      fail_fast: whether to stop the run after the first failure or error.
+
     """
     if test_runner_stream is None:
         test_runner_stream = sys.stderr
@@ -123,21 +218,89 @@ def run_molt_tests(from_source, source_dir=None, verbose=False, test_names=None,
         sys.path.append(dir_path)
 
     package_dirs = [os.path.dirname(molt.__file__)] + extra_package_dirs
-    test_run_dir = make_test_run_dir(test_output_dir)
+    test_run_dir = make_test_run_dir(test_output_dir, tmpfs_dir=tmpfs_dir)
 
     # TODO: also add support for --quiet.
     verbosity = 2 if verbose else 1
 
-    test_config = TestConfig(test_run_dir, locator, from_source=from_source)
+    # Shards are balanced only with an explicitly given timings file, so
+    # that the runs of a sharded test run split the tests the same way.
+    shard_durations = sharding.read_timings(timings_path)
+
+    cache_path = None
+    template_result_cache = None
+    if use_cache:
+        cache_dir = get_test_cache_dir()
+        cache_path = os.path.join(cache_dir, defaults.DISCOVERY_CACHE_FILE_NAME)
+        template_result_cache = TemplateResultCache(
+            os.path.join(cache_dir, defaults.TEMPLATE_RESULTS_DIR_NAME))
+        if timings_path is None:
+            timings_path = get_timings_path()
+
+    test_config = TestConfig(test_run_dir, locator, from_source=from_source,
+                             template_result_cache=template_result_cache)
 
     try:
-        test_result = run_tests(package_dirs=package_dirs,
-                                is_unittest_module=IS_UNITTEST_MODULE,
-                                test_config=test_config,
-                                doctest_paths=doctest_paths,
-                                verbosity=verbosity,
-                                test_runner_stream=test_runner_stream,
-                                test_names=test_names)
+        kwargs = {
+            'package_dirs': package_dirs,
+            'is_unittest_module': IS_UNITTEST_MODULE,
+            'test_config': test_config,
+            'doctest_paths': doctest_paths,
+            'verbosity': verbosity,
+            'test_runner_stream': test_runner_stream,
+            'test_names': test_names,
+            'cache_path': cache_path,
+        }
+        suite_kwargs = dict((key, value) for key, value in kwargs.items() if
+                            key not in ('verbosity', 'test_runner_stream'))
+        plan = None
+        if shard is not None or results_path:
+            suite = make_test_suite(**suite_kwargs)
+            plan = sharding.select_shard(suite, shard or (1, 1), shard_durations)
+            kwargs['test_ids'] = plan.shard_ids
+        failed_tests_path = get_failed_tests_path()
+        previous_failed_ids = read_failed_ids(failed_tests_path)
+        known_ids = None
+        first_ids = set()
+        if previous_failed_ids:
+            # Load all tests and not only the tests selected for this run,
+            # so that the failures of tests filtered out are kept.
+            suite_kwargs['test_names'] = None
+            suite = make_test_suite(**suite_kwargs)
+            should_include = make_test_filter(test_names, kwargs.get('test_ids'))
+            known_ids = set()
+            for test in _test_gen(suite):
+                test_id = test.id()
+                known_ids.add(test_id)
+                if test_id in previous_failed_ids and should_include(test):
+                    first_ids.add(test_id)
+        if failed_first:
+            _log.info("running first the %d tests that failed in earlier runs" %
+                      len(first_ids))
+            kwargs['first_ids'] = first_ids
+        start_time = time.time()
+        if jobs is not None and jobs > 1:
+            # Import lazily since multiprocessing is not needed otherwise.
+            from molt.test.harness.parallel import run_tests_parallel
+            test_result = run_tests_parallel(jobs=jobs, fail_fast=fail_fast, **kwargs)
+        else:
+            test_result = run_tests(fail_fast=fail_fast, **kwargs)
+        seconds = time.time() - start_time
+        write_failed_ids(failed_tests_path, test_result, previous_failed_ids, known_ids)
+        if template_result_cache is not None:
+            template_result_cache.prune()
+        if results_path:
+            sharding.write_results(results_path, plan, test_result, seconds)
+        # A run stopped early by fail_fast has durations for only some tests.
+        stopped_early = fail_fast and not test_result.wasSuccessful()
+        if (shard is None and test_names is None and timings_path is not None and
+            not stopped_early):
+            sharding.write_timings(timings_path, test_result)
+        if slowest_count:
+            test_runner_stream.write(test_result.format_slowest(slowest_count) + "\n")
+        if junit_xml_path:
+            test_result.write_junit_xml(junit_xml_path, suite_name=molt.__name__)
+            _log.info("wrote JUnit XML to: %s" % junit_xml_path)
     finally:
         if test_output_dir is None or is_empty(test_run_dir):
             _log.info("cleaning up: deleting: %s" % test_run_dir)
@@ -156,7 +319,8 @@ class TestConfig(object):
 
     """
 
-    def __init__(self, test_run_dir, locator, from_source=False):
+    def __init__(self, test_run_dir, locator, from_source=False,
+                 template_result_cache=None):
         """
         Arguments:
 
@@ -170,6 +334,9 @@ class TestConfig(object):
             checkout (e.g. by calling `python -m molt.scripts.molt` as
             opposed to via an installed setup entry point).
 
+          template_result_cache: a TemplateResultCache instance with which
+            to skip unchanged template tests, or None to run them all.
+
         """
         python_path = sys.executable
         # Call molt the "same" way that the current script execution
@@ -178,5 +345,7 @@ class TestConfig(object):
                           [python_path, '-m', molt.scripts.molt.__name__])
 
         self.call_molt_args = call_molt_args
+        self.from_source = from_source
         self.project = locator
+        self.template_result_cache = template_result_cache
         self.test_run_dir = test_run_dir
@@ -0,0 +1,207 @@
+# encoding: utf-8
+#
+# Copyright (C) 2012 Chris Jerdonek. All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# * Redistributions of source code must retain the above copyright notice,
+#   this list of conditions and the following disclaimer.
+# * Redistributions in binary form must reproduce the above copyright notice,
+#   this list of conditions and the following disclaimer in the documentation
+#   and/or other materials provided with the distribution.
+# * The names of the copyright holders may not be used to endorse or promote
+#   products derived from this software without specific prior written
+#   permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+# CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+# SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+#
+
+"""
+Exposes a run_tests_parallel() function to run tests in a process pool.
+
+"""
+
+from __future__ import absolute_import
+
+from collections import OrderedDict
+from copy import copy
+import multiprocessing
+import os
+from StringIO import StringIO
+import sys
+import time
+from unittest import TestSuite
+from unittest.runner import _WritelnDecorator
+
+from molt.test.harness.alltest import (make_test_suite, ResultSummary, TimingTestResult,
+                                       write_summary)
+from molt.test.harness.common import test_logger as _log
+from molt.test.harness.loading import _test_gen
+from molt.test.harness.templatetest import TemplateTestCaseBase
+
+
+WORKER_DIR_PREFIX = 'worker_'
+
+# The units of tests in each worker process, by unit key.
+_worker_units = None
+
+
+def _get_unit_key(test):
+    """
+    Return the key of the unit of tests to run a test in.
+
+    Each test module is a unit, except that each template test class is
+    its own unit, and all doctests are one unit.
+
+    """
+    cls = test.__class__
+    if issubclass(cls, TemplateTestCaseBase):
+        return "%s.%s" % (cls.__module__, cls.__name__)
+    return cls.__module__
+
+
+def group_tests(suite):
+    """
+    Return an OrderedDict of TestSuite instances by unit key.
+
+    """
+    units = OrderedDict()
+    for test in _test_gen(suite):
+        key = _get_unit_key(test)
+        units.setdefault(key, TestSuite()).addTest(test)
+    return units
+
+
+class UnitResult(object):
+
+    """
+    The picklable result of running a unit of tests in a worker process.
+
+    """
+
+    def __init__(self, key, summary, output, seconds):
+        """
+        Arguments:
+
+          summary: a ResultSummary instance.
+
+          output: the text written to the result's stream.
+
+        """
+        self.key = key
+        self.summary = summary
+        self.output = output
+        self.seconds = seconds
+
+
+def _init_worker(suite_kwargs, test_config):
+    """
+    Load the tests in a worker process, with a sandbox for the worker.
+
+    """
+    global _worker_units
+
+    worker_dir = os.path.join(test_config.test_run_dir,
+                              "%s%d" % (WORKER_DIR_PREFIX, os.getpid()))
+    os.mkdir(worker_dir)
+    test_config = copy(test_config)
+    test_config.test_run_dir = worker_dir
+    suite = make_test_suite(test_config=test_config, **suite_kwargs)
+    _worker_units = group_tests(suite)
+
+
+def _run_unit(args):
+    key, verbosity, fail_fast = args
+    stream = StringIO()
+    result = TimingTestResult(_WritelnDecorator(stream), descriptions=True,
+                              verbosity=verbosity)
+    result.failfast = fail_fast
+    start_time = time.time()
+    _worker_units[key].run(result)
+    return UnitResult(key, ResultSummary.from_result(result), stream.getvalue(),
+                      time.time() - start_time)
+
+
+def _remove_empty_worker_dirs(test_run_dir):
+    for name in os.listdir(test_run_dir):
+        path = os.path.join(test_run_dir, name)
+        if name.startswith(WORKER_DIR_PREFIX) and not os.listdir(path):
+            os.rmdir(path)
+
+
+def run_tests_parallel(package_dirs, is_unittest_module, test_config, jobs,
+                       test_names=None, extra_tests=None, doctest_paths=None,
+                       verbosity=1, test_runner_stream=None, cache_path=None,
+                       test_ids=None, first_ids=None, fail_fast=False):
+    """
+    Run all tests in a process pool, and return a TimingTestResult instance.
+
+    The tests are split into units (see _get_unit_key()), which are run
+    in the pool as processes become free.  Each worker process loads the
+    tests itself, and has its own sandbox directory in the test run
+    directory.  The output of each unit is written as the unit completes,
+    followed by a summary of the merged results.  Units containing tests
+    in first_ids are started first.  With fail_fast, the pool is stopped
+    after the first unit with a failure or error.
+
+    See alltest.run_tests() for a description of the other arguments.
+
+    Arguments:
+
+      jobs: the number of processes to use.
+
+    """
+    if test_runner_stream is None:
+        test_runner_stream = sys.stderr
+    suite_kwargs = {
+        'package_dirs': package_dirs,
+        'is_unittest_module': is_unittest_module,
+        'test_names': test_names,
+        'extra_tests': extra_tests,
+        'doctest_paths': doctest_paths,
+        'cache_path': cache_path,
+        'test_ids': test_ids,
+        'first_ids': first_ids,
+    }
+    start_time = time.time()
+    units = group_tests(make_test_suite(test_config=test_config, **suite_kwargs))
+    jobs = max(1, min(jobs, len(units)))
+    _log.info("running %d test units using %d processes" % (len(units), jobs))
+
+    stream = _WritelnDecorator(test_runner_stream)
+    result = TimingTestResult(stream, descriptions=True, verbosity=verbosity)
+    # The pool relies on forking so that the initializer arguments,
+    # which include functions, need not be pickled.
+    pool = multiprocessing.Pool(processes=jobs, initializer=_init_worker,
+                                initargs=(suite_kwargs, test_config))
+    try:
+        args = [(key, verbosity, fail_fast) for key in units]
+        for unit_result in pool.imap_unordered(_run_unit, args, chunksize=1):
+            _log.debug("ran test unit in %.3fs: %s" % (unit_result.seconds, unit_result.key))
+            stream.write(unit_result.output)
+            stream.flush()
+            unit_result.summary.add_to(result)
+            if fail_fast and not unit_result.summary.was_successful():
+                _log.info("stopping test run after failure in: %s" % unit_result.key)
+                pool.terminate()
+                break
+    finally:
+        pool.close()
+        pool.join()
+    _remove_empty_worker_dirs(test_config.test_run_dir)
+
+    if verbosity == 1:
+        stream.writeln()
+    write_summary(stream, result, time.time() - start_time)
+    return result
@@ -0,0 +1,200 @@
+# encoding: utf-8
+#
+# Copyright (C) 2012 Chris Jerdonek. All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# * Redistributions of source code must retain the above copyright notice,
+#   this list of conditions and the following disclaimer.
+# * Redistributions in binary form must reproduce the above copyright notice,
+#   this list of conditions and the following disclaimer in the documentation
+#   and/or other materials provided with the distribution.
+# * The names of the copyright holders may not be used to endorse or promote
+#   products derived from this software without specific prior written
+#   permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+# CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+# SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+#
+
+"""
+Exposes a TemplateResultCache class to skip unchanged template tests.
+
+"""
+
+from __future__ import absolute_import
+
+import hashlib
+import os
+import platform
+import sys
+import time
+
+import pystache
+
+import molt
+from molt.test.harness import defaults
+from molt.test.harness.common import test_logger as _log
+
+
+# Bump this to invalidate all cached results.
+RESULT_CACHE_VERSION = 2
+
+# The digest of the molt source code, computed once per process.
+_source_digest = None
+
+
+def hash_dir(dir_path, digest, should_include=None):
+    """
+    Update a hashlib digest with the file names and contents in a directory.
+
+    Arguments:
+
+      should_include: a function that accepts a file name and returns
+        whether to include the file.  Defaults to including all files
+        except compiled Python files.
+
+    """
+    if should_include is None:
+        should_include = lambda name: not name.endswith('.pyc')
+    for current_dir, dir_names, file_names in os.walk(dir_path):
+        dir_names.sort()
+        rel_dir = os.path.relpath(current_dir, dir_path)
+        digest.update("d %s\n" % rel_dir)
+        for name in sorted(file_names):
+            if not should_include(name):
+                continue
+            path = os.path.join(current_dir, name)
+            digest.update("f %s %s\n" % (os.path.join(rel_dir, name),
+                                         os.stat(path).st_mode & 0111))
+            with open(path, 'rb') as f:
+                digest.update(hashlib.sha1(f.read()).hexdigest())
+
+
+def get_source_digest():
+    """
+    Return a digest of the molt source code, the pystache version, and
+    the Python interpreter.
+
+    The interpreter is included since test runs with different
+    interpreters (e.g. with tox) share the cache directory.
+
+    """
+    global _source_digest
+    if _source_digest is None:
+        digest = hashlib.sha1()
+        digest.update("python %s %s\n" % (platform.python_implementation(), sys.version))
+        digest.update("pystache %s\n" % pystache.__version__)
+        hash_dir(os.path.dirname(molt.__file__), digest,
+                 should_include=lambda name: name.endswith('.py'))
+        _source_digest = digest.hexdigest()
+    return _source_digest
+
+
+class TemplateResultCache(object):
+
+    """
+    Remembers template tests that passed, keyed by a hash of their inputs.
+
+    Each passing result is recorded as an empty file named by its key,
+    so test processes running in parallel can share the cache safely.
+    The modification time of a file is updated each time it is used,
+    so that prune() can remove the results that are no longer used.
+
+    """
+
+    def __init__(self, cache_dir):
+        """
+        Create the cache directory if necessary.
+
+        Create instances before starting any test processes, so that
+        processes do not race to create the directory.
+
+        """
+        if not os.path.exists(cache_dir):
+            os.makedirs(cache_dir)
+        self.cache_dir = cache_dir
+
+    def make_key(self, test_id, template_dir, expected_dir):
+        """
+        Return a key that changes when anything affecting the test changes.
+
+        The key covers the test name, the contents of the template and
+        expected directories (including the executable bits of files,
+        which matter for lambdas), the molt source, the pystache
+        version, and the Python interpreter.
+
+        """
+        digest = hashlib.sha1()
+        digest.update("%d %s\n%s\n" % (RESULT_CACHE_VERSION, test_id, get_source_digest()))
+        for dir_path in (template_dir, expected_dir):
+            hash_dir(dir_path, digest)
+        return digest.hexdigest()
+
+    def _get_path(self, key):
+        return os.path.join(self.cache_dir, key)
+
+    def has_passed(self, key):
+        path = self._get_path(key)
+        try:
+            # Record the use for prune().
+            os.utime(path, None)
+        except OSError:
+            return False
+        return True
+
+    def add_pass(self, key):
+        try:
+            open(self._get_path(key), 'wb').close()
+        except (IOError, OSError), err:
+            _log.warning("error writing test result cache: %s: %s" % (self.cache_dir, err))
+
+    def prune(self, max_age=None, max_count=None):
+        """
+        Remove old results, and return the number removed.
+
+        Arguments:
+
+          max_age: the number of seconds after which to remove a result
+            that has not been used.  Defaults to
+            defaults.TEMPLATE_RESULTS_MAX_AGE.
+
+          max_count: the number of most recently used results to keep at
+            most.  Defaults to defaults.TEMPLATE_RESULTS_MAX_COUNT.
+
+        """
+        if max_age is None:
+            max_age = defaults.TEMPLATE_RESULTS_MAX_AGE
+        if max_count is None:
+            max_count = defaults.TEMPLATE_RESULTS_MAX_COUNT
+        entries = []
+        for name in os.listdir(self.cache_dir):
+            path = self._get_path(name)
+            try:
+                entries.append((os.path.getmtime(path), path))
+            except OSError:
+                # Then another process removed the file.
+                continue
+        # Sort with the most recently used first.
+        entries.sort(reverse=True)
+        min_mtime = time.time() - max_age
+        stale_paths = [path for index, (mtime, path) in enumerate(entries) if
+                       index >= max_count or mtime < min_mtime]
+        for path in stale_paths:
+            try:
+                os.remove(path)
+            except OSError, err:
+                _log.warning("error pruning test result cache: %s: %s" % (path, err))
+        if stale_paths:
+            _log.info("pruned %d old results from: %s" % (len(stale_paths), self.cache_dir))
+        return len(stale_paths)
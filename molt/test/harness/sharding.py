@@ -0,0 +1,289 @@
+# encoding: utf-8
+#
+# Copyright (C) 2012 Chris Jerdonek. All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# * Redistributions of source code must retain the above copyright notice,
+#   this list of conditions and the following disclaimer.
+# * Redistributions in binary form must reproduce the above copyright notice,
+#   this list of conditions and the following disclaimer in the documentation
+#   and/or other materials provided with the distribution.
+# * The names of the copyright holders may not be used to endorse or promote
+#   products derived from this software without specific prior written
+#   permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+# CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+# SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+#
+
+"""
+Supports splitting a test run into shards and merging the shard results.
+
+"""
+
+from __future__ import absolute_import
+
+import hashlib
+import json
+import os
+import sys
+from unittest.runner import _WritelnDecorator
+
+from molt.general.error import Error
+from molt.test.harness.alltest import ResultSummary, TimingTestResult, write_summary
+from molt.test.harness.common import test_logger as _log
+from molt.test.harness.loading import _test_gen
+
+
+RESULTS_FORMAT_VERSION = 2
+TIMINGS_FORMAT_VERSION = 1
+
+
+def assign_shards(test_ids, count, durations=None):
+    """
+    Split test IDs into count shards, and return a list of sets of IDs.
+
+    The split depends only on the arguments.  Without durations, tests
+    are dealt in sorted order.  With durations (a dict of seconds by
+    test ID), each test, slowest first, is added to the shard with the
+    least total time.  Tests without a duration count as the median
+    duration.
+
+    """
+    shards = [set() for i in range(count)]
+    test_ids = sorted(set(test_ids))
+    if not durations:
+        for i, test_id in enumerate(test_ids):
+            shards[i % count].add(test_id)
+        return shards
+
+    known = sorted(durations.values())
+    default_seconds = known[len(known) // 2]
+    weighted = sorted(((durations.get(test_id, default_seconds), test_id) for
+                       test_id in test_ids), key=lambda pair: (-pair[0], pair[1]))
+    totals = [0.0] * count
+    for seconds, test_id in weighted:
+        i = min(range(count), key=lambda i: (totals[i], i))
+        shards[i].add(test_id)
+        totals[i] += seconds
+    return shards
+
+
+def get_digest(value):
+    """
+    Return the SHA-1 hex digest of a JSON-serializable value, or None.
+
+    """
+    if value is None:
+        return None
+    return hashlib.sha1(json.dumps(value, sort_keys=True)).hexdigest()
+
+
+class ShardPlan(object):
+
+    """
+    The tests of a test run and the tests assigned to one of its shards.
+
+    """
+
+    def __init__(self, shard, test_ids, durations=None):
+        """
+        Arguments:
+
+          shard: a pair (K, N) for the K-th of N shards, numbering from 1.
+
+          test_ids: the IDs of all tests in the run.
+
+          durations: the dict of test durations with which to balance
+            the shards, or None to deal tests in sorted order.
+
+        """
+        index, count = shard
+        self.shard = shard
+        self.test_ids = sorted(set(test_ids))
+        self.durations = durations
+        self.shard_ids = assign_shards(self.test_ids, count, durations)[index - 1]
+
+    def to_dict(self):
+        return {
+            'shard': list(self.shard),
+            'test_count': len(self.test_ids),
+            'test_ids_digest': get_digest(self.test_ids),
+            'timings_digest': get_digest(self.durations),
+            'shard_test_ids': sorted(self.shard_ids),
+        }
+
+
+def select_shard(suite, shard, durations=None):
+    """
+    Return a ShardPlan of the tests in a TestSuite to run in a shard.
+
+    Arguments:
+
+      shard: a pair (K, N) to select the K-th of N shards, numbering
+        from 1.
+
+    """
+    plan = ShardPlan(shard, [test.id() for test in _test_gen(suite)], durations)
+    _log.info("running shard %d/%d: %d of %d tests" % (shard[0], shard[1],
+                                                       len(plan.shard_ids),
+                                                       len(plan.test_ids)))
+    return plan
+
+
+def read_timings(path):
+    """
+    Return the test durations in a timings file as a dict, or None.
+
+    """
+    if path is None or not os.path.exists(path):
+        return None
+    with open(path, 'rb') as f:
+        data = json.load(f)
+    if data.get('version') != TIMINGS_FORMAT_VERSION:
+        _log.warning("ignoring timings file with unknown version: %s" % path)
+        return None
+    _log.info("using test timings: %s" % path)
+    return data['durations']
+
+
+def write_timings(path, result):
+    """
+    Write the durations of the tests in a TimingTestResult to a timings file.
+
+    """
+    data = {
+        'version': TIMINGS_FORMAT_VERSION,
+        'durations': dict(result.durations),
+    }
+    dir_path = os.path.dirname(path)
+    if dir_path and not os.path.exists(dir_path):
+        os.makedirs(dir_path)
+    with open(path, 'wb') as f:
+        json.dump(data, f, indent=2, sort_keys=True)
+    _log.info("wrote test timings: %s" % path)
+
+
+def write_results(path, plan, result, seconds):
+    """
+    Write a TimingTestResult to a results file for merging.
+
+    Arguments:
+
+      plan: the ShardPlan of the run.
+
+    """
+    data = plan.to_dict()
+    data.update({
+        'version': RESULTS_FORMAT_VERSION,
+        'seconds': seconds,
+        'summary': ResultSummary.from_result(result).to_dict(),
+    })
+    with open(path, 'wb') as f:
+        json.dump(data, f, indent=2, sort_keys=True)
+    _log.info("wrote test results: %s" % path)
+
+
+def _read_results(path):
+    with open(path, 'rb') as f:
+        data = json.load(f)
+    if data.get('version') != RESULTS_FORMAT_VERSION:
+        raise Error("Unknown test results version in: %s" % path)
+    return data
+
+
+def _check_shards(shards):
+    """
+    Raise an Error unless the (K, N) pairs cover each shard exactly once.
+
+    """
+    counts = set(count for index, count in shards)
+    if len(counts) > 1:
+        raise Error("Test results are from runs with different shard counts: %s" %
+                    ", ".join(str(count) for count in sorted(counts)))
+    count = counts.pop()
+    indices = sorted(index for index, count in shards)
+    duplicates = sorted(set(index for index in indices if indices.count(index) > 1))
+    missing = sorted(set(range(1, count + 1)) - set(indices))
+    if duplicates:
+        raise Error("Duplicate test results for shards: %s" %
+                    ", ".join("%d/%d" % (index, count) for index in duplicates))
+    if missing:
+        raise Error("Missing test results for shards: %s" %
+                    ", ".join("%d/%d" % (index, count) for index in missing))
+
+
+def _format_ids(test_ids, max_count=5):
+    test_ids = sorted(test_ids)
+    text = ", ".join(test_ids[:max_count])
+    if len(test_ids) > max_count:
+        text += ", ... (%d more)" % (len(test_ids) - max_count)
+    return text
+
+
+def _check_plans(results):
+    """
+    Raise an Error unless the shards split the same tests exactly once.
+
+    """
+    if len(set(data['test_ids_digest'] for data in results)) > 1:
+        raise Error("Test results are from runs of different sets of tests.")
+    if len(set(data['timings_digest'] for data in results)) > 1:
+        raise Error("Test results are from shards balanced with different test timings.")
+
+    seen = set()
+    duplicates = set()
+    for data in results:
+        shard_ids = set(data['shard_test_ids'])
+        duplicates |= seen & shard_ids
+        seen |= shard_ids
+    if duplicates:
+        raise Error("Tests assigned to more than one shard: %s" % _format_ids(duplicates))
+
+    data = results[0]
+    if len(seen) != data['test_count'] or get_digest(sorted(seen)) != data['test_ids_digest']:
+        raise Error("Test results cover %d of %d tests." % (len(seen), data['test_count']))
+
+
+def merge_results(paths, stream=None):
+    """
+    Merge the results files of a sharded test run, and report the outcome.
+
+    Writes a report to the stream in the format of a regular test run,
+    and returns a TimingTestResult instance of the merged results.
+    Raises an Error if the files do not cover each shard exactly once,
+    or if the shards do not split the same tests in the same way.
+
+    """
+    if stream is None:
+        stream = sys.stderr
+    stream = _WritelnDecorator(stream)
+
+    results = [_read_results(path) for path in paths]
+    # Sort by shard for a stable report.
+    results.sort(key=lambda data: data['shard'])
+    _check_shards([tuple(data['shard']) for data in results])
+    _check_plans(results)
+
+    merged = TimingTestResult(stream, descriptions=True, verbosity=1)
+    stream.writeln("merging %d test result files:" % len(results))
+    for data in results:
+        summary = ResultSummary.from_dict(data['summary'])
+        stream.writeln("  shard %d/%d: %d tests in %.3fs: %s" % (
+            data['shard'][0], data['shard'][1], summary.tests_run, data['seconds'],
+            "OK" if summary.was_successful() else "FAILED"))
+        summary.add_to(merged)
+
+    write_summary(stream, merged, sum(data['seconds'] for data in results))
+    return merged
@@ -40,9 +40,10 @@ from textwrap import dedent
 from unittest import TestCase
 
 
-from molt.dirutil import make_expected_dir, stage_template_dir
+from molt.diff import Comparer
+from molt.dirutil import make_expected_dir, make_ignore_matcher, stage_template_dir
 from molt.molter import Molter
-from molt.test.harness import indent, should_ignore_file, AssertDirMixin, SandBoxDirMixin
+from molt.test.harness import indent, AssertDirMixin, SandBoxDirMixin, IGNORE_PATTERNS
 
 
 def make_test_class_type_args(group_name, template_dir, should_stage=False):
@@ -165,12 +166,21 @@ class TemplateTestCaseBase(TestCase, AssertDirMixin, SandBoxDirMixin):
             lambda scripts in the original template lambdas directory.
 
         """
+        result_cache = self.test_config.template_result_cache
+        if result_cache is not None:
+            key = result_cache.make_key(self.id(), template_dir, expected_dir)
+            if result_cache.has_passed(key):
+                self.skipTest("unchanged since last passing run")
+
+        self._assert_template(template_name, template_dir, expected_dir, should_stage)
+
+        if result_cache is not None:
+            result_cache.add_pass(key)
+
+    def _assert_template(self, template_name, template_dir, expected_dir, should_stage):
         molter = Molter()
 
         with self.sandboxDir() as temp_dir:
-            actual_dir = os.path.join(temp_dir, 'actual')
-            os.mkdir(actual_dir)
-
             if should_stage:
                 staged_template_dir = os.path.join(temp_dir, 'template')
                 stage_template_dir(template_dir, staged_template_dir)
@@ -180,10 +190,20 @@ class TemplateTestCaseBase(TestCase, AssertDirMixin, SandBoxDirMixin):
             config = molter.read_config(template_dir)
             description = config['description']
 
-            molter.molt(template_dir=template_dir, output_dir=actual_dir)
+            ignore = make_ignore_matcher(template_dir, patterns=IGNORE_PATTERNS)
+            # Render and compare in memory, writing the rendered output
+            # only to describe a difference.
+            tree = molter.render_tree(template_dir)
+            comparer = Comparer(ignore=ignore)
+            if comparer.diff_tree(tree, expected_dir, show_diffs=False).does_match():
+                return
+
+            actual_dir = os.path.join(temp_dir, 'actual')
+            os.mkdir(actual_dir)
+            tree.write(actual_dir)
+
             format_msg = _make_format_msg(actual_dir, expected_dir, context=context,
                                           test_name=template_name,
                                           test_description=description)
             self.assertDirectoriesEqual(actual_dir, expected_dir, fuzzy=True,
-                                        format_msg=format_msg,
-                                        should_ignore=should_ignore_file)
+                                        format_msg=format_msg, ignore=ignore)
@@ -0,0 +1,221 @@
+# encoding: utf-8
+#
+# Copyright (C) 2012 Chris Jerdonek. All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# * Redistributions of source code must retain the above copyright notice,
+#   this list of conditions and the following disclaimer.
+# * Redistributions in binary form must reproduce the above copyright notice,
+#   this list of conditions and the following disclaimer in the documentation
+#   and/or other materials provided with the distribution.
+# * The names of the copyright holders may not be used to endorse or promote
+#   products derived from this software without specific prior written
+#   permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+# CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+# SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+#
+
+"""
+Unit tests for the test harness in molt.test.harness.
+
+"""
+
+from copy import copy
+import os
+from shutil import rmtree
+import time
+import unittest
+
+from molt.dirutil import make_expected_dir, stage_template_dir
+from molt.test.harness import config_load_tests, resultcache, SandBoxDirMixin
+from molt.test.harness.main import make_test_run_dir
+from molt.test.harness.resultcache import TemplateResultCache
+from molt.test.harness.templatetest import TemplateTestCaseBase
+
+
+# Trigger the load_tests protocol.
+load_tests = config_load_tests
+
+
+class MakeTestRunDirTestCase(unittest.TestCase, SandBoxDirMixin):
+
+    def _assert_parent(self, expected_dir, test_output_dir, tmpfs_dir):
+        dir_path = make_test_run_dir(test_output_dir, tmpfs_dir=tmpfs_dir)
+        try:
+            self.assertEquals(os.path.dirname(dir_path), expected_dir)
+        finally:
+            os.rmdir(dir_path)
+
+    def test_tmpfs_dir(self):
+        with self.sandboxDir() as temp_dir:
+            self._assert_parent(temp_dir, None, tmpfs_dir=temp_dir)
+
+    def test_tmpfs_dir__output_dir(self):
+        with self.sandboxDir() as temp_dir:
+            output_dir = os.path.join(temp_dir, 'output')
+            os.mkdir(output_dir)
+            self._assert_parent(output_dir, output_dir, tmpfs_dir=temp_dir)
+
+    def test_tmpfs_dir__missing(self):
+        with self.sandboxDir() as temp_dir:
+            tmpfs_dir = os.path.join(temp_dir, 'missing')
+            dir_path = make_test_run_dir(None, tmpfs_dir=tmpfs_dir)
+            try:
+                self.assertNotEquals(os.path.dirname(dir_path), tmpfs_dir)
+            finally:
+                os.rmdir(dir_path)
+
+
+def _make_template_test_case():
+    # The class is defined in a function to hide it from test discovery.
+    class SampleTemplateTestCase(TemplateTestCaseBase):
+
+        def runTest(self):
+            pass
+
+    return SampleTemplateTestCase()
+
+
+class TemplateTestCaseBaseTestCase(unittest.TestCase, SandBoxDirMixin):
+
+    def _assert_template(self, template_dir, result_cache=None):
+        test_case = _make_template_test_case()
+        test_case.test_config = copy(self.test_config)
+        test_case.test_config.template_result_cache = result_cache
+        test_case.assert_template('demo', 'demo', template_dir,
+                                  make_expected_dir(template_dir))
+
+    def _stage_demo(self, temp_dir):
+        template_dir = os.path.join(temp_dir, 'template')
+        stage_template_dir(self.test_config.project.demo_template_dir, template_dir)
+        return template_dir
+
+    def test_assert_template(self):
+        with self.sandboxDir() as temp_dir:
+            self._assert_template(self._stage_demo(temp_dir))
+
+    def test_assert_template__differs(self):
+        with self.sandboxDir() as temp_dir:
+            template_dir = self._stage_demo(temp_dir)
+            with open(os.path.join(make_expected_dir(template_dir), 'hello.py'), 'ab') as f:
+                f.write("# extra line\n")
+
+            with self.assertRaises(AssertionError) as cm:
+                self._assert_template(template_dir)
+            self.assertIn("hello.py", str(cm.exception))
+
+            # The rendered output is left in the failed test's sandbox.
+            sandbox_dir = os.path.join(self.test_config.test_run_dir,
+                                       'SampleTemplateTestCase_runTest')
+            try:
+                self.assertTrue(os.path.exists(os.path.join(sandbox_dir, 'actual', 'hello.py')))
+            finally:
+                rmtree(sandbox_dir)
+
+    def test_assert_template__result_cache(self):
+        with self.sandboxDir() as temp_dir:
+            template_dir = self._stage_demo(temp_dir)
+            result_cache = TemplateResultCache(os.path.join(temp_dir, 'cache'))
+            self._assert_template(template_dir, result_cache=result_cache)
+            with self.assertRaises(unittest.SkipTest):
+                self._assert_template(template_dir, result_cache=result_cache)
+
+            # Changing the expected directory invalidates the result.
+            with open(os.path.join(make_expected_dir(template_dir), 'hello.py'), 'ab') as f:
+                f.write("# extra line\n")
+            with self.assertRaises(AssertionError):
+                self._assert_template(template_dir, result_cache=result_cache)
+            rmtree(os.path.join(self.test_config.test_run_dir,
+                                'SampleTemplateTestCase_runTest'))
+
+
+class TemplateResultCacheTestCase(unittest.TestCase, SandBoxDirMixin):
+
+    def _write_file(self, path, contents):
+        with open(path, 'wb') as f:
+            f.write(contents)
+
+    def test_make_key(self):
+        with self.sandboxDir() as temp_dir:
+            template_dir, expected_dir = [os.path.join(temp_dir, name) for
+                                          name in ('template', 'expected')]
+            for dir_path in (template_dir, expected_dir):
+                os.mkdir(dir_path)
+            path = os.path.join(template_dir, 'foo.txt')
+            self._write_file(path, "foo")
+
+            cache = TemplateResultCache(os.path.join(temp_dir, 'cache'))
+            make_key = lambda test_id: cache.make_key(test_id, template_dir, expected_dir)
+            key = make_key('test')
+            self.assertEquals(make_key('test'), key)
+            self.assertNotEquals(make_key('test2'), key)
+
+            self._write_file(path, "bar")
+            key2 = make_key('test')
+            self.assertNotEquals(key2, key)
+
+            os.chmod(path, 0755)
+            self.assertNotEquals(make_key('test'), key2)
+
+    def test_get_source_digest__interpreter(self):
+        """
+        Check that runs with different Python interpreters do not share results.
+
+        """
+        class MockPlatform(object):
+            def python_implementation(self):
+                return 'OtherPython'
+
+        digest = resultcache.get_source_digest()
+        original_platform = resultcache.platform
+        resultcache._source_digest = None
+        resultcache.platform = MockPlatform()
+        try:
+            self.assertNotEquals(resultcache.get_source_digest(), digest)
+        finally:
+            resultcache.platform = original_platform
+            resultcache._source_digest = None
+        self.assertEquals(resultcache.get_source_digest(), digest)
+
+    def test_add_pass(self):
+        with self.sandboxDir() as temp_dir:
+            cache = TemplateResultCache(os.path.join(temp_dir, 'cache'))
+            self.assertFalse(cache.has_passed('abc'))
+            cache.add_pass('abc')
+            self.assertTrue(cache.has_passed('abc'))
+            self.assertFalse(cache.has_passed('def'))
+
+    def test_has_passed__updates_mtime(self):
+        with self.sandboxDir() as temp_dir:
+            cache = TemplateResultCache(os.path.join(temp_dir, 'cache'))
+            cache.add_pass('abc')
+            path = os.path.join(cache.cache_dir, 'abc')
+            os.utime(path, (1000, 1000))
+            self.assertTrue(cache.has_passed('abc'))
+            self.assertTrue(os.path.getmtime(path) > 1000)
+
+    def test_prune(self):
+        with self.sandboxDir() as temp_dir:
+            cache = TemplateResultCache(os.path.join(temp_dir, 'cache'))
+            now = time.time()
+            for key, age in [('new', 0), ('newer', -1), ('old', 1000), ('older', 2000)]:
+                cache.add_pass(key)
+                mtime = now - age
+                os.utime(os.path.join(cache.cache_dir, key), (mtime, mtime))
+            self.assertEquals(cache.prune(max_age=1500, max_count=10), 1)
+            self.assertEquals(sorted(os.listdir(cache.cache_dir)), ['new', 'newer', 'old'])
+            # The most recently used results are kept.
+            self.assertEquals(cache.prune(max_age=1500, max_count=2), 1)
+            self.assertEquals(sorted(os.listdir(cache.cache_dir)), ['new', 'newer'])
@@ -0,0 +1,75 @@
+# encoding: utf-8
+#
+# Copyright (C) 2012 Chris Jerdonek. All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# * Redistributions of source code must retain the above copyright notice,
+#   this list of conditions and the following disclaimer.
+# * Redistributions in binary form must reproduce the above copyright notice,
+#   this list of conditions and the following disclaimer in the documentation
+#   and/or other materials provided with the distribution.
+# * The names of the copyright holders may not be used to endorse or promote
+#   products derived from this software without specific prior written
+#   permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+# CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+# SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+#
+
+"""
+Unit tests for molt.test.harness.inprocess.
+
+"""
+
+import logging
+import sys
+import unittest
+
+from molt import constants
+from molt.test.harness import config_load_tests
+from molt.test.harness.inprocess import call_molt_in_process
+
+
+# Trigger the load_tests protocol.
+load_tests = config_load_tests
+
+
+class CallMoltInProcessTestCase(unittest.TestCase):
+
+    def test_stdout(self):
+        stdout, stderr, return_code = call_molt_in_process(['--version'])
+        self.assertEquals(return_code, constants.EXIT_STATUS_SUCCESS)
+        self.assertTrue(stdout.startswith("Molt "))
+        self.assertIs(type(stdout), unicode)
+
+    def test_usage_error(self):
+        stdout, stderr, return_code = call_molt_in_process(['--bogus'])
+        self.assertEquals(return_code, constants.EXIT_STATUS_USAGE_ERROR)
+        self.assertEquals(stdout, "")
+        self.assertIn("unrecognized arguments: --bogus", stderr)
+        # The error message shows the arguments as a command-line call would.
+        self.assertIn("__main__.py', '--bogus']", stderr)
+
+    def test_restores_state(self):
+        root_log = logging.getLogger()
+        handlers, level = root_log.handlers[:], root_log.level
+        argv, stdout, stderr = sys.argv, sys.stdout, sys.stderr
+
+        call_molt_in_process(['--version'])
+
+        self.assertEquals(root_log.handlers, handlers)
+        self.assertEquals(root_log.level, level)
+        self.assertIs(sys.argv, argv)
+        self.assertIs(sys.stdout, stdout)
+        self.assertIs(sys.stderr, stderr)
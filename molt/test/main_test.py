@@ -32,15 +32,57 @@ Unit tests for the main module.
 
 """
 
+import json
 import logging
+import os
+import sys
 import unittest
 
+import molt
+from molt.general.popen import call_script
 from molt.scripts.molt.main import Error, run_molt
 from molt.test.harness import config_load_tests, SandBoxDirMixin
 
 
 load_tests = config_load_tests
 
+# Modules that should not be imported just to run `molt --version`.
+STARTUP_EXCLUDED_MODULES = [
+    'molt.diff',
+    'molt.molter',
+    'molt.test.harness',
+    'multiprocessing',
+    'numpy',
+    'pystache',
+    'unittest',
+    'yaml',
+]
+
+# The maximum numbers of molt modules and of all modules that running
+# `molt --version` may import beyond those imported by the interpreter
+# itself.  As of this writing, Python 2.7 imports 17 and 70.  Counting
+# modules catches startup regressions without depending on machine speed.
+STARTUP_MAX_MOLT_MODULES = 20
+STARTUP_MAX_MODULES = 90
+
+# The script run in a new process to check startup.  It prints the exit
+# status, the names of the modules imported by the interpreter itself,
+# and the names of all imported modules.
+_STARTUP_SCRIPT = """\
+import sys
+initial_names = [name for name, module in sys.modules.items() if module is not None]
+sys.path.insert(0, %(package_parent_dir)r)
+from StringIO import StringIO
+from molt.scripts.molt.main import run_molt
+stdout = sys.stdout
+sys.stdout = StringIO()
+status = run_molt(['molt', '--version'])
+sys.stdout = stdout
+module_names = [name for name, module in sys.modules.items() if module is not None]
+import json
+print(json.dumps([status, initial_names, module_names]))
+"""
+
 
 class MockLogging(object):
 
@@ -84,3 +126,45 @@ class MainTestCase(unittest.TestCase):
         self.assertEquals(result, 1)
         self.assertTrue(self.logging.argv is sys_argv)
 
+
+class StartupTestCase(unittest.TestCase):
+
+    """
+    Test that starting the molt script does not import too many modules.
+
+    This checks the imports rather than timing startup, since timings
+    vary too much between machines.
+
+    """
+
+    def _run_version(self):
+        """
+        Run `molt --version` in a new process, and return the script output.
+
+        """
+        package_parent_dir = os.path.dirname(os.path.dirname(molt.__file__))
+        script = _STARTUP_SCRIPT % {'package_parent_dir': package_parent_dir}
+        stdout, stderr, return_code = call_script([sys.executable, '-c', script])
+        self.assertEqual(return_code, 0, msg=stderr)
+        return json.loads(stdout.decode('utf-8'))
+
+    def test_imports(self):
+        status, initial_names, module_names = self._run_version()
+        self.assertEqual(status, 0)
+        imported = [name for name in STARTUP_EXCLUDED_MODULES if
+                    any(module_name == name or module_name.startswith(name + '.') for
+                        module_name in module_names)]
+        self.assertEqual(imported, [])
+
+    def _assert_at_most(self, names, max_count, label):
+        self.assertTrue(len(names) <= max_count,
+                        msg="startup imported %d %s (max: %d):\n  %s" %
+                            (len(names), label, max_count, "\n  ".join(sorted(names))))
+
+    def test_module_count(self):
+        status, initial_names, module_names = self._run_version()
+        self.assertEqual(status, 0)
+        new_names = set(module_names) - set(initial_names)
+        molt_names = [name for name in new_names if name.split('.')[0] == 'molt']
+        self._assert_at_most(molt_names, STARTUP_MAX_MOLT_MODULES, "molt modules")
+        self._assert_at_most(new_names, STARTUP_MAX_MODULES, "modules")
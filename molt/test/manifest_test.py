@@ -0,0 +1,151 @@
+# encoding: utf-8
+#
+# Copyright (C) 2012 Chris Jerdonek. All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# * Redistributions of source code must retain the above copyright notice,
+#   this list of conditions and the following disclaimer.
+# * Redistributions in binary form must reproduce the above copyright notice,
+#   this list of conditions and the following disclaimer in the documentation
+#   and/or other materials provided with the distribution.
+# * The names of the copyright holders may not be used to endorse or promote
+#   products derived from this software without specific prior written
+#   permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+# CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+# SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+#
+
+"""
+Unit tests for manifest.py.
+
+"""
+
+import os
+import unittest
+
+import molt.diff as diff
+from molt.general.ignore import IgnoreMatcher
+import molt.manifest as manifest
+from molt.manifest import ExpectedManifest
+from molt.test.harness import config_load_tests, SandBoxDirMixin
+
+
+# Trigger the load_tests protocol.
+load_tests = config_load_tests
+
+
+def _write(path, text):
+    with open(path, 'wb') as f:
+        f.write(text.encode('utf-8'))
+
+
+class ExpectedManifestTestCase(unittest.TestCase, SandBoxDirMixin):
+
+    def _make_template(self, temp_dir):
+        """Create a template with an expected directory, and return it."""
+        template_dir = os.path.join(temp_dir, 'template')
+        expected_dir = os.path.join(template_dir, 'expected')
+        os.makedirs(os.path.join(expected_dir, 'sub'))
+        _write(os.path.join(expected_dir, 'exact.txt'), u"abc\n")
+        _write(os.path.join(expected_dir, 'sub', 'fuzzy.txt'), u"a\nb...\n")
+        return template_dir, expected_dir
+
+    def test_build(self):
+        with self.sandboxDir() as temp_dir:
+            template_dir, expected_dir = self._make_template(temp_dir)
+            built = ExpectedManifest.build(expected_dir, IgnoreMatcher())
+
+            self.assertEqual(sorted(built.entries), ['exact.txt', 'sub/fuzzy.txt'])
+            exact = built.entries['exact.txt']
+            self.assertEqual((exact.size, exact.has_fuzz), (4, False))
+            fuzzy = built.entries['sub/fuzzy.txt']
+            self.assertEqual(fuzzy.segments, [(1, [u"b", u"\n"])])
+
+    def test_write_and_load(self):
+        with self.sandboxDir() as temp_dir:
+            template_dir, expected_dir = self._make_template(temp_dir)
+            path = manifest.index_expected_dir(template_dir)
+
+            loaded = manifest.load_manifest(template_dir, expected_dir)
+            self.assertEqual(loaded.to_json(), ExpectedManifest.read(path, expected_dir).to_json())
+            self.assertEqual(sorted(loaded.entries), ['exact.txt', 'sub/fuzzy.txt'])
+
+    def _set_mtime(self, path, mtime):
+        os.utime(path, (mtime, mtime))
+
+    def test_load__same_mtime(self):
+        """Check a manifest written in the same clock tick as its files."""
+        with self.sandboxDir() as temp_dir:
+            template_dir, expected_dir = self._make_template(temp_dir)
+            path = manifest.index_expected_dir(template_dir)
+            exact_path = os.path.join(expected_dir, 'exact.txt')
+            mtime = os.path.getmtime(exact_path)
+            self._set_mtime(path, mtime)
+
+            self.assertIsNot(manifest.load_manifest(template_dir, expected_dir), None)
+            # Change the file without changing its size or modification time.
+            _write(exact_path, u"abd\n")
+            self._set_mtime(exact_path, mtime)
+
+            self.assertIs(manifest.load_manifest(template_dir, expected_dir), None)
+
+    def test_load__stale_size(self):
+        with self.sandboxDir() as temp_dir:
+            template_dir, expected_dir = self._make_template(temp_dir)
+            path = manifest.index_expected_dir(template_dir)
+            # Make the change look older than the manifest.
+            exact_path = os.path.join(expected_dir, 'exact.txt')
+            _write(exact_path, u"abcd\n")
+            self._set_mtime(exact_path, os.path.getmtime(path) - 60)
+
+            self.assertIs(manifest.load_manifest(template_dir, expected_dir), None)
+
+    def test_load__stale_added(self):
+        with self.sandboxDir() as temp_dir:
+            template_dir, expected_dir = self._make_template(temp_dir)
+            path = manifest.index_expected_dir(template_dir)
+            new_path = os.path.join(expected_dir, 'sub', 'new.txt')
+            _write(new_path, u"new\n")
+            self._set_mtime(new_path, os.path.getmtime(path) - 60)
+
+            self.assertIs(manifest.load_manifest(template_dir, expected_dir), None)
+
+    def test_load__stale_removed(self):
+        with self.sandboxDir() as temp_dir:
+            template_dir, expected_dir = self._make_template(temp_dir)
+            manifest.index_expected_dir(template_dir)
+            os.remove(os.path.join(expected_dir, 'exact.txt'))
+
+            self.assertIs(manifest.load_manifest(template_dir, expected_dir), None)
+
+    def test_compare_dirs(self):
+        with self.sandboxDir() as temp_dir:
+            template_dir, expected_dir = self._make_template(temp_dir)
+            manifest.index_expected_dir(template_dir)
+            expected_manifest = manifest.load_manifest(template_dir, expected_dir)
+
+            actual_dir = os.path.join(temp_dir, 'actual')
+            os.makedirs(os.path.join(actual_dir, 'sub'))
+            _write(os.path.join(actual_dir, 'exact.txt'), u"abc\n")
+            _write(os.path.join(actual_dir, 'sub', 'fuzzy.txt'), u"a\nbxyz\n")
+
+            comparer = diff.Comparer(manifest=expected_manifest)
+            self.assertTrue(comparer.compare_dirs((actual_dir, expected_dir)))
+
+            _write(os.path.join(actual_dir, 'exact.txt'), u"abd\n")
+            dir_comparer = comparer._dir_comparer()
+            dir_comparer.custom.on_diff_file = lambda rel_path, result: None
+            info = dir_comparer.diff(actual_dir, expected_dir)
+            self.assertEqual(info, ([], [], ['exact.txt']))
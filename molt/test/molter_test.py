@@ -32,9 +32,22 @@ Unit tests for molter.py.
 
 """
 
+import os
 import unittest
 
-from molt.molter import preprocess_filename
+import molt.diff as diff
+from molt.molter import preprocess_filename, Molter, RenderedTree
+from molt.profiler import RenderProfile
+from molt.test.harness import config_load_tests, SandBoxDirMixin
+
+
+# Trigger the load_tests protocol.
+load_tests = config_load_tests
+
+
+def _write(path, text):
+    with open(path, 'wb') as f:
+        f.write(text.encode('utf-8'))
 
 
 class PreprocessFileNameTestCase(unittest.TestCase):
@@ -48,3 +61,92 @@ class PreprocessFileNameTestCase(unittest.TestCase):
         self._assert('README.md', ('README.md', False))
         self._assert('README.md.mustache', ('README.md', True))
         self._assert('README.skip.mustache', ('README.mustache', False))
+
+
+class RenderedTreeTestCase(unittest.TestCase, SandBoxDirMixin):
+
+    def _make_tree(self, source_path):
+        tree = RenderedTree()
+        tree.make_dir('sub')
+        tree.write_file(u"a\nb\n", os.path.join('sub', 'rendered.txt'))
+        tree.copy_file(source_path, 'copied.txt')
+        return tree
+
+    def _make_dirs(self, temp_dir):
+        source_path = os.path.join(temp_dir, 'source.txt')
+        _write(source_path, u"copy\n")
+        expected_dir = os.path.join(temp_dir, 'expected')
+        os.makedirs(os.path.join(expected_dir, 'sub'))
+        _write(os.path.join(expected_dir, 'copied.txt'), u"copy\n")
+        _write(os.path.join(expected_dir, 'sub', 'rendered.txt'), u"a\n...\n")
+        return source_path, expected_dir
+
+    def test_list_dir(self):
+        tree = self._make_tree('source.txt')
+        self.assertEqual(tree.list_dir(RenderedTree.ROOT), {'sub': True, 'copied.txt': False})
+        self.assertEqual(tree.list_dir('sub'), {'rendered.txt': False})
+        self.assertEqual(len(tree), 2)
+
+    def test_compare_tree(self):
+        with self.sandboxDir() as temp_dir:
+            source_path, expected_dir = self._make_dirs(temp_dir)
+            tree = self._make_tree(source_path)
+            comparer = diff.Comparer()
+            self.assertTrue(comparer.compare_tree(tree, expected_dir))
+
+            tree.write_file(u"b\n", os.path.join('sub', 'rendered.txt'))
+            tree.write_file(u"", 'extra.txt')
+            dir_comparer = comparer._dir_comparer(tree=tree)
+            dir_comparer.custom.on_diff_file = lambda rel_path, result: None
+            info = dir_comparer.diff(tree.ROOT, expected_dir,
+                                     list_funcs=(tree.list_dir, None))
+            self.assertEqual(info, (['extra.txt'], [], ['sub/rendered.txt']))
+
+    def test_write(self):
+        with self.sandboxDir() as temp_dir:
+            source_path, expected_dir = self._make_dirs(temp_dir)
+            tree = self._make_tree(source_path)
+            output_dir = os.path.join(temp_dir, 'output')
+            os.mkdir(output_dir)
+            tree.write(output_dir)
+            self.assertTrue(diff.Comparer().compare_dirs((output_dir, expected_dir)))
+
+
+class ProfileTestCase(unittest.TestCase, SandBoxDirMixin):
+
+    """Test rendering with a RenderProfile."""
+
+    def test_render_tree(self):
+        with self.sandboxDir() as temp_dir:
+            template_dir = os.path.join(temp_dir, 'template')
+            structure_dir = os.path.join(template_dir, 'structure')
+            lambdas_dir = os.path.join(template_dir, 'lambdas')
+            os.makedirs(structure_dir)
+            os.mkdir(lambdas_dir)
+            _write(os.path.join(template_dir, 'sample.json'),
+                   u'{"context": {"name": "foo"}}')
+            _write(os.path.join(structure_dir, '{{name}}.txt.mustache'),
+                   u"{{#upper}}foo{{/upper}}\n")
+            _write(os.path.join(structure_dir, 'copied.txt'), u"copy\n")
+            script_path = os.path.join(lambdas_dir, 'upper')
+            _write(script_path, u"#!/bin/sh\ntr a-z A-Z\n")
+            os.chmod(script_path, 0755)
+
+            profile = RenderProfile()
+            tree = Molter(profile=profile).render_tree(template_dir)
+
+        self.assertEqual(tree.read('foo.txt'), "FOO\n")
+        self.assertEqual([render['files'] for render in profile.renders], [2])
+        files = dict((entry['output_path'], entry) for entry in profile.files)
+        self.assertEqual(sorted(files), ['copied.txt', 'foo.txt'])
+        entry = files['foo.txt']
+        self.assertEqual((entry['path'], entry['kind'], entry['bytes_out']),
+                         ('{{name}}.txt.mustache', 'render', 4))
+        self.assertTrue(0 < entry['lambda_seconds'] <= entry['render_seconds'])
+        self.assertEqual(files['copied.txt']['kind'], 'copy')
+        stats, = profile.lambdas
+        self.assertEqual((stats['name'], stats['calls'], stats['bytes_out']),
+                         ('upper', 1, 3))
+
+        report = profile.format_report(1)
+        self.assertEqual(len(report.splitlines()), 5)
@@ -0,0 +1,146 @@
+# encoding: utf-8
+#
+# Copyright (C) 2012 Chris Jerdonek. All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# * Redistributions of source code must retain the above copyright notice,
+#   this list of conditions and the following disclaimer.
+# * Redistributions in binary form must reproduce the above copyright notice,
+#   this list of conditions and the following disclaimer in the documentation
+#   and/or other materials provided with the distribution.
+# * The names of the copyright holders may not be used to endorse or promote
+#   products derived from this software without specific prior written
+#   permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+# CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+# SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+#
+
+"""
+Unit tests for observers.py.
+
+"""
+
+import json
+import os
+import unittest
+
+from molt.dirutil import stage_template_dir
+from molt.molter import Molter
+import molt.observers as observers
+from molt.observers import NdjsonObserver, RenderObserver
+from molt.projectmap import Locator
+from molt.test.harness import config_load_tests, SandBoxDirMixin
+
+
+# Trigger the load_tests protocol.
+load_tests = config_load_tests
+
+
+class _RecordingObserver(RenderObserver):
+
+    def __init__(self):
+        self.events = []
+
+    def on_render_start(self, template_dir):
+        self.events.append(('render_start', template_dir))
+
+    def on_file_start(self, path):
+        self.events.append(('file_start', os.path.basename(path)))
+
+    def on_file_done(self, path, bytes, seconds):
+        self.events.append(('file_done', os.path.basename(path), bytes))
+
+    def on_lambda_call(self, name, seconds):
+        self.events.append(('lambda_call', name))
+
+    def on_render_done(self, stats):
+        self.events.append(('render_done', stats['files'], stats['bytes'],
+                            stats['lambda_calls']))
+
+
+class RenderObserverTestCase(unittest.TestCase, SandBoxDirMixin):
+
+    """Test passing observers to Molter."""
+
+    def _render(self, observers):
+        with self.sandboxDir() as temp_dir:
+            template_dir = os.path.join(temp_dir, 'template')
+            # Staging makes the demo lambdas executable.
+            stage_template_dir(Locator().demo_template_dir, template_dir)
+            Molter(observers=observers).render_tree(template_dir)
+        return template_dir
+
+    def test_events(self):
+        observer = _RecordingObserver()
+        template_dir = self._render([observer])
+        events = observer.events
+
+        self.assertEqual(events[0], ('render_start', template_dir))
+        self.assertEqual(events[-1][:2], ('render_done', 4))
+        file_events = [event for event in events if event[0] == 'file_done']
+        self.assertEqual(len(file_events), 4)
+        self.assertEqual(events[-1][2], sum(event[2] for event in file_events))
+        lambda_events = [event for event in events if event[0] == 'lambda_call']
+        self.assertEqual(events[-1][3], len(lambda_events))
+
+        # Check that each lambda call happens while rendering a file.
+        index = events.index(lambda_events[0])
+        self.assertEqual(events[index - 1][0], 'file_start')
+
+    def test_base_class(self):
+        # The base class should accept every event.
+        self._render([RenderObserver()])
+
+
+class NdjsonObserverTestCase(unittest.TestCase):
+
+    def test_write(self):
+        read_fd, write_fd = os.pipe()
+        try:
+            observer = NdjsonObserver(write_fd)
+            observer.on_file_done('a.txt', 3, 0.5)
+            observer.on_render_done({'files': 1})
+        finally:
+            os.close(write_fd)
+        with os.fdopen(read_fd) as f:
+            events = [json.loads(line) for line in f]
+
+        self.assertEqual([event.pop('event') for event in events],
+                         ['file_done', 'render_done'])
+        self.assertTrue(all(isinstance(event.pop('time'), float) for event in events))
+        self.assertEqual(events, [{'path': 'a.txt', 'bytes': 3, 'seconds': 0.5},
+                                  {'files': 1}])
+
+    def test_write__short_writes(self):
+        class ShortWriteOS(object):
+            def write(self, fd, data):
+                return os.write(fd, data[:5])
+
+        read_fd, write_fd = os.pipe()
+        original_os = observers.os
+        observers.os = ShortWriteOS()
+        try:
+            observer = NdjsonObserver(write_fd)
+            observer.on_lambda_call('upper', 0.25)
+        finally:
+            observers.os = original_os
+            os.close(write_fd)
+        with os.fdopen(read_fd) as f:
+            lines = f.read().splitlines()
+
+        self.assertEqual(len(lines), 1)
+        event = json.loads(lines[0])
+        self.assertEqual((event['event'], event['name'], event['seconds']),
+                         ('lambda_call', 'upper', 0.25))
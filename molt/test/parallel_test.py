@@ -0,0 +1,65 @@
+# encoding: utf-8
+#
+# Copyright (C) 2012 Chris Jerdonek. All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# * Redistributions of source code must retain the above copyright notice,
+#   this list of conditions and the following disclaimer.
+# * Redistributions in binary form must reproduce the above copyright notice,
+#   this list of conditions and the following disclaimer in the documentation
+#   and/or other materials provided with the distribution.
+# * The names of the copyright holders may not be used to endorse or promote
+#   products derived from this software without specific prior written
+#   permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+# CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+# SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+#
+
+"""
+Unit tests for molt.test.harness.parallel.
+
+"""
+
+from unittest import TestCase, TestSuite
+
+from molt.test.harness import config_load_tests
+from molt.test.harness.parallel import group_tests
+
+
+# Trigger the load_tests protocol.
+load_tests = config_load_tests
+
+
+def _make_sample_tests():
+    # The class is defined in a function to hide it from test discovery.
+    class SampleTestCase(TestCase):
+
+        def test_pass(self):
+            pass
+
+        def test_fail(self):
+            self.fail("sample failure")
+
+    return SampleTestCase('test_pass'), SampleTestCase('test_fail')
+
+
+class GroupTestsTestCase(TestCase):
+
+    def test_group_tests(self):
+        test_pass, test_fail = _make_sample_tests()
+        suite = TestSuite([test_pass, TestSuite([test_fail])])
+        units = group_tests(suite)
+        self.assertEquals(units.keys(), [__name__])
+        self.assertEquals(units[__name__].countTestCases(), 2)
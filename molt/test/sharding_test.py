@@ -0,0 +1,195 @@
+# encoding: utf-8
+#
+# Copyright (C) 2012 Chris Jerdonek. All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# * Redistributions of source code must retain the above copyright notice,
+#   this list of conditions and the following disclaimer.
+# * Redistributions in binary form must reproduce the above copyright notice,
+#   this list of conditions and the following disclaimer in the documentation
+#   and/or other materials provided with the distribution.
+# * The names of the copyright holders may not be used to endorse or promote
+#   products derived from this software without specific prior written
+#   permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+# CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+# SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+#
+
+"""
+Unit tests for molt.test.harness.sharding.
+
+"""
+
+import os
+from StringIO import StringIO
+from unittest import TestCase, TestSuite
+
+from molt.general.error import Error
+from molt.test.harness import config_load_tests, SandBoxDirMixin
+from molt.test.harness.alltest import TimingTestResult
+from molt.test.harness.sharding import (assign_shards, merge_results, read_timings,
+                                        ShardPlan, write_results, write_timings)
+
+
+# Trigger the load_tests protocol.
+load_tests = config_load_tests
+
+
+def _run_sample_tests(names):
+    # The class is defined in a function to hide it from test discovery.
+    class SampleTestCase(TestCase):
+
+        def test_pass(self):
+            pass
+
+        def test_fail(self):
+            """Sample failure."""
+            self.fail("sample failure")
+
+    result = TimingTestResult(StringIO(), descriptions=True, verbosity=1)
+    TestSuite([SampleTestCase(name) for name in names]).run(result)
+    return result
+
+
+class AssignShardsTestCase(TestCase):
+
+    def test_round_robin(self):
+        shards = assign_shards(['e', 'a', 'd', 'b', 'c'], 2)
+        self.assertEquals(shards, [set(['a', 'c', 'e']), set(['b', 'd'])])
+
+    def test_deterministic(self):
+        test_ids = ['test_%d' % i for i in range(20)]
+        self.assertEquals(assign_shards(test_ids, 3),
+                          assign_shards(list(reversed(test_ids)), 3))
+
+    def test_covers_each_test_once(self):
+        test_ids = ['test_%d' % i for i in range(20)]
+        shards = assign_shards(test_ids, 3)
+        self.assertEquals(sum(len(shard) for shard in shards), 20)
+        self.assertEquals(set.union(*shards), set(test_ids))
+
+    def test_durations(self):
+        durations = {'a': 5.0, 'b': 3.0, 'c': 2.0, 'd': 1.0}
+        shards = assign_shards(['a', 'b', 'c', 'd'], 2, durations)
+        self.assertEquals(shards, [set(['a', 'd']), set(['b', 'c'])])
+
+    def test_durations__unknown_test(self):
+        # The unknown test counts as the median duration 2.0.
+        durations = {'a': 3.0, 'b': 2.0, 'c': 1.0}
+        shards = assign_shards(['a', 'b', 'c', 'x'], 2, durations)
+        self.assertEquals(shards, [set(['a', 'c']), set(['b', 'x'])])
+
+
+class TimingsTestCase(TestCase, SandBoxDirMixin):
+
+    def test_read_timings__missing(self):
+        with self.sandboxDir() as temp_dir:
+            self.assertIs(read_timings(os.path.join(temp_dir, 'timings.json')), None)
+
+    def test_round_trip(self):
+        result = _run_sample_tests(['test_pass', 'test_fail'])
+        with self.sandboxDir() as temp_dir:
+            path = os.path.join(temp_dir, 'cache', 'timings.json')
+            write_timings(path, result)
+            self.assertEquals(read_timings(path), dict(result.durations))
+
+
+class MergeResultsTestCase(TestCase, SandBoxDirMixin):
+
+    test_ids = ['a', 'b', 'c', 'd']
+
+    def _write(self, temp_dir, index, count, names, test_ids=None, durations=None,
+               shard_test_ids=None):
+        """
+        Write a results file, and return its path.
+
+        Arguments:
+
+          shard_test_ids: the IDs to record as assigned to the shard
+            instead of the IDs the shard plan assigns.
+
+        """
+        if test_ids is None:
+            test_ids = self.test_ids
+        path = os.path.join(temp_dir, 'results-%d.json' % index)
+        plan = ShardPlan((index, count), test_ids, durations)
+        if shard_test_ids is not None:
+            plan.shard_ids = set(shard_test_ids)
+        write_results(path, plan, _run_sample_tests(names), 0.5)
+        return path
+
+    def test_merge(self):
+        stream = StringIO()
+        with self.sandboxDir() as temp_dir:
+            paths = [self._write(temp_dir, 2, 2, ['test_fail']),
+                     self._write(temp_dir, 1, 2, ['test_pass', 'test_pass'])]
+            result = merge_results(paths, stream)
+        self.assertEquals(result.testsRun, 3)
+        self.assertEquals(len(result.failures), 1)
+        self.assertFalse(result.wasSuccessful())
+        output = stream.getvalue()
+        self.assertTrue(output.startswith("merging 2 test result files:\n"
+                                          "  shard 1/2: 2 tests in 0.500s: OK\n"
+                                          "  shard 2/2: 1 tests in 0.500s: FAILED\n"),
+                        msg=output)
+        self.assertTrue("Sample failure." in output, msg=output)
+        self.assertTrue("FAILED (failures=1)" in output, msg=output)
+
+    def _assert_error(self, shards, expected):
+        """
+        Arguments:
+
+          shards: a list of tuples of arguments to pass to _write().
+
+        """
+        with self.sandboxDir() as temp_dir:
+            paths = [self._write(temp_dir, *args) for args in shards]
+            try:
+                merge_results(paths, StringIO())
+            except Error, err:
+                self.assertEquals(str(err), expected)
+            else:
+                self.fail("Error not raised")
+
+    def test_missing_shard(self):
+        self._assert_error([(2, 3, ['test_pass'])],
+                           "Missing test results for shards: 1/3, 3/3")
+
+    def test_different_counts(self):
+        self._assert_error([(1, 2, ['test_pass']), (2, 3, ['test_pass'])],
+                           "Test results are from runs with different shard counts: 2, 3")
+
+    def test_different_tests(self):
+        self._assert_error([(1, 2, ['test_pass']),
+                            (2, 2, ['test_pass'], ['a', 'b', 'c'])],
+                           "Test results are from runs of different sets of tests.")
+
+    def test_different_timings(self):
+        # This is the case of a shard balanced with a machine-local
+        # timings file.
+        self._assert_error([(1, 2, ['test_pass'], None, {'a': 1.0}),
+                            (2, 2, ['test_pass'])],
+                           "Test results are from shards balanced with different "
+                           "test timings.")
+
+    def test_duplicate_tests(self):
+        self._assert_error([(1, 2, ['test_pass'], None, None, ['a', 'b', 'c']),
+                            (2, 2, ['test_pass'], None, None, ['c', 'd'])],
+                           "Tests assigned to more than one shard: c")
+
+    def test_missing_tests(self):
+        self._assert_error([(1, 2, ['test_pass'], None, None, ['a']),
+                            (2, 2, ['test_pass'], None, None, ['c', 'd'])],
+                           "Test results cover 3 of 4 tests.")
@@ -0,0 +1,153 @@
+# encoding: utf-8
+#
+# Copyright (C) 2012 Chris Jerdonek. All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# * Redistributions of source code must retain the above copyright notice,
+#   this list of conditions and the following disclaimer.
+# * Redistributions in binary form must reproduce the above copyright notice,
+#   this list of conditions and the following disclaimer in the documentation
+#   and/or other materials provided with the distribution.
+# * The names of the copyright holders may not be used to endorse or promote
+#   products derived from this software without specific prior written
+#   permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+# CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+# SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+#
+
+"""
+Unit tests for visualizer.py.
+
+"""
+
+from io import BytesIO
+import os
+import unittest
+
+from molt.test.harness import config_load_tests, SandBoxDirMixin
+from molt.visualizer import summarize, visualize
+
+
+# Trigger the load_tests protocol.
+load_tests = config_load_tests
+
+
+def _write(dir_path, rel_path, b):
+    path = os.path.join(dir_path, rel_path)
+    if not os.path.exists(os.path.dirname(path)):
+        os.makedirs(os.path.dirname(path))
+    with open(path, 'wb') as f:
+        f.write(b)
+
+
+class VisualizeTestCase(unittest.TestCase, SandBoxDirMixin):
+
+    def _visualize(self, dir_path, **kwargs):
+        stream = BytesIO()
+        visualize(dir_path, stream=stream, **kwargs)
+        return stream.getvalue().replace(dir_path, "DIR")
+
+    def test_text_files(self):
+        with self.sandboxDir() as temp_dir:
+            _write(temp_dir, 'b.txt', b"a\nb\n")
+            _write(temp_dir, 'a/c.txt', b"c")
+            self.assertEqual(self._visualize(temp_dir), b"""\
++++ DIR/b.txt
++a
++b
++++ DIR/a/c.txt
++c
+\\ No newline at end of file
+""")
+
+    def test_binary_file(self):
+        with self.sandboxDir() as temp_dir:
+            _write(temp_dir, 'a.dat', b"a\0b")
+            self.assertEqual(self._visualize(temp_dir), b"""\
++++ DIR/a.dat
+(binary file: 3 bytes)
+""")
+
+    def test_max_bytes_per_file(self):
+        with self.sandboxDir() as temp_dir:
+            _write(temp_dir, 'a.txt', b"abc\ndef\n")
+            self.assertEqual(self._visualize(temp_dir, max_bytes_per_file=5), b"""\
++++ DIR/a.txt
++abc
++d
+(3 more bytes not shown)
+""")
+
+    def test_max_files(self):
+        with self.sandboxDir() as temp_dir:
+            for name in ('a', 'b', 'c'):
+                _write(temp_dir, name, b"x\n")
+            self.assertEqual(self._visualize(temp_dir, max_files=1), b"""\
++++ DIR/a
++x
+(2 more files not shown)
+""")
+
+
+class SummarizeTestCase(unittest.TestCase, SandBoxDirMixin):
+
+    def _summarize(self, dir_path, **kwargs):
+        stream = BytesIO()
+        summarize(dir_path, stream=stream, **kwargs)
+        return stream.getvalue().replace(dir_path, "DIR")
+
+    def test_summarize(self):
+        with self.sandboxDir() as temp_dir:
+            _write(temp_dir, 'b.txt', b"a\nb")
+            _write(temp_dir, 'a/c.txt', b"c\n")
+            origins = {'b.txt': 'b.txt.mustache'}
+            self.assertEqual(self._summarize(temp_dir, origins=origins), b"""\
+DIR/
+  a/
+    c.txt  (2 bytes)
+  b.txt  (3 bytes)  <- b.txt.mustache
+2 files, 1 directories, 5 bytes
+""")
+
+    @unittest.skipIf(not hasattr(os, "symlink"), "symbolic links not available")
+    def test_symbolic_links(self):
+        with self.sandboxDir() as temp_dir:
+            _write(temp_dir, 'a/c.txt', b"c\n")
+            # A link loop is not followed.
+            os.symlink(temp_dir, os.path.join(temp_dir, 'a', 'loop'))
+            os.symlink('a/c.txt', os.path.join(temp_dir, 'b.txt'))
+            self.assertEqual(self._summarize(temp_dir), b"""\
+DIR/
+  a/
+    c.txt  (2 bytes)
+    loop -> DIR
+  b.txt -> a/c.txt
+1 files, 1 directories, 2 bytes, 2 symbolic links
+""")
+
+    def test_expand(self):
+        with self.sandboxDir() as temp_dir:
+            _write(temp_dir, 'b.txt', b"a\nb")
+            _write(temp_dir, 'a/c.txt', b"c\n")
+            self.assertEqual(self._summarize(temp_dir, expand=['a', 'x']), b"""\
+DIR/
+  a/
+    c.txt  (2 bytes, 1 lines)
+  b.txt  (3 bytes)
+2 files, 1 directories, 5 bytes
++++ DIR/a/c.txt
++c
+(path to expand not found: x)
+""")
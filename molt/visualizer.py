@@ -34,49 +34,237 @@ Exposes a function to visualize the contents of a directory.
 
 from __future__ import absolute_import
 
+import os
+import stat
 import sys
 
-from molt.general.popen import chain_script
-from molt.general.io import temp_directory
 
-# diff -Nur path1 path2
-# --- path1	1969-12-31 16:00:00.000000000 -0800
-# +++ path2	2012-05-27 17:45:10.000000000 -0700
-# @@ -0,0 +1 @@
-# +baz
-# diff -Nur path3 path4
-# --- path3	1969-12-31 16:00:00.000000000 -0800
-# +++ path4	2012-05-21 23:43:52.000000000 -0700
-# @@ -0,0 +1 @@
-# +{{bar}}
+# The number of bytes to read from a file at a time.
+_CHUNK_SIZE = 64 * 1024
 
 
-def visualize(target_dir):
+def visualize(target_dir, max_bytes_per_file=None, max_files=None, stream=None):
     """
     Print the contents of a directory to stdout in a human-readable format.
 
+    Each file is printed after a "+++ path" line with each line prefixed
+    by "+", as in the output of `diff -Nur` against an empty directory.
+    Files are read in chunks, and binary files are summarized rather
+    than printed.
+
+    Arguments:
+
+      max_bytes_per_file: the maximum number of bytes to print of each
+        file, or None for no limit.
+
+      max_files: the maximum number of files to print, or None for no
+        limit.
+
+      stream: a stream accepting bytes.  Defaults to stdout.
+
+    """
+    stream = _get_stream(stream)
+    printer = _FilePrinter(stream, max_bytes_per_file=max_bytes_per_file)
+    printer.print_files(_iter_file_paths(target_dir), max_files=max_files)
+    stream.flush()
+
+
+def summarize(target_dir, expand=None, origins=None, max_bytes_per_file=None,
+              max_files=None, stream=None):
+    """
+    Print the tree of a directory with the size of each file.
+
+    The tree is computed with a single os.stat() call per path, and no
+    file contents are read except for the paths to expand.
+
+    Arguments:
+
+      expand: a list of paths relative to target_dir of files or
+        directories whose line counts to show in the tree and whose
+        contents to print after the tree, as visualize() does.
+
+      origins: a dict mapping file paths relative to target_dir to the
+        path of the template file each was rendered or copied from.
+
+    See visualize() for the remaining arguments.
+
     """
-    handler = _LineHandler()
+    if expand is None:
+        expand = []
+    if origins is None:
+        origins = {}
+    expand = [os.path.normpath(path) for path in expand]
+    stream = _get_stream(stream)
+
+    summarizer = _TreeSummarizer(stream, expand=expand, origins=origins)
+    summarizer.summarize(target_dir)
+
+    printer = _FilePrinter(stream, max_bytes_per_file=max_bytes_per_file)
+    for rel_path in expand:
+        path = os.path.join(target_dir, rel_path)
+        if not os.path.exists(path):
+            printer.write_note("path to expand not found: %s" % rel_path)
+            continue
+        paths = [path] if os.path.isfile(path) else _iter_file_paths(path)
+        printer.print_files(paths, max_files=max_files)
+    stream.flush()
+
+
+def _get_stream(stream):
+    if stream is None:
+        sys.stdout.flush()
+        stream = getattr(sys.stdout, 'buffer', sys.stdout)
+    return stream
+
+
+def _iter_file_paths(dir_path):
+    """
+    Yield the paths of the files in a directory recursively, in sorted order.
+
+    """
+    for dir_path, dir_names, file_names in os.walk(dir_path):
+        # Sorting in place makes os.walk() visit directories in order.
+        dir_names.sort()
+        for name in sorted(file_names):
+            yield os.path.join(dir_path, name)
+
+
+def _encode(path):
+    if isinstance(path, bytes):
+        return path
+    return path.encode(sys.getfilesystemencoding() or 'utf-8')
+
+
+def _count_lines(path):
+    count = 0
+    last_chunk = b""
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(_CHUNK_SIZE), b""):
+            count += chunk.count(b"\n")
+            last_chunk = chunk
+    if last_chunk and not last_chunk.endswith(b"\n"):
+        count += 1
+    return count
+
+
+class _TreeSummarizer(object):
+
+    def __init__(self, stream, expand, origins):
+        self.expand = expand
+        self.origins = origins
+        self.stream = stream
+
+        self.byte_count = 0
+        self.dir_count = 0
+        self.file_count = 0
+        self.link_count = 0
+
+    def _write_line(self, line):
+        self.stream.write(_encode(line) + b"\n")
+
+    def _is_expanded(self, rel_path):
+        for path in self.expand:
+            if rel_path == path or rel_path.startswith(path + os.sep):
+                return True
+        return False
+
+    def _describe_file(self, path, rel_path, size):
+        details = ["%d bytes" % size]
+        if self._is_expanded(rel_path):
+            details.append("%d lines" % _count_lines(path))
+        description = "(%s)" % ", ".join(details)
+        origin = self.origins.get(rel_path)
+        if origin is not None:
+            description += "  <- %s" % origin
+        return description
+
+    def _summarize_dir(self, dir_path, rel_dir, indent):
+        for name in sorted(os.listdir(dir_path)):
+            path = os.path.join(dir_path, name)
+            rel_path = os.path.join(rel_dir, name)
+            # Symbolic links are listed but not followed, so that a link
+            # loop or a link to a large tree cannot stall the summary.
+            info = os.lstat(path)
+            if stat.S_ISLNK(info.st_mode):
+                self.link_count += 1
+                self._write_line("%s%s -> %s" % (indent, name, os.readlink(path)))
+                continue
+            if stat.S_ISDIR(info.st_mode):
+                self.dir_count += 1
+                self._write_line("%s%s/" % (indent, name))
+                self._summarize_dir(path, rel_path, indent + "  ")
+                continue
+            self.file_count += 1
+            self.byte_count += info.st_size
+            description = self._describe_file(path, rel_path, info.st_size)
+            self._write_line("%s%s  %s" % (indent, name, description))
+
+    def summarize(self, target_dir):
+        self._write_line("%s/" % target_dir.rstrip(os.sep))
+        self._summarize_dir(target_dir, "", "  ")
+        line = "%d files, %d directories, %d bytes" % (self.file_count, self.dir_count,
+                                                       self.byte_count)
+        if self.link_count:
+            line += ", %d symbolic links" % self.link_count
+        self._write_line(line)
+
+
+class _FilePrinter(object):
 
-    with temp_directory() as empty_temp_dir:
-        args = ['diff', '-Nur', empty_temp_dir, target_dir]
-        chain_script(args, handler.handle)
+    def __init__(self, stream, max_bytes_per_file=None):
+        self.max_bytes = max_bytes_per_file
+        self.stream = stream
 
+    def write_note(self, note):
+        self.stream.write(("(%s)\n" % note).encode('ascii'))
 
-class _LineHandler(object):
+    def _write_chunk(self, chunk, at_line_start):
+        """
+        Write a chunk of a text file, and return whether it ended a line.
 
-    def __init__(self):
-        self.in_chunk = False
+        """
+        ends_line = chunk.endswith(b"\n")
+        if ends_line:
+            chunk = chunk[:-1]
+        chunk = chunk.replace(b"\n", b"\n+")
+        if at_line_start:
+            chunk = b"+" + chunk
+        if ends_line:
+            chunk += b"\n"
+        self.stream.write(chunk)
+        return ends_line
 
-    def handle(self, line):
-        if line.startswith('diff'):
-            self.in_chunk = False
-            return
-        if line.startswith('---'):
-            return
-        if line.startswith('+++') and not self.in_chunk:
-            self.in_chunk = True
-            # Strip the timestamp on the right.
-            line = line.rsplit('\t', 1)[0] + '\n'
-        sys.stdout.write(line)
+    def print_files(self, paths, max_files=None):
+        paths = iter(paths)
+        for count, path in enumerate(paths):
+            if max_files is not None and count >= max_files:
+                rest_count = 1 + sum(1 for path in paths)
+                self.write_note("%d more files not shown" % rest_count)
+                break
+            self.print_file(path)
 
+    def print_file(self, path):
+        stream = self.stream
+        stream.write(b"+++ " + _encode(path) + b"\n")
+        with open(path, 'rb') as f:
+            size = os.fstat(f.fileno()).st_size
+            chunk = f.read(_CHUNK_SIZE)
+            if b"\0" in chunk:
+                self.write_note("binary file: %d bytes" % size)
+                return
+            at_line_start = True
+            printed_count = 0
+            while chunk:
+                if self.max_bytes is not None:
+                    chunk = chunk[:self.max_bytes - printed_count]
+                    if not chunk:
+                        break
+                at_line_start = self._write_chunk(chunk, at_line_start)
+                printed_count += len(chunk)
+                chunk = f.read(_CHUNK_SIZE)
+        if not at_line_start:
+            stream.write(b"\n")
+        if printed_count < size:
+            self.write_note("%d more bytes not shown" % (size - printed_count))
+        elif not at_line_start:
+            stream.write(b"\\ No newline at end of file\n")
@@ -159,6 +159,7 @@ INSTALL_REQUIRES = [
 # TODO: use ".".join(parts).
 PACKAGES = [
     'molt',
+    'molt.benchmark',
     'molt.scripts',
     'molt.scripts.molt',
     'molt.scripts.molt.general',
@@ -176,7 +177,7 @@ PACKAGES = [
 
 DATA_DIRS = [
     # TODO: make this more fine-grained so package_data is smaller.
-    ('molt', ['demo', 'test/data']),
+    ('molt', ['benchmark/baselines', 'demo', 'test/data']),
 ]
 
 DATA_FILE_GLOBS = [